@@ -0,0 +1,39 @@
+"""add message pagination indexes
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+# (索引名, 列)
+INDEXES = [
+    # 会话消息游标分页：WHERE session_id = ? ORDER BY created_at DESC, id DESC
+    ('idx_message_session_created', ['session_id', 'created_at', 'id']),
+    # 系统消息游标分页：WHERE receiver_id = ? AND message_type = 'SYSTEM' ORDER BY created_at DESC
+    ('idx_message_receiver_type_created', ['receiver_id', 'message_type', 'created_at']),
+]
+
+
+def upgrade():
+    # 添加索引（如果不存在）
+    conn = op.get_bind()
+    for index_name, columns in INDEXES:
+        result = conn.execute(sa.text(f"SHOW INDEX FROM messages WHERE Key_name = '{index_name}'"))
+        if not result.fetchone():
+            op.create_index(index_name, 'messages', columns)
+
+
+def downgrade():
+    for index_name, _ in reversed(INDEXES):
+        op.drop_index(index_name, table_name='messages')
@@ -0,0 +1,39 @@
+"""create statistics_rollups table
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建统计汇总表（数据由应用启动时的后台重算填充，或执行 scripts/rebuild_statistics_rollups.py）
+    op.create_table(
+        'statistics_rollups',
+        sa.Column('metric', sa.String(40), nullable=False, comment='指标'),
+        sa.Column('bucket_date', sa.Date(), nullable=False, comment='日期（创建日期，活动为开始日期）'),
+        sa.Column('school_id', sa.String(36), nullable=False, server_default='', comment='学校ID'),
+        sa.Column('department_id', sa.String(36), nullable=False, server_default='', comment='院系ID'),
+        sa.Column('enterprise_id', sa.String(36), nullable=False, server_default='', comment='企业ID'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='', comment='状态'),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0', comment='计数'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('metric', 'bucket_date', 'school_id', 'department_id', 'enterprise_id', 'status'),
+        comment='统计汇总表'
+    )
+    op.create_index('idx_rollup_metric_school_department', 'statistics_rollups', ['metric', 'school_id', 'department_id'])
+
+
+def downgrade():
+    op.drop_index('idx_rollup_metric_school_department', table_name='statistics_rollups')
+    op.drop_table('statistics_rollups')
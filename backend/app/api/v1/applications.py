@@ -13,6 +13,7 @@ from app.models.user import User
 from app.models.job import Job, JobApplication, Resume
 from app.models.profile import StudentProfile
 from app.schemas.application import ApplicationCreate, ApplicationResponse, ApplicationListResponse
+from app.services.counter_service import job_apply_counter
 
 router = APIRouter()
 
@@ -300,13 +301,13 @@ async def create_application(
         message=application_data.message
     )
     
-    # 增加职位申请次数
-    job.apply_count += 1
-    
     db.add(application)
     await db.commit()
     await db.refresh(application)
     
+    # 增加职位申请次数（提交后延迟批量写入，申请事务不再锁定职位行）
+    job_apply_counter.increment(job.id)
+    
     return application
 
 
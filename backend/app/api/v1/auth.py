@@ -13,16 +13,19 @@ from pydantic import BaseModel, Field
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
-    verify_token
+    verify_token,
+    revoke_token
 )
 from app.core.config import settings
 from app.schemas.auth import RegisterRequest, LoginResponse, TokenResponse
 from app.models.user import User
 from app.models.user_type import UserType
+from app.services.principal_service import get_user_by_subject, invalidate_user_principal
 
 router = APIRouter()
 
@@ -65,11 +68,8 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    # 从数据库查询用户
-    result = await db.execute(
-        select(User).where(User.username == username)
-    )
-    user = result.scalar_one_or_none()
+    # 查询用户（优先使用身份缓存，附带档案ID）
+    user = await get_user_by_subject(db, username)
     
     if user is None:
         raise credentials_exception
@@ -104,9 +104,7 @@ async def get_current_user_optional(
         if username is None:
             return None
         
-        result = await db.execute(select(User).where(User.username == username))
-        user = result.scalar_one_or_none()
-        return user
+        return await get_user_by_subject(db, username)
     except Exception:
         return None
 
@@ -156,7 +154,7 @@ async def register(
     user = User(
         id=str(uuid4()),
         username=request.username,
-        password_hash=get_password_hash(request.password),
+        password_hash=await get_password_hash_async(request.password),
         phone=request.phone if request.phone and request.phone.strip() else None,
         email=request.email if request.email and request.email.strip() else None,
         user_type=UserType(request.user_type),
@@ -202,13 +200,18 @@ async def login(
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # 成本因子配置变更后，登录成功时按新成本重新哈希
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(form_data.password)
+        await db.commit()
+    
     # 检查用户状态
     if user.status != "ACTIVE":
         raise HTTPException(
@@ -295,6 +298,41 @@ async def refresh_token(
     }
 
 
+class LogoutRequest(BaseModel):
+    """退出登录请求"""
+    refresh_token: Optional[str] = Field(None, description="刷新令牌（可选，一并吊销）")
+
+
+@router.post("/logout")
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    token: Optional[str] = Depends(oauth2_scheme)
+):
+    """
+    退出登录
+    吊销当前访问令牌（以及传入的刷新令牌），令牌在过期前不能再使用
+    
+    Args:
+        request: 退出登录请求（可选）
+        token: JWT访问令牌
+        
+    Returns:
+        dict: 操作结果
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    await revoke_token(token)
+    if request and request.refresh_token:
+        await revoke_token(request.refresh_token)
+    
+    return {"message": "已退出登录"}
+
+
 # ==================== 密码管理 ====================
 
 class ForgotPasswordRequest(BaseModel):
@@ -449,8 +487,9 @@ async def reset_password(
         )
     
     # 更新密码
-    user.password_hash = get_password_hash(request.new_password)
+    user.password_hash = await get_password_hash_async(request.new_password)
     await db.commit()
+    await invalidate_user_principal(user.username)
     
     return {
         "success": True,
@@ -475,23 +514,27 @@ async def change_password(
     Returns:
         dict: 修改结果
     """
+    # 身份缓存不含密码哈希，先加载
+    await db.refresh(current_user, ["password_hash"])
+    
     # 验证旧密码
-    if not verify_password(request.old_password, current_user.password_hash):
+    if not await verify_password_async(request.old_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="旧密码错误"
         )
     
     # 检查新密码是否与旧密码相同
-    if verify_password(request.new_password, current_user.password_hash):
+    if await verify_password_async(request.new_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="新密码不能与旧密码相同"
         )
     
     # 更新密码
-    current_user.password_hash = get_password_hash(request.new_password)
+    current_user.password_hash = await get_password_hash_async(request.new_password)
     await db.commit()
+    await invalidate_user_principal(current_user.username)
     
     return {
         "success": True,
@@ -3,17 +3,21 @@
 """
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_
+from sqlalchemy import select, or_, and_
 from sqlalchemy.orm import selectinload, joinedload
-from typing import Optional, Dict, List, Set
+from typing import Optional, Dict, List, Set, Tuple
 from uuid import uuid4
 import json
+import time
+import heapq
 import asyncio
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from app.core.database import get_db
+from app.core.config import settings
 from app.core.datetime_utils import utc_now
 from app.api.v1.auth import get_current_user
+from app.core.permissions import require_admin
 from app.core.security import verify_token
 from app.models.user import User
 from app.models.chat import ChatSession, Message
@@ -22,45 +26,175 @@ from app.schemas.chat import (
     ChatSessionResponse, ChatSessionListResponse
 )
 from app.core.logging import get_logger
+from app.core.chat_backplane import create_chat_backplane
+from app.utils.pagination import keyset_paginate
+from app.services.read_state_service import (
+    UNREAD_CHAT, UNREAD_SYSTEM, get_unread_count, mark_messages_read, record_new_message, unread_kind
+)
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+class ConnectionSender:
+    """
+    单个WebSocket连接的发送队列
+    
+    每个连接有独立的有界队列和写协程，慢客户端只会积压自己的队列，不影响其他连接。
+    队列满时按策略处理：drop丢弃新消息，disconnect断开该连接。
+    """
+    
+    def __init__(self, websocket: WebSocket, user_id: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CHAT_SEND_QUEUE_SIZE)
+        # 发送统计
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.total_send_seconds = 0.0
+        self.max_send_seconds = 0.0
+        self._closing = False
+        self._task = asyncio.create_task(self._writer())
+    
+    def enqueue(self, text: str) -> bool:
+        """
+        放入发送队列（不等待）
+        
+        Returns:
+            bool: 是否入队成功
+        """
+        if self._closing:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            if settings.CHAT_SLOW_CONSUMER_POLICY == "disconnect":
+                self._schedule_remove("客户端接收过慢")
+            else:
+                logger.warning(f"发送队列已满，丢弃消息: user_id={self.user_id}")
+            return False
+    
+    async def _writer(self):
+        """按顺序发送队列中的消息，单条发送超时或失败时移除连接"""
+        while True:
+            text = await self.queue.get()
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=settings.CHAT_SEND_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"发送消息失败，连接可能已断开: {str(e)}")
+                self._schedule_remove("发送消息失败")
+                return
+            elapsed = time.perf_counter() - start
+            self.sent_count += 1
+            self.total_send_seconds += elapsed
+            self.max_send_seconds = max(self.max_send_seconds, elapsed)
+            # 发送成功，更新心跳
+            await self.manager.update_heartbeat(self.websocket)
+    
+    def _schedule_remove(self, reason: str):
+        if not self._closing:
+            self._closing = True
+            asyncio.create_task(self.manager._remove_connection(self.websocket, reason))
+    
+    def stop(self):
+        """停止写协程（连接移除时调用）"""
+        self._closing = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+    
+    def stats(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "queue_depth": self.queue.qsize(),
+            "sent": self.sent_count,
+            "dropped": self.dropped_count,
+            "avg_send_ms": round(self.total_send_seconds / self.sent_count * 1000, 3) if self.sent_count else 0.0,
+            "max_send_ms": round(self.max_send_seconds * 1000, 3),
+        }
+
+
+def _serialize_message(message: dict) -> str:
+    """序列化消息（与WebSocket.send_json格式一致），广播时只序列化一次"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
 # WebSocket连接管理器
 class ConnectionManager:
-    """WebSocket连接管理器，支持心跳检测和自动清理失效连接"""
+    """
+    WebSocket连接管理器，支持心跳检测和自动清理失效连接
+    
+    连接注册表基于集合和反向索引，建立、断开连接均为O(1)；
+    心跳超时由按截止时间排序的最小堆驱动，每次检测只处理到期的连接，为O(log n)。
+    """
     
-    def __init__(self):
-        # 存储活跃的连接：{user_id: [websocket1, websocket2, ...]}
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        # 存储连接的最后心跳时间：{websocket: last_ping_time}
-        self.connection_heartbeat: Dict[WebSocket, datetime] = {}
+    def __init__(self, backplane=None):
+        # 存储活跃的连接：{user_id: {websocket1, websocket2, ...}}
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # 反向索引：{websocket: user_id}
+        self.connection_users: Dict[WebSocket, str] = {}
+        # 存储连接的最后心跳时间（time.monotonic()）：{websocket: last_ping_time}
+        self.connection_heartbeat: Dict[WebSocket, float] = {}
+        # 心跳截止时间堆：[(deadline, seq, websocket)]，心跳更新时不改堆，到期时再核对最后心跳
+        self._heartbeat_heap: List[Tuple[float, int, WebSocket]] = []
+        self._heartbeat_seq = 0
         # 心跳超时时间（秒）
         self.heartbeat_timeout = 60
+        # 心跳检测最长间隔（秒）
+        self.heartbeat_check_interval = 30
         # 启动心跳检测任务
         self._heartbeat_task: Optional[asyncio.Task] = None
+        # 每个连接的发送队列：{websocket: ConnectionSender}
+        self.senders: Dict[WebSocket, ConnectionSender] = {}
+        # 跨worker投递通道：消息先发布到通道，再由持有接收者连接的worker投递
+        self.backplane = backplane or create_chat_backplane()
+        self._backplane_started = False
     
     async def start_heartbeat_check(self):
         """启动心跳检测任务"""
         if self._heartbeat_task is None or self._heartbeat_task.done():
             self._heartbeat_task = asyncio.create_task(self._check_heartbeat())
     
+    def _schedule_heartbeat_deadline(self, websocket: WebSocket, deadline: float):
+        self._heartbeat_seq += 1
+        heapq.heappush(self._heartbeat_heap, (deadline, self._heartbeat_seq, websocket))
+    
+    def _pop_expired_connections(self, now: float) -> List[WebSocket]:
+        """
+        弹出已到截止时间的堆项并返回真正超时的连接
+        
+        期间有过心跳的连接按最后心跳时间重新入堆；已移除连接的堆项直接丢弃。
+        """
+        expired: List[WebSocket] = []
+        heap = self._heartbeat_heap
+        while heap and heap[0][0] <= now:
+            _, _, websocket = heapq.heappop(heap)
+            last_ping = self.connection_heartbeat.get(websocket)
+            if last_ping is None:
+                continue
+            deadline = last_ping + self.heartbeat_timeout
+            if deadline <= now:
+                expired.append(websocket)
+            else:
+                self._schedule_heartbeat_deadline(websocket, deadline)
+        return expired
+    
     async def _check_heartbeat(self):
-        """定期检查连接心跳，清理超时连接"""
+        """检查连接心跳，清理超时连接（休眠到最近的截止时间，最长heartbeat_check_interval）"""
         while True:
             try:
-                await asyncio.sleep(30)  # 每30秒检查一次
-                current_time = utc_now()
-                timeout_connections: Set[WebSocket] = set()
-                
-                # 检查所有连接的心跳时间
-                for websocket, last_ping in list(self.connection_heartbeat.items()):
-                    if (current_time - last_ping).total_seconds() > self.heartbeat_timeout:
-                        timeout_connections.add(websocket)
+                if self._heartbeat_heap:
+                    delay = self._heartbeat_heap[0][0] - time.monotonic()
+                    delay = min(max(delay, 1.0), self.heartbeat_check_interval)
+                else:
+                    delay = self.heartbeat_check_interval
+                await asyncio.sleep(delay)
                 
                 # 清理超时连接
-                for websocket in timeout_connections:
+                for websocket in self._pop_expired_connections(time.monotonic()):
                     await self._remove_connection(websocket, reason="心跳超时")
                     
             except asyncio.CancelledError:
@@ -70,23 +204,30 @@ class ConnectionManager:
     
     async def _remove_connection(self, websocket: WebSocket, reason: str = "未知原因"):
         """移除连接（内部方法）"""
-        try:
-            # 关闭WebSocket连接
-            await websocket.close(code=1000, reason=reason)
-        except Exception as e:
-            logger.debug(f"关闭WebSocket连接时出错: {str(e)}")
+        # 停止发送队列
+        sender = self.senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
         
-        # 从心跳记录中移除
-        if websocket in self.connection_heartbeat:
-            del self.connection_heartbeat[websocket]
+        # 从心跳记录中移除（堆中的截止时间项到期时丢弃）
+        self.connection_heartbeat.pop(websocket, None)
         
         # 从活跃连接中移除
-        for user_id, connections in list(self.active_connections.items()):
-            if websocket in connections:
-                connections.remove(websocket)
+        user_id = self.connection_users.pop(websocket, None)
+        if user_id is not None:
+            connections = self.active_connections.get(user_id)
+            if connections is not None:
+                connections.discard(websocket)
                 if not connections:
                     del self.active_connections[user_id]
-                break
+                    # 本进程该用户已无连接，取消订阅
+                    await self.backplane.unsubscribe(user_id)
+        
+        try:
+            # 关闭WebSocket连接
+            await websocket.close(code=1000, reason=reason)
+        except Exception as e:
+            logger.debug(f"关闭WebSocket连接时出错: {str(e)}")
         
         logger.info(f"WebSocket连接已移除: {reason}")
     
@@ -94,11 +235,18 @@ class ConnectionManager:
         """建立WebSocket连接"""
         try:
             await websocket.accept()
+            await self.start_backplane()
             if user_id not in self.active_connections:
-                self.active_connections[user_id] = []
-            self.active_connections[user_id].append(websocket)
+                self.active_connections[user_id] = set()
+                # 本进程出现该用户的第一个连接，订阅其频道
+                await self.backplane.subscribe(user_id)
+            self.active_connections[user_id].add(websocket)
+            self.connection_users[websocket] = user_id
+            self.senders[websocket] = ConnectionSender(websocket, user_id, self)
             # 记录连接时间作为初始心跳
-            self.connection_heartbeat[websocket] = utc_now()
+            now = time.monotonic()
+            self.connection_heartbeat[websocket] = now
+            self._schedule_heartbeat_deadline(websocket, now + self.heartbeat_timeout)
             
             # 确保心跳检测任务运行
             await self.start_heartbeat_check()
@@ -113,47 +261,100 @@ class ConnectionManager:
         asyncio.create_task(self._remove_connection(websocket, "主动断开"))
     
     async def update_heartbeat(self, websocket: WebSocket):
-        """更新连接心跳时间"""
-        self.connection_heartbeat[websocket] = datetime.utcnow()
+        """更新连接心跳时间（只更新记录，不调整堆）"""
+        if websocket in self.connection_heartbeat:
+            self.connection_heartbeat[websocket] = time.monotonic()
+    
+    async def start_backplane(self):
+        """启动投递通道（首次建立连接时调用）"""
+        if not self._backplane_started:
+            self._backplane_started = True
+            await self.backplane.start(self._deliver_local)
+    
+    async def close(self):
+        """关闭投递通道、发送队列和心跳检测任务（应用关闭时调用）"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        for sender in self.senders.values():
+            sender.stop()
+        if self._backplane_started:
+            self._backplane_started = False
+            await self.backplane.stop()
+    
+    async def is_user_online(self, user_id: str) -> bool:
+        """用户是否在任意worker上有连接"""
+        return await self.backplane.is_online(user_id)
     
     async def send_personal_message(self, message: dict, user_id: str):
-        """向特定用户发送消息"""
-        if user_id not in self.active_connections:
-            return
-        
-        # 收集需要移除的失效连接
-        invalid_connections: List[WebSocket] = []
+        """向特定用户发送消息（经投递通道，接收者连接在任意worker上均可送达）"""
+        await self.backplane.publish(user_id, message)
+    
+    async def broadcast(self, message: dict):
+        """广播消息给所有worker上的所有连接"""
+        await self.backplane.broadcast(message)
+    
+    async def _deliver_local(self, user_id: Optional[str], message: dict):
+        """投递通道回调：发送给本进程的连接，user_id为None时发送给本进程所有连接"""
+        if user_id is None:
+            self._broadcast_local(message)
+        else:
+            self._send_local(message, user_id)
+    
+    def send_to_connection(self, websocket: WebSocket, message: dict) -> bool:
+        """
+        通过发送队列向单个连接发送消息（与投递消息共用队列，保证同一连接的写入串行）
         
-        for connection in self.active_connections[user_id]:
-            try:
-                await connection.send_json(message)
-                # 发送成功，更新心跳
-                await self.update_heartbeat(connection)
-            except Exception as e:
-                logger.warning(f"发送消息失败，连接可能已断开: {str(e)}")
-                # 记录失效连接，稍后移除
-                invalid_connections.append(connection)
+        Returns:
+            bool: 是否入队成功
+        """
+        sender = self.senders.get(websocket)
+        return sender.enqueue(_serialize_message(message)) if sender else False
+    
+    def _send_local(self, message: dict, user_id: str):
+        """向本进程中特定用户的连接发送消息（只入队，不等待发送完成）"""
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
         
-        # 移除失效连接
-        for connection in invalid_connections:
-            await self._remove_connection(connection, "发送消息失败")
+        text = _serialize_message(message)
+        for connection in connections:
+            sender = self.senders.get(connection)
+            if sender:
+                sender.enqueue(text)
     
-    async def broadcast(self, message: dict):
-        """广播消息给所有连接"""
-        invalid_connections: List[WebSocket] = []
-        
-        for user_id, connections in list(self.active_connections.items()):
-            for connection in connections:
-                try:
-                    await connection.send_json(message)
-                    await self.update_heartbeat(connection)
-                except Exception as e:
-                    logger.warning(f"广播消息失败: {str(e)}")
-                    invalid_connections.append(connection)
-        
-        # 移除失效连接
-        for connection in invalid_connections:
-            await self._remove_connection(connection, "广播消息失败")
+    def _broadcast_local(self, message: dict):
+        """广播消息给本进程所有连接（只序列化一次，各连接的写协程并发发送）"""
+        text = _serialize_message(message)
+        for sender in list(self.senders.values()):
+            sender.enqueue(text)
+    
+    def get_metrics(self, top: int = 20) -> dict:
+        """
+        获取发送队列指标
+        
+        Args:
+            top: 返回队列积压最多的前N个连接明细
+            
+        Returns:
+            dict: 汇总指标和积压最多的连接明细
+        """
+        stats = [sender.stats() for sender in self.senders.values()]
+        stats.sort(key=lambda item: item["queue_depth"], reverse=True)
+        total_sent = sum(item["sent"] for item in stats)
+        total_send_seconds = sum(sender.total_send_seconds for sender in self.senders.values())
+        return {
+            "connections": len(stats),
+            "users": len(self.active_connections),
+            "queue_capacity": settings.CHAT_SEND_QUEUE_SIZE,
+            "slow_consumer_policy": settings.CHAT_SLOW_CONSUMER_POLICY,
+            "total_queued": sum(item["queue_depth"] for item in stats),
+            "total_sent": total_sent,
+            "total_dropped": sum(item["dropped"] for item in stats),
+            "avg_send_ms": round(total_send_seconds / total_sent * 1000, 3) if total_sent else 0.0,
+            "max_send_ms": max((item["max_send_ms"] for item in stats), default=0.0),
+            "top_connections": stats[:top],
+        }
 
 
 # 创建全局连接管理器
@@ -225,7 +426,7 @@ async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(
                     if message_type == "ping":
                         # 心跳检测
                         await manager.update_heartbeat(websocket)
-                        await websocket.send_json({"type": "pong"})
+                        manager.send_to_connection(websocket, {"type": "pong"})
                     elif message_type == "message":
                         # 普通消息（需要保存到数据库）
                         receiver_id = message_data.get("receiver_id")
@@ -240,8 +441,8 @@ async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(
                                 "timestamp": message_data.get("timestamp")
                             }, receiver_id)
                             
-                            # 确认发送成功
-                            await websocket.send_json({
+                            # 确认发送成功（经发送队列，避免与投递消息并发写同一连接）
+                            manager.send_to_connection(websocket, {
                                 "type": "message_sent",
                                 "message_id": message_data.get("message_id")
                             })
@@ -270,7 +471,7 @@ async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(
             if message_type == "ping":
                 # 心跳检测
                 await manager.update_heartbeat(websocket)
-                await websocket.send_json({"type": "pong"})
+                manager.send_to_connection(websocket, {"type": "pong"})
             elif message_type == "message":
                 # 普通消息（需要保存到数据库）
                 # 这里可以添加消息保存逻辑
@@ -286,8 +487,8 @@ async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(
                         "timestamp": message_data.get("timestamp")
                     }, receiver_id)
                     
-                    # 确认发送成功
-                    await websocket.send_json({
+                    # 确认发送成功（经发送队列，避免与投递消息并发写同一连接）
+                    manager.send_to_connection(websocket, {
                         "type": "message_sent",
                         "message_id": message_data.get("message_id")
                     })
@@ -303,6 +504,22 @@ async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(
 
 # ==================== REST API接口 ====================
 
+@router.get("/metrics")
+async def get_chat_metrics(
+    current_user: User = Depends(require_admin())
+):
+    """
+    获取本worker的WebSocket发送队列指标（管理员）
+    
+    Args:
+        current_user: 当前登录用户（管理员）
+        
+    Returns:
+        dict: 连接数、队列积压、发送耗时、丢弃数以及积压最多的连接
+    """
+    return manager.get_metrics()
+
+
 @router.get("/sessions", response_model=ChatSessionListResponse)
 async def get_chat_sessions(
     current_user: User = Depends(get_current_user),
@@ -709,18 +926,22 @@ async def create_chat_session(
 @router.get("/sessions/{session_id}/messages", response_model=MessageListResponse)
 async def get_messages(
     session_id: str,
-    page: int = Query(1, ge=1, description="页码"),
+    before: Optional[str] = Query(None, description="游标：返回早于该游标的消息（向上翻历史）"),
+    after: Optional[str] = Query(None, description="游标：返回晚于该游标的消息（拉取新消息）"),
     page_size: int = Query(50, ge=1, le=100, description="每页数量"),
+    include_total: bool = Query(False, description="是否返回消息总数（需要额外统计，默认不返回）"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    获取会话消息列表
+    获取会话消息列表（游标分页，按时间倒序）
     
     Args:
         session_id: 会话ID
-        page: 页码
+        before: 返回早于该游标的消息
+        after: 返回晚于该游标的消息
         page_size: 每页数量
+        include_total: 是否返回消息总数
         current_user: 当前登录用户
         db: 数据库会话
         
@@ -728,7 +949,7 @@ async def get_messages(
         MessageListResponse: 消息列表
         
     Raises:
-        HTTPException: 如果会话不存在或无权查看
+        HTTPException: 如果会话不存在、无权查看或游标无效
     """
     # 检查会话是否存在且用户有权访问
     session_result = await db.execute(
@@ -748,40 +969,31 @@ async def get_messages(
             detail="聊天会话不存在"
         )
     
-    # 查询消息
+    # 按 (created_at, id) 游标分页，由 (session_id, created_at, id) 索引支撑
     query = select(Message).where(Message.session_id == session_id)
+    try:
+        page = await keyset_paginate(
+            db, query, Message, page_size,
+            before=before, after=after, include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    messages = page["items"]
     
-    # 获取总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # 分页查询（按时间倒序）
-    offset = (page - 1) * page_size
-    query = query.order_by(Message.created_at.desc()).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    messages = result.scalars().all()
-    
-    # 标记消息为已读
-    unread_messages = [msg for msg in messages if not msg.is_read and msg.receiver_id == current_user.id]
-    if unread_messages:
-        for msg in unread_messages:
-            msg.is_read = True
-        
-        # 更新会话的未读计数
-        if session.user1_id == current_user.id:
-            session.unread_count_user1 = 0
-        else:
-            session.unread_count_user2 = 0
-        
-        await db.commit()
+    # 标记消息为已读：以本页最新一条消息为高水位，一条UPDATE标记会话中不晚于它的未读消息
+    if messages and any(not msg.is_read and msg.receiver_id == current_user.id for msg in messages):
+        is_system_session = session.user2_id is None and session.school_id is None
+        await mark_messages_read(
+            db, current_user.id,
+            UNREAD_SYSTEM if is_system_session else UNREAD_CHAT,
+            Message.session_id == session_id,
+            high_water=(messages[0].created_at, messages[0].id)
+        )
     
-    return {
-        "items": messages,
-        "total": total,
-        "page": page,
-        "page_size": page_size
-    }
+    return page
 
 
 @router.post("/sessions/{session_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
@@ -852,6 +1064,7 @@ async def create_message(
     
     await db.commit()
     await db.refresh(message)
+    await record_new_message(message.receiver_id, message.message_type)
     
     # 确保message.created_at有值
     if not message.created_at:
@@ -891,33 +1104,36 @@ async def mark_message_read(
         HTTPException: 如果消息不存在或无权操作
     """
     result = await db.execute(
-        select(Message).where(
+        select(Message.message_type).where(
             Message.id == message_id,
             Message.receiver_id == current_user.id
         )
     )
-    message = result.scalar_one_or_none()
+    message_type = result.scalar_one_or_none()
     
-    if not message:
+    if message_type is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="消息不存在"
         )
     
-    if not message.is_read:
-        message.is_read = True
-        
-        # 更新会话的未读计数
-        session_result = await db.execute(
-            select(ChatSession).where(ChatSession.id == message.session_id)
-        )
-        session = session_result.scalar_one_or_none()
-        
-        if session:
-            if session.user1_id == current_user.id:
-                session.unread_count_user1 = max(0, session.unread_count_user1 - 1)
-            else:
-                session.unread_count_user2 = max(0, session.unread_count_user2 - 1)
-        
-        await db.commit()
+    await mark_messages_read(db, current_user.id, unread_kind(message_type), Message.id == message_id)
 
+
+
+@router.get("/unread-count")
+async def get_chat_unread_count(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取未读聊天消息数量（读取未读计数，不扫描消息表）
+    
+    Args:
+        current_user: 当前登录用户
+        db: 数据库会话
+        
+    Returns:
+        dict: 未读聊天消息数量
+    """
+    return {"count": await get_unread_count(db, current_user.id, UNREAD_CHAT)}
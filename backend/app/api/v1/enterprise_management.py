@@ -11,6 +11,7 @@ from pydantic import BaseModel, Field
 from app.core.database import get_db
 from app.api.v1.auth import get_current_user
 from app.models.user import User
+from app.services.principal_service import invalidate_user_principal
 from app.models.profile import EnterpriseProfile, StudentProfile
 from app.models.job import Job, JobApplication, Resume
 from app.models.interview import Interview, Offer
@@ -259,13 +260,13 @@ async def create_sub_account(
         )
     
     # 创建用户
-    from app.core.security import get_password_hash
+    from app.core.security import get_password_hash_async
     new_user = User(
         id=str(uuid4()),
         username=account_data.username,
         phone=account_data.phone,
         email=account_data.email,
-        password_hash=get_password_hash(account_data.password),
+        password_hash=await get_password_hash_async(account_data.password),
         user_type="ENTERPRISE",
         status="ACTIVE"
     )
@@ -369,6 +370,8 @@ async def delete_sub_account(
         await db.delete(user)
     
     await db.commit()
+    if user:
+        await invalidate_user_principal(user.username)
 
 
 # ==================== 人才库管理 ====================
@@ -6,12 +6,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import Optional, List
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
+from app.core.cache import get_or_set_cache
 from app.models.industry_job_type import IndustryCategory, SubIndustry, JobType
 from pydantic import BaseModel
 
 router = APIRouter()
 
+# 维表数据几乎不变：缓存1天，过期后1小时内先返回旧值再后台刷新
+DIMENSION_CACHE_TTL = 24 * 3600
+DIMENSION_CACHE_STALE_TTL = 3600
+
 
 class IndustryCategoryResponse(BaseModel):
     """行业分类响应"""
@@ -51,18 +56,28 @@ class JobTypeResponse(BaseModel):
 
 
 @router.get("/industry-categories", response_model=List[IndustryCategoryResponse])
-async def get_industry_categories(
-    db: AsyncSession = Depends(get_db)
-):
+async def get_industry_categories():
     """
     获取所有行业分类（一级行业）
     """
-    result = await db.execute(
-        select(IndustryCategory)
-        .order_by(IndustryCategory.sort_order, IndustryCategory.name)
+    async def load_categories():
+        # 后台刷新时请求已结束，使用独立的数据库会话
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(IndustryCategory)
+                .order_by(IndustryCategory.sort_order, IndustryCategory.name)
+            )
+            return [
+                IndustryCategoryResponse.model_validate(category).model_dump()
+                for category in result.scalars().all()
+            ]
+    
+    return await get_or_set_cache(
+        "industry:categories",
+        load_categories,
+        expire=DIMENSION_CACHE_TTL,
+        stale_ttl=DIMENSION_CACHE_STALE_TTL
     )
-    categories = result.scalars().all()
-    return categories
 
 
 @router.get("/sub-industries", response_model=List[SubIndustryResponse])
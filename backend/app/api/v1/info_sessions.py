@@ -5,11 +5,12 @@ from fastapi import APIRouter, Depends, Query, HTTPException, status, Body
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
-from typing import Optional
+from typing import List, Optional
 from uuid import uuid4
 import json
 
 from app.core.database import get_db
+from app.services.identity_context import get_identity_context
 from app.api.v1.auth import get_current_user, get_current_user_optional
 from app.models.user import User
 from app.models.activity import InfoSession, InfoSessionRegistration
@@ -18,10 +19,31 @@ from app.schemas.activity import (
     InfoSessionCreate, InfoSessionUpdate, InfoSessionResponse, InfoSessionListResponse,
     InfoSessionRegistrationCreate, InfoSessionRegistrationResponse
 )
+from app.core.url_signer import url_signer
 
 router = APIRouter()
 
 
+def _build_info_session_responses(info_sessions) -> List[InfoSessionResponse]:
+    """
+    组装宣讲会响应，资料URL整页一次批量签名
+    
+    Args:
+        info_sessions: 宣讲会ORM对象列表
+        
+    Returns:
+        List[InfoSessionResponse]: 宣讲会响应列表（保持输入顺序）
+    """
+    responses = [InfoSessionResponse.model_validate(session) for session in info_sessions]
+    signed_urls = url_signer.sign_many(
+        url for response in responses for url in (response.materials or [])
+    )
+    for response in responses:
+        if response.materials:
+            response.materials = [signed_urls.get(url, url) for url in response.materials]
+    return responses
+
+
 @router.get("", response_model=InfoSessionListResponse)
 async def get_info_sessions(
     page: int = Query(1, ge=1, description="页码"),
@@ -116,8 +138,8 @@ async def get_info_sessions(
     result = await db.execute(query)
     info_sessions = result.scalars().all()
     
-    # 将ORM对象转换为响应模型
-    info_session_responses = [InfoSessionResponse.model_validate(session) for session in info_sessions]
+    # 将ORM对象转换为响应模型（资料URL按页批量签名）
+    info_session_responses = _build_info_session_responses(info_sessions)
     
     return {
         "items": info_session_responses,
@@ -189,8 +211,8 @@ async def get_my_info_session_registrations(
     result = await db.execute(query)
     info_sessions = result.scalars().all()
     
-    # 将ORM对象转换为响应模型
-    info_session_responses = [InfoSessionResponse.model_validate(session) for session in info_sessions]
+    # 将ORM对象转换为响应模型（资料URL按页批量签名）
+    info_session_responses = _build_info_session_responses(info_sessions)
     
     return {
         "items": info_session_responses,
@@ -255,8 +277,8 @@ async def get_my_created_info_sessions(
     result = await db.execute(query)
     info_sessions = result.scalars().all()
     
-    # 将ORM对象转换为响应模型
-    info_session_responses = [InfoSessionResponse.model_validate(session) for session in info_sessions]
+    # 将ORM对象转换为响应模型（资料URL按页批量签名）
+    info_session_responses = _build_info_session_responses(info_sessions)
     
     return {
         "items": info_session_responses,
@@ -378,7 +400,7 @@ async def get_info_session(
             detail="宣讲会不存在"
         )
     
-    return info_session
+    return _build_info_session_responses([info_session])[0]
 
 
 @router.post("", response_model=InfoSessionResponse, status_code=status.HTTP_201_CREATED)
@@ -949,10 +971,8 @@ async def invite_students_batch(
         )
     
     # 获取企业信息
-    enterprise_result = await db.execute(
-        select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-    )
-    enterprise = enterprise_result.scalar_one_or_none()
+    identity = get_identity_context(db, current_user)
+    enterprise = await identity.get_enterprise_profile()
     
     if not enterprise:
         raise HTTPException(
@@ -982,8 +1002,7 @@ async def invite_students_batch(
     
     # 检查权限（主账号和子账号都可以邀请主账号创建的宣讲会）
     # 使用 get_enterprise_ids_for_query 来获取所有相关的企业ID（包括主账号和子账号）
-    from app.services.enterprise_service import get_enterprise_ids_for_query
-    enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+    enterprise_ids = await identity.get_enterprise_ids()
     logger.info(f"权限检查 - 宣讲会企业ID: {info_session.enterprise_id}, 当前企业ID: {enterprise.id}, is_main_account: {enterprise.is_main_account}, main_account_id: {enterprise.main_account_id}, 企业ID列表: {enterprise_ids}")
     
     if info_session.enterprise_id not in enterprise_ids:
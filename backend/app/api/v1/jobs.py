@@ -1,26 +1,154 @@
 """
 职位相关API路由
 """
+import hashlib
+import json
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
-from typing import Optional
+from typing import Any, List, Optional, Sequence
 from uuid import uuid4
 
 from app.core.database import get_db
+from app.services.identity_context import get_identity_context
 from app.core.logging import get_logger
-from app.core.cache import get_cache, set_cache
+from app.core.cache import (
+    get_cache, set_cache, tag_cache_key, invalidate_cache_tags, record_cache_access
+)
 from app.api.v1.auth import get_current_user, get_current_user_optional
 from app.models.user import User
 from app.models.job import Job
 from app.models.profile import EnterpriseProfile
 from app.schemas.job import JobCreate, JobUpdate, JobResponse, JobListResponse
 from app.utils.search import fulltext_search_jobs, fallback_search_jobs
+from app.core.url_signer import url_signer
+from app.services.counter_service import job_apply_counter, job_view_counter
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# 职位列表缓存
+JOBS_LIST_CACHE_NAMESPACE = "jobs:list"
+JOBS_LIST_CACHE_TTL = 300  # 5分钟
+JOBS_LIST_TAG_ALL = "jobs:list:all"
+
+
+def _job_to_response(job: Job, enterprise: Optional[EnterpriseProfile]) -> JobResponse:
+    """
+    将职位ORM对象和企业信息组装为响应模型
+    
+    Args:
+        job: 职位对象
+        enterprise: 职位所属企业（可能为None）
+        
+    Returns:
+        JobResponse: 职位响应
+    """
+    job_dict = {
+        "id": job.id,
+        "enterprise_id": job.enterprise_id,
+        "enterprise_name": enterprise.company_name if enterprise else None,
+        "enterprise_logo": enterprise.logo_url if enterprise else None,
+        "enterprise_industry": enterprise.industry if enterprise else None,
+        "enterprise_scale": enterprise.scale if enterprise else None,
+        "title": job.title,
+        "department": job.department,
+        "job_type": job.job_type,
+        "salary_min": job.salary_min,
+        "salary_max": job.salary_max,
+        "work_location": job.work_location,
+        "experience": job.experience,
+        "education": job.education,
+        "description": job.description,
+        "requirements": job.requirements,
+        "status": job.status,
+        "view_count": job_view_counter.current(job.id, job.view_count),
+        "apply_count": job_apply_counter.current(job.id, job.apply_count),
+        "tags": job.tags,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+    return JobResponse.model_validate(job_dict)
+
+
+async def _build_job_responses(db: AsyncSession, jobs: Sequence[Job]) -> List[JobResponse]:
+    """
+    批量组装职位响应，一页内的企业信息只用一次IN查询加载（避免N+1查询），企业logo批量签名
+    
+    Args:
+        db: 数据库会话
+        jobs: 职位列表
+        
+    Returns:
+        List[JobResponse]: 职位响应列表（保持输入顺序）
+    """
+    enterprise_ids = {job.enterprise_id for job in jobs if job.enterprise_id}
+    enterprises = {}
+    if enterprise_ids:
+        enterprise_result = await db.execute(
+            select(EnterpriseProfile).where(EnterpriseProfile.id.in_(enterprise_ids))
+        )
+        enterprises = {e.id: e for e in enterprise_result.scalars().all()}
+    
+    responses = [_job_to_response(job, enterprises.get(job.enterprise_id)) for job in jobs]
+    
+    # 企业logo按页批量签名
+    signed_logos = url_signer.sign_many(response.enterprise_logo for response in responses)
+    for response in responses:
+        if response.enterprise_logo:
+            response.enterprise_logo = signed_logos[response.enterprise_logo]
+    return responses
+
+
+def _build_jobs_list_cache_key(**filters: Any) -> str:
+    """
+    构建职位列表缓存键
+    
+    空字符串与None在查询中等价，先归一为None，再按键排序序列化后取摘要，
+    保证同一组条件只对应一个键，且键长度不受关键词长度影响。
+    
+    Args:
+        filters: 全部查询条件（分页、过滤条件和可见范围）
+        
+    Returns:
+        str: 缓存键
+    """
+    normalized = {name: (None if value == "" else value) for name, value in filters.items()}
+    digest = hashlib.md5(
+        json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return f"{JOBS_LIST_CACHE_NAMESPACE}:{digest}"
+
+
+def _jobs_list_enterprise_tag(enterprise_id: str) -> str:
+    """职位列表的企业缓存标签"""
+    return f"jobs:list:enterprise:{enterprise_id}"
+
+
+async def _cache_jobs_list(cache_key: str, response_data: dict, tags: List[str]):
+    """
+    写入职位列表缓存并登记标签
+    
+    Args:
+        cache_key: 缓存键
+        response_data: 列表响应数据
+        tags: 缓存标签
+    """
+    await set_cache(cache_key, jsonable_encoder(response_data), expire=JOBS_LIST_CACHE_TTL)
+    await tag_cache_key(cache_key, tags, expire=JOBS_LIST_CACHE_TTL)
+
+
+async def _invalidate_jobs_list_cache(enterprise_id: str):
+    """
+    职位写操作后失效相关的列表缓存（全局列表和该企业的列表）
+    
+    Args:
+        enterprise_id: 职位所属企业ID
+    """
+    await invalidate_cache_tags(JOBS_LIST_TAG_ALL, _jobs_list_enterprise_tag(enterprise_id))
+
 
 @router.get("", response_model=JobListResponse)
 async def get_jobs(
@@ -31,72 +159,72 @@ async def get_jobs(
     status_filter: Optional[str] = Query(None, alias="status", description="职位状态过滤"),
     job_type: Optional[str] = Query(None, description="职位类型过滤"),
     education: Optional[str] = Query(None, description="学历要求过滤"),
+    exact_total: bool = Query(False, description="关键词搜索时是否返回精确总数（默认超过1000条时返回封顶的总数）"),
     current_user: Optional[User] = Depends(get_current_user_optional),
     db: AsyncSession = Depends(get_db)
 ):
     """
     获取职位列表
     
+    先查缓存再访问数据库：缓存键覆盖全部过滤条件，职位写操作按标签失效。
+    
     Args:
         page: 页码
         page_size: 每页数量
         keyword: 关键词
         location: 工作地点
         status_filter: 职位状态过滤
+        job_type: 职位类型过滤
+        education: 学历要求过滤
+        exact_total: 关键词搜索时是否返回精确总数
         db: 数据库会话
         
     Returns:
         JobListResponse: 职位列表
     """
+    # 企业用户未指定状态时只看本企业职位（含草稿），缓存需按用户隔离
+    enterprise_scoped = (
+        not status_filter
+        and current_user is not None
+        and current_user.user_type == "ENTERPRISE"
+    )
+    cache_key = _build_jobs_list_cache_key(
+        page=page,
+        page_size=page_size,
+        keyword=keyword,
+        location=location,
+        status=status_filter,
+        job_type=job_type,
+        education=education,
+        exact_total=exact_total,
+        scope=f"user:{current_user.id}" if enterprise_scoped else "public",
+    )
+    cached_result = await get_cache(cache_key)
+    record_cache_access(JOBS_LIST_CACHE_NAMESPACE, cached_result is not None)
+    if cached_result is not None:
+        logger.debug(f"从缓存获取职位列表: {cache_key}")
+        return cached_result
+    
     # 如果有关键词，尝试使用全文搜索
     if keyword:
         try:
             offset = (page - 1) * page_size
-            jobs, total = await fulltext_search_jobs(
-                db, keyword, location, page_size, offset
+            jobs, total, total_capped = await fulltext_search_jobs(
+                db, keyword, location, page_size, offset, exact_total=exact_total
             )
             # 如果全文搜索成功，直接返回
             if jobs and len(jobs) > 0:
-                # 将ORM对象转换为响应模型，并获取企业信息
-                job_responses = []
-                for job in jobs:
-                    # 获取企业信息
-                    enterprise_result = await db.execute(
-                        select(EnterpriseProfile).where(EnterpriseProfile.id == job.enterprise_id)
-                    )
-                    enterprise = enterprise_result.scalar_one_or_none()
-                    
-                    job_dict = {
-                        "id": job.id,
-                        "enterprise_id": job.enterprise_id,
-                        "enterprise_name": enterprise.company_name if enterprise else None,
-                        "enterprise_logo": enterprise.logo_url if enterprise else None,
-                        "enterprise_industry": enterprise.industry if enterprise else None,
-                        "enterprise_scale": enterprise.scale if enterprise else None,
-                        "title": job.title,
-                        "department": job.department,
-                        "job_type": job.job_type,
-                        "salary_min": job.salary_min,
-                        "salary_max": job.salary_max,
-                        "work_location": job.work_location,
-                        "experience": job.experience,
-                        "education": job.education,
-                        "description": job.description,
-                        "requirements": job.requirements,
-                        "status": job.status,
-                        "view_count": job.view_count,
-                        "apply_count": job.apply_count,
-                        "tags": job.tags,
-                        "created_at": job.created_at,
-                        "updated_at": job.updated_at,
-                    }
-                    job_responses.append(JobResponse.model_validate(job_dict))
-                return {
+                # 将ORM对象转换为响应模型（企业信息一次批量加载）
+                job_responses = await _build_job_responses(db, jobs)
+                response_data = {
                     "items": job_responses,
                     "total": total,
                     "page": page,
-                    "page_size": page_size
+                    "page_size": page_size,
+                    "total_capped": total_capped
                 }
+                await _cache_jobs_list(cache_key, response_data, [JOBS_LIST_TAG_ALL])
+                return response_data
         except Exception as e:
             logger.warning(f"全文搜索失败，使用普通搜索: {str(e)}")
             logger.exception(e)  # 记录详细错误信息
@@ -126,55 +254,35 @@ async def get_jobs(
     if education:
         query = query.where(Job.education == education)
     
+    # 缓存标签：企业范围的列表按企业打标签，其余列表归入全局标签
+    cache_tags = [JOBS_LIST_TAG_ALL]
+    
     # 状态过滤
     if status_filter:
         query = query.where(Job.status == status_filter)
-    else:
-        # 如果未指定状态过滤，根据用户类型决定
-        # 企业用户可以看到自己的所有职位（包括草稿），其他用户只能看到已发布的
-        if current_user and current_user.user_type == "ENTERPRISE":
-            # 企业用户：显示主账号和所有子账号的职位
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
-            if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
-                query = query.where(Job.enterprise_id.in_(enterprise_ids))
-            else:
-                # 如果企业信息不存在，返回空列表
-                return {
-                    "items": [],
-                    "total": 0,
-                    "page": page,
-                    "page_size": page_size
-                }
+    elif enterprise_scoped:
+        # 企业用户：显示主账号和所有子账号的职位（包括草稿）
+        enterprise_ids = await get_identity_context(db, current_user).get_enterprise_ids()
+        if enterprise_ids:
+            query = query.where(Job.enterprise_id.in_(enterprise_ids))
+            cache_tags = [_jobs_list_enterprise_tag(eid) for eid in enterprise_ids]
         else:
-            # 其他用户（学生、未登录等）只能看到已发布的职位
-            query = query.where(Job.status == "PUBLISHED")
+            # 如果企业信息不存在，返回空列表（不缓存，企业信息补全后立即生效）
+            return {
+                "items": [],
+                "total": 0,
+                "page": page,
+                "page_size": page_size
+            }
+    else:
+        # 其他用户（学生、未登录等）只能看到已发布的职位
+        query = query.where(Job.status == "PUBLISHED")
     
     # 获取总数
     count_query = select(func.count()).select_from(query.subquery())
     total_result = await db.execute(count_query)
     total = total_result.scalar() or 0
     
-    # 构建缓存键（包含企业ID，如果是企业用户）
-    enterprise_id_for_cache = None
-    if current_user and current_user.user_type == "ENTERPRISE":
-        enterprise_result = await db.execute(
-            select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-        )
-        enterprise = enterprise_result.scalar_one_or_none()
-        if enterprise:
-            enterprise_id_for_cache = enterprise.id
-    
-    cache_key = f"jobs:list:{page}:{page_size}:{keyword}:{location}:{status_filter}:{enterprise_id_for_cache}"
-    cached_result = await get_cache(cache_key)
-    if cached_result:
-        logger.debug(f"从缓存获取职位列表: {cache_key}")
-        return cached_result
-    
     # 分页查询
     offset = (page - 1) * page_size
     query = query.order_by(Job.created_at.desc()).offset(offset).limit(page_size)
@@ -182,40 +290,8 @@ async def get_jobs(
     result = await db.execute(query)
     jobs = result.scalars().all()
     
-    # 将ORM对象转换为响应模型，并获取企业信息
-    job_responses = []
-    for job in jobs:
-        # 获取企业信息
-        enterprise_result = await db.execute(
-            select(EnterpriseProfile).where(EnterpriseProfile.id == job.enterprise_id)
-        )
-        enterprise = enterprise_result.scalar_one_or_none()
-        
-        job_dict = {
-            "id": job.id,
-            "enterprise_id": job.enterprise_id,
-            "enterprise_name": enterprise.company_name if enterprise else None,
-            "enterprise_logo": enterprise.logo_url if enterprise else None,
-            "enterprise_industry": enterprise.industry if enterprise else None,
-            "enterprise_scale": enterprise.scale if enterprise else None,
-            "title": job.title,
-            "department": job.department,
-            "job_type": job.job_type,
-            "salary_min": job.salary_min,
-            "salary_max": job.salary_max,
-            "work_location": job.work_location,
-            "experience": job.experience,
-            "education": job.education,
-            "description": job.description,
-            "requirements": job.requirements,
-            "status": job.status,
-            "view_count": job.view_count,
-            "apply_count": job.apply_count,
-            "tags": job.tags,
-            "created_at": job.created_at,
-            "updated_at": job.updated_at,
-        }
-        job_responses.append(JobResponse.model_validate(job_dict))
+    # 将ORM对象转换为响应模型（企业信息一次批量加载）
+    job_responses = await _build_job_responses(db, jobs)
     
     response_data = {
         "items": job_responses,
@@ -224,8 +300,7 @@ async def get_jobs(
         "page_size": page_size
     }
     
-    # 缓存结果（5分钟）
-    await set_cache(cache_key, response_data, expire=300)
+    await _cache_jobs_list(cache_key, response_data, cache_tags)
     
     return response_data
 
@@ -257,10 +332,8 @@ async def get_job(
             detail="职位不存在"
         )
     
-    # 增加查看次数
-    job.view_count += 1
-    await db.commit()
-    await db.refresh(job)
+    # 增加查看次数（延迟批量写入，不在请求中提交）
+    job_view_counter.increment(job.id)
     
     # 获取企业信息
     enterprise_result = await db.execute(
@@ -268,32 +341,7 @@ async def get_job(
     )
     enterprise = enterprise_result.scalar_one_or_none()
     
-    job_dict = {
-        "id": job.id,
-        "enterprise_id": job.enterprise_id,
-        "enterprise_name": enterprise.company_name if enterprise else None,
-        "enterprise_logo": enterprise.logo_url if enterprise else None,
-        "enterprise_industry": enterprise.industry if enterprise else None,
-        "enterprise_scale": enterprise.scale if enterprise else None,
-        "title": job.title,
-        "department": job.department,
-        "job_type": job.job_type,
-        "salary_min": job.salary_min,
-        "salary_max": job.salary_max,
-        "work_location": job.work_location,
-        "experience": job.experience,
-        "education": job.education,
-        "description": job.description,
-        "requirements": job.requirements,
-        "status": job.status,
-        "view_count": job.view_count,
-        "apply_count": job.apply_count,
-        "tags": job.tags,
-        "created_at": job.created_at,
-        "updated_at": job.updated_at,
-    }
-    
-    return JobResponse.model_validate(job_dict)
+    return _job_to_response(job, enterprise)
 
 
 @router.post("", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
@@ -359,6 +407,8 @@ async def create_job(
     await db.commit()
     await db.refresh(job)
     
+    await _invalidate_jobs_list_cache(job.enterprise_id)
+    
     return job
 
 
@@ -431,6 +481,8 @@ async def update_job(
     await db.commit()
     await db.refresh(job)
     
+    await _invalidate_jobs_list_cache(job.enterprise_id)
+    
     return job
 
 
@@ -490,8 +542,11 @@ async def delete_job(
             detail="无权删除此职位"
         )
     
+    enterprise_id = job.enterprise_id
     await db.delete(job)
     await db.commit()
     
+    await _invalidate_jobs_list_cache(enterprise_id)
+    
     return None
 
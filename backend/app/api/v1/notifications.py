@@ -3,39 +3,46 @@
 """
 from fastapi import APIRouter, Depends, Query, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from typing import Optional
 
 from app.core.database import get_db
 from app.api.v1.auth import get_current_user
 from app.models.user import User
 from app.models.chat import Message
+from app.utils.pagination import keyset_paginate, decode_cursor
+from app.services import read_state_service
+from app.services.read_state_service import UNREAD_SYSTEM, mark_messages_read, unread_kind
 
 router = APIRouter()
 
 
 @router.get("")
 async def get_notifications(
-    page: int = Query(1, ge=1, description="页码"),
+    before: Optional[str] = Query(None, description="游标：返回早于该游标的消息"),
+    after: Optional[str] = Query(None, description="游标：返回晚于该游标的消息"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
     is_read: Optional[bool] = Query(None, description="是否已读过滤"),
+    include_total: bool = Query(False, description="是否返回消息总数（需要额外统计，默认不返回）"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    获取系统消息列表（只能查看自己的消息）
+    获取系统消息列表（只能查看自己的消息，游标分页，按时间倒序）
     
     Args:
-        page: 页码
+        before: 返回早于该游标的消息
+        after: 返回晚于该游标的消息
         page_size: 每页数量
         is_read: 是否已读过滤
+        include_total: 是否返回消息总数
         current_user: 当前登录用户
         db: 数据库会话
         
     Returns:
-        dict: 消息列表
+        dict: 消息列表，以及next_cursor/prev_cursor翻页游标
     """
-    # 构建查询（系统消息，且接收者是当前用户）
+    # 构建查询（系统消息，且接收者是当前用户），由 (receiver_id, message_type, created_at) 索引支撑
     query = select(Message).where(
         Message.receiver_id == current_user.id,
         Message.message_type == "SYSTEM"
@@ -45,23 +52,44 @@ async def get_notifications(
     if is_read is not None:
         query = query.where(Message.is_read == is_read)
     
-    # 获取总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-    
-    # 分页查询
-    offset = (page - 1) * page_size
-    query = query.order_by(Message.created_at.desc()).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    messages = result.scalars().all()
+    try:
+        return await keyset_paginate(
+            db, query, Message, page_size,
+            before=before, after=after, include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/read-all")
+async def mark_all_as_read(
+    up_to: Optional[str] = Query(None, description="游标：只标记不晚于该位置的消息（列表返回的prev_cursor），不传则标记全部"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    标记所有系统消息为已读（一条UPDATE）
     
-    return {
-        "items": messages,
-        "total": total,
-        "page": page,
-        "page_size": page_size
-    }
+    Args:
+        up_to: 高水位游标，避免把列表加载之后才到达的消息标记为已读
+        current_user: 当前登录用户
+        db: 数据库会话
+        
+    Returns:
+        dict: 成功消息和标记数量
+    """
+    try:
+        high_water = decode_cursor(up_to) if up_to else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    count = await mark_messages_read(db, current_user.id, UNREAD_SYSTEM, high_water=high_water)
+    return {"message": f"已标记{count}条消息为已读", "count": count}
 
 
 @router.post("/{message_id}/read")
@@ -81,17 +109,21 @@ async def mark_as_read(
     Returns:
         dict: 成功消息
     """
-    result = await db.execute(select(Message).where(Message.id == message_id))
-    message = result.scalar_one_or_none()
+    result = await db.execute(
+        select(Message.message_type).where(
+            Message.id == message_id,
+            Message.receiver_id == current_user.id
+        )
+    )
+    message_type = result.scalar_one_or_none()
     
-    if not message or message.receiver_id != current_user.id:
+    if message_type is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="消息不存在或无权操作"
         )
     
-    message.is_read = True
-    await db.commit()
+    await mark_messages_read(db, current_user.id, unread_kind(message_type), Message.id == message_id)
     
     return {"message": "标记成功"}
 
@@ -102,7 +134,7 @@ async def get_unread_count(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    获取未读消息数量
+    获取未读消息数量（读取未读计数，不扫描消息表）
     
     Args:
         current_user: 当前登录用户
@@ -111,14 +143,6 @@ async def get_unread_count(
     Returns:
         dict: 未读消息数量
     """
-    result = await db.execute(
-        select(func.count()).where(
-            Message.receiver_id == current_user.id,
-            Message.message_type == "SYSTEM",
-            Message.is_read == False
-        )
-    )
-    count = result.scalar()
+    count = await read_state_service.get_unread_count(db, current_user.id, UNREAD_SYSTEM)
     
     return {"count": count}
-
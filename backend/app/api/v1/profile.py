@@ -10,12 +10,14 @@ from typing import Optional
 from app.core.database import get_db
 from app.api.v1.auth import get_current_user, get_current_user_optional
 from app.models.user import User
+from app.services.principal_service import invalidate_user_principal
 from app.models.profile import StudentProfile, TeacherProfile, EnterpriseProfile
 from app.schemas.profile import (
     StudentProfileCreate, StudentProfileUpdate, StudentProfileResponse,
     EnterpriseProfileCreate, EnterpriseProfileUpdate, EnterpriseProfileResponse,
     TeacherProfileCreate, TeacherProfileUpdate, TeacherProfileResponse
 )
+from app.core.url_signer import url_signer
 
 router = APIRouter()
 
@@ -109,6 +111,7 @@ async def create_student_profile(
     db.add(profile)
     await db.commit()
     await db.refresh(profile)
+    await invalidate_user_principal(current_user.username)
     
     return profile
 
@@ -276,8 +279,7 @@ async def _get_enterprise_profile_logic(
     
     # 如果logo_url存在，生成签名URL用于显示（有效期24小时）
     if profile.logo_url:
-        from app.core.oss import oss_service
-        profile.logo_url = oss_service.get_file_url(profile.logo_url, signed=True, expires=86400)  # 24小时
+        profile.logo_url = url_signer.sign(profile.logo_url)
     
     return profile
 
@@ -350,8 +352,7 @@ async def get_enterprise_profile_alias(
         
         # 如果logo_url存在，生成签名URL用于显示（有效期24小时）
         if profile.logo_url:
-            from app.core.oss import oss_service
-            profile.logo_url = oss_service.get_file_url(profile.logo_url, signed=True, expires=86400)  # 24小时
+            profile.logo_url = url_signer.sign(profile.logo_url)
         
         return profile
     else:
@@ -410,6 +411,7 @@ async def create_enterprise_profile(
     db.add(profile)
     await db.commit()
     await db.refresh(profile)
+    await invalidate_user_principal(current_user.username)
     
     return profile
 
@@ -544,6 +546,7 @@ async def create_teacher_profile(
     db.add(profile)
     await db.commit()
     await db.refresh(profile)
+    await invalidate_user_principal(current_user.username)
     
     # 获取关联的学校名称和院系名称
     school_name = None
@@ -743,6 +746,8 @@ async def update_my_teacher_profile(
     
     await db.commit()
     await db.refresh(profile)
+    if phone is not None or email is not None:
+        await invalidate_user_principal(current_user.username)
     
     # 获取关联的学校名称和院系名称
     school_name = None
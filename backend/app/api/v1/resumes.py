@@ -14,10 +14,20 @@ from app.models.user_type import UserType
 from app.models.job import Resume
 from app.models.profile import StudentProfile
 from app.schemas.resume import ResumeCreate, ResumeUpdate, ResumeResponse, ResumeListResponse
+from app.core.url_signer import url_signer
+from app.services.counter_service import resume_download_counter, resume_view_counter
 
 router = APIRouter()
 
 
+def _resume_to_response(resume: Resume) -> ResumeResponse:
+    """转换为响应模型，查看和下载次数包含尚未写入数据库的增量"""
+    response = ResumeResponse.model_validate(resume)
+    response.view_count = resume_view_counter.current(resume.id, resume.view_count)
+    response.download_count = resume_download_counter.current(resume.id, resume.download_count)
+    return response
+
+
 @router.get("", response_model=ResumeListResponse)
 async def get_resumes(
     page: int = Query(1, ge=1, description="页码"),
@@ -95,15 +105,14 @@ async def get_resumes(
     result = await db.execute(query)
     resumes = result.scalars().all()
     
-    # 将ORM对象转换为响应模型，并为file_url生成签名URL
-    from app.core.oss import oss_service
+    # 将ORM对象转换为响应模型，并为file_url批量生成签名URL（有效期24小时）
+    signed_urls = url_signer.sign_many(resume.file_url for resume in resumes)
     resume_responses = []
     for resume in resumes:
-        resume_dict = ResumeResponse.model_validate(resume).model_dump()
-        # 如果file_url存在，生成签名URL（有效期24小时）
-        if resume_dict.get('file_url'):
-            resume_dict['file_url'] = oss_service.get_file_url(resume_dict['file_url'], signed=True, expires=86400)  # 24小时
-        resume_responses.append(ResumeResponse(**resume_dict))
+        resume_response = _resume_to_response(resume)
+        if resume_response.file_url:
+            resume_response.file_url = signed_urls[resume_response.file_url]
+        resume_responses.append(resume_response)
     
     return {
         "items": resume_responses,
@@ -154,18 +163,17 @@ async def get_resume(
             detail="简历不存在"
         )
     
-    # 增加查看次数
-    resume.view_count += 1
-    await db.commit()
-    await db.refresh(resume)
+    # 增加查看次数（延迟批量写入，不在请求中提交）
+    resume_view_counter.increment(resume.id)
     
     # 如果file_url存在，生成签名URL用于预览（有效期24小时）
-    if resume.file_url:
-        from app.core.oss import oss_service
-        resume.file_url = oss_service.get_file_url(resume.file_url, signed=True, expires=86400)  # 24小时
+    # 只修改响应对象，不修改ORM对象（否则签名URL会被提交回数据库）
+    resume_response = _resume_to_response(resume)
+    if resume_response.file_url:
+        resume_response.file_url = url_signer.sign(resume_response.file_url)
     # 如果没有file_url，也要正常返回简历信息（不报错）
     
-    return resume
+    return resume_response
 
 
 @router.get("/{resume_id}/download")
@@ -216,13 +224,11 @@ async def download_resume(
             detail="该简历没有电子版文件"
         )
     
-    # 增加下载次数
-    resume.download_count += 1
-    await db.commit()
+    # 增加下载次数（延迟批量写入，下载路径上不再加行锁和提交事务）
+    resume_download_counter.increment(resume.id)
     
     # 生成签名URL用于下载（有效期24小时，避免用户点击时过期）
-    from app.core.oss import oss_service
-    signed_url = oss_service.get_file_url(resume.file_url, signed=True, expires=86400)  # 24小时 = 86400秒
+    signed_url = url_signer.sign(resume.file_url)
     
     # 重定向到签名URL
     from fastapi.responses import RedirectResponse
@@ -278,8 +284,7 @@ async def get_resume_preview_url(
         )
     
     # 生成签名URL用于预览（有效期24小时，避免用户点击时过期）
-    from app.core.oss import oss_service
-    signed_url = oss_service.get_file_url(resume.file_url, signed=True, expires=86400)  # 24小时 = 86400秒
+    signed_url = url_signer.sign(resume.file_url)
     
     return {"preview_url": signed_url}
 
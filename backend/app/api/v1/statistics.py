@@ -1,27 +1,202 @@
 """
 数据统计相关API路由（教师和管理员）
 """
+import csv
+import io
+import json
+
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
-from typing import Optional
+from sqlalchemy import select, func, and_
+from typing import AsyncIterator, Optional
 from datetime import datetime, timedelta
 
-from app.core.database import get_db
+from app.core.cache import get_or_load_snapshot
+from app.core.config import settings
+from app.core.database import get_db, AsyncSessionLocal
 from app.api.v1.auth import get_current_user
 from app.core.permissions import require_teacher, require_admin
 from app.models.profile import EnterpriseProfile
 from app.models.user import User
 from app.models.profile import StudentProfile, TeacherProfile
-from app.models.job import JobApplication, Resume, Job
-from app.models.interview import Interview, Offer
 from app.models.activity import JobFair, InfoSession, JobFairRegistration, InfoSessionRegistration
 from app.models.school import School, Department
-from app.models.chat import ChatSession
-from app.models.common import Favorite
+from app.services.rollup_service import sum_rollup_groups, sum_rollup_metrics
+from app.services.statistics_service import (
+    build_student_activity_rows, count_active_students, get_applications_by_job, get_enterprise_dashboard_counts,
+    get_platform_counts, get_student_dashboard_counts
+)
 
 router = APIRouter()
 
+# 学生活跃度CSV导出
+STUDENT_ACTIVITY_CSV_HEADER = ("学号", "姓名", "院系", "专业", "年级", "简历数", "申请数")
+STUDENT_ACTIVITY_EXPORT_BATCH_SIZE = 1000
+
+# 平台概览字段 -> 统计汇总指标
+PLATFORM_OVERVIEW_METRICS = {
+    "total_users": "users",
+    "total_students": "students",
+    "total_jobs": "jobs",
+    "total_applications": "applications",
+    "total_job_fairs": "job_fairs",
+    "total_info_sessions": "info_sessions",
+}
+
+
+def _activity_filters(
+    teacher_school_id: Optional[str],
+    school_id: Optional[str],
+    status_filter: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str]
+) -> Optional[dict]:
+    """
+    双选会、宣讲会统计的过滤条件（教师只能查看本校活动）
+    
+    Returns:
+        Optional[dict]: school_id、status、start_date、end_date（日期均包含当天）；
+            指定了其他学校时返回None（没有符合条件的活动）
+    """
+    if teacher_school_id and school_id and school_id != teacher_school_id:
+        return None
+    return {
+        "school_id": school_id or teacher_school_id,
+        "status": status_filter,
+        "start_date": datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None,
+        "end_date": datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None,
+    }
+
+
+def _activity_conditions(model, filters: dict) -> list:
+    """把 _activity_filters 的过滤条件转换为活动明细表（JobFair、InfoSession）的查询条件"""
+    conditions = [
+        getattr(model, column) == filters[column]
+        for column in ("school_id", "enterprise_id", "status")
+        if filters.get(column) is not None
+    ]
+    if filters["start_date"]:
+        conditions.append(model.start_time >= filters["start_date"])
+    if filters["end_date"]:
+        # 结束日期应该包含整天，所以加一天
+        conditions.append(model.start_time < filters["end_date"] + timedelta(days=1))
+    return conditions
+
+
+def _group_counts(groups: dict, index: int, name: str) -> list:
+    """把多维分组计数按其中一个维度合计，空维度返回None"""
+    totals = {}
+    for key, count in groups.items():
+        totals[key[index]] = totals.get(key[index], 0) + count
+    return [{name: value or None, "count": count} for value, count in totals.items()]
+
+
+async def _cached_statistics(name: str, loader, **params) -> dict:
+    """
+    读取统计快照（同一组参数共用一份缓存，并发未命中只计算一次，过期前后台刷新）
+
+    Args:
+        name: 统计名称（缓存键的一部分）
+        loader: 计算统计数据的异步函数（使用独立的数据库会话）
+        **params: 影响统计结果的参数
+
+    Returns:
+        dict: 统计数据，cache 字段为快照的生成时间、年龄（秒）、最大年龄和是否正在刷新
+    """
+    key = f"statistics:{name}:{json.dumps(params, sort_keys=True, default=str)}"
+    value, freshness = await get_or_load_snapshot(
+        key, loader, ttl=settings.STATISTICS_CACHE_TTL, refresh_ahead=settings.STATISTICS_CACHE_REFRESH_AHEAD
+    )
+    return {**value, "cache": freshness}
+
+
+async def _student_activity_csv(scope: dict) -> AsyncIterator[str]:
+    """
+    逐批生成学生活跃度CSV（带BOM，Excel可直接打开中文）
+
+    响应流式发送时请求已结束，使用独立的数据库会话；每 STUDENT_ACTIVITY_EXPORT_BATCH_SIZE 行发送一次。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(STUDENT_ACTIVITY_CSV_HEADER)
+    yield buffer.getvalue()
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(build_student_activity_rows(**scope))
+        async for rows in result.partitions(STUDENT_ACTIVITY_EXPORT_BATCH_SIZE):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+
+
+async def _load_platform_overview() -> dict:
+    """平台概览计数：读取统计汇总（一次查询，与明细行数无关）；汇总表尚未生成时查询明细表"""
+    async with AsyncSessionLocal() as db:
+        counts = await sum_rollup_metrics(db, list(PLATFORM_OVERVIEW_METRICS.values()))
+        if not any(counts.values()):
+            return await get_platform_counts(db)
+    return {key: counts[metric] for key, metric in PLATFORM_OVERVIEW_METRICS.items()}
+
+
+async def _load_job_fair_analysis(filters: dict, student_department_id: Optional[str]) -> dict:
+    """双选会统计分析（filters 见 _activity_filters）"""
+    async with AsyncSessionLocal() as db:
+        # 双选会数按状态、学校分组读取统计汇总（按开始日期分桶，一次查询）
+        groups = await sum_rollup_groups(db, "job_fairs", ["status", "school_id"], **filters)
+        total_job_fairs = sum(groups.values())
+
+        registered_enterprises = 0
+        registered_students = 0
+        if total_job_fairs:
+            # 报名企业数是去重计数，关联双选会按相同条件查询明细表
+            enterprise_result = await db.execute(
+                select(func.count(func.distinct(JobFairRegistration.enterprise_id)))
+                .join(JobFair, JobFair.id == JobFairRegistration.job_fair_id)
+                .where(*_activity_conditions(JobFair, filters))
+            )
+            registered_enterprises = enterprise_result.scalar() or 0
+
+            # 报名学生数：暂按院系学生数统计（临时实现，需要学生报名表）
+            if student_department_id:
+                student_counts = await sum_rollup_metrics(db, ["students"], department_id=student_department_id)
+                registered_students = student_counts["students"]
+
+    return {
+        "total_job_fairs": total_job_fairs,
+        "registered_enterprises": registered_enterprises,
+        "registered_students": registered_students,
+        "by_status": _group_counts(groups, 0, "status"),
+        "by_school": _group_counts(groups, 1, "school_id")
+    }
+
+
+async def _load_info_session_analysis(filters: dict) -> dict:
+    """宣讲会统计分析（filters 见 _activity_filters，另含 enterprise_id）"""
+    async with AsyncSessionLocal() as db:
+        # 宣讲会数按状态、企业分组读取统计汇总（按开始日期分桶，一次查询）
+        groups = await sum_rollup_groups(db, "info_sessions", ["status", "enterprise_id"], **filters)
+        total_info_sessions = sum(groups.values())
+
+        # 报名学生数是去重计数，关联宣讲会按相同条件查询明细表
+        registered_students = 0
+        if total_info_sessions:
+            student_result = await db.execute(
+                select(func.count(func.distinct(InfoSessionRegistration.student_id)))
+                .join(InfoSession, InfoSession.id == InfoSessionRegistration.session_id)
+                .where(*_activity_conditions(InfoSession, filters))
+            )
+            registered_students = student_result.scalar() or 0
+
+    return {
+        "total_info_sessions": total_info_sessions,
+        "registered_students": registered_students,
+        "by_status": _group_counts(groups, 0, "status"),
+        "by_enterprise": _group_counts(groups, 1, "enterprise_id")
+    }
+
 
 # ==================== 学生个人数据统计 ====================
 
@@ -61,78 +236,8 @@ async def get_student_personal_statistics(
             detail="学生信息不存在"
         )
     
-    # 统计职位申请
-    applications_result = await db.execute(
-        select(func.count()).where(JobApplication.student_id == student.id)
-    )
-    total_applications = applications_result.scalar() or 0
-    
-    # 统计已通过的申请
-    accepted_applications_result = await db.execute(
-        select(func.count()).where(
-            JobApplication.student_id == student.id,
-            JobApplication.status == "ACCEPTED"
-        )
-    )
-    accepted_applications = accepted_applications_result.scalar() or 0
-    
-    # 统计面试
-    from app.models.interview import Interview
-    interviews_result = await db.execute(
-        select(func.count()).where(Interview.student_id == student.id)
-    )
-    total_interviews = interviews_result.scalar() or 0
-    
-    # 统计Offer
-    from app.models.interview import Offer
-    offers_result = await db.execute(
-        select(func.count()).where(Offer.student_id == student.id)
-    )
-    total_offers = offers_result.scalar() or 0
-    
-    # 统计已接受的Offer
-    accepted_offers_result = await db.execute(
-        select(func.count()).where(
-            Offer.student_id == student.id,
-            Offer.status == "ACCEPTED"
-        )
-    )
-    accepted_offers = accepted_offers_result.scalar() or 0
-    
-    # 统计收藏
-    from app.models.common import Favorite
-    favorites_result = await db.execute(
-        select(func.count()).where(Favorite.user_id == current_user.id)
-    )
-    total_favorites = favorites_result.scalar() or 0
-    
-    # 统计简历
-    from app.models.job import Resume
-    resumes_result = await db.execute(
-        select(func.count()).where(Resume.student_id == student.id)
-    )
-    total_resumes = resumes_result.scalar() or 0
-    
-    # 统计待办事项
-    from app.models.common import Schedule
-    todos_result = await db.execute(
-        select(func.count()).where(
-            Schedule.user_id == current_user.id,
-            Schedule.is_completed == False
-        )
-    )
-    total_todos = todos_result.scalar() or 0
-    
-    return {
-        "total_applications": total_applications,
-        "accepted_applications": accepted_applications,
-        "total_interviews": total_interviews,
-        "total_offers": total_offers,
-        "accepted_offers": accepted_offers,
-        "total_favorites": total_favorites,
-        "total_resumes": total_resumes,
-        "total_todos": total_todos
-    }
+    # 申请（按用户ID关联）、面试、Offer、收藏、简历和待办计数在一次查询中完成
+    return await get_student_dashboard_counts(db, current_user.id, student.id)
 
 
 @router.get("/students/activity")
@@ -140,6 +245,7 @@ async def get_student_activity_statistics(
     start_date: Optional[str] = Query(None, description="开始日期（YYYY-MM-DD）"),
     end_date: Optional[str] = Query(None, description="结束日期（YYYY-MM-DD）"),
     department_id: Optional[str] = Query(None, description="院系ID"),
+    export: Optional[str] = Query(None, pattern="^csv$", description="导出格式：csv（逐行导出每个学生的简历数和申请数）"),
     current_user: User = Depends(require_teacher()),
     db: AsyncSession = Depends(get_db)
 ):
@@ -150,11 +256,12 @@ async def get_student_activity_statistics(
         start_date: 开始日期
         end_date: 结束日期
         department_id: 院系ID
+        export: 导出格式，为csv时以流式响应返回CSV文件
         current_user: 当前登录用户（教师）
         db: 数据库会话
         
     Returns:
-        dict: 学生活跃度统计数据
+        dict: 学生活跃度统计数据；export=csv 时为CSV文件
     """
     # 获取教师信息
     teacher_result = await db.execute(
@@ -168,14 +275,11 @@ async def get_student_activity_statistics(
             detail="教师信息不存在"
         )
     
-    # 构建查询条件
-    query = select(StudentProfile)
-    
     # 数据权限隔离：教师只能查看管辖范围内的学生
     if teacher.department_id:
-        query = query.where(StudentProfile.department_id == teacher.department_id)
+        scope = {"department_id": teacher.department_id}
     elif teacher.school_id:
-        query = query.where(StudentProfile.school_id == teacher.school_id)
+        scope = {"school_id": teacher.school_id}
     else:
         # 如果没有部门信息，返回空数据
         return {
@@ -186,6 +290,14 @@ async def get_student_activity_statistics(
             "by_department": []
         }
     
+    if export == "csv":
+        # 逐行导出范围内每个学生的简历数和申请数（服务端游标分批读取，不在内存中缓存整个结果）
+        return StreamingResponse(
+            _student_activity_csv(scope),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="student_activity.csv"'}
+        )
+    
     # 日期过滤
     if start_date:
         start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
@@ -193,171 +305,49 @@ async def get_student_activity_statistics(
     if end_date:
         end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
     
-    # 获取学生总数
-    count_query = select(func.count(StudentProfile.id))
-    if teacher.department_id:
-        count_query = count_query.where(StudentProfile.department_id == teacher.department_id)
-    elif teacher.school_id:
-        count_query = count_query.where(StudentProfile.school_id == teacher.school_id)
-    total_result = await db.execute(count_query)
-    total_students = total_result.scalar() or 0
-    
-    # 获取有简历的学生数（活跃学生）
-    students_result = await db.execute(query)
-    students = students_result.scalars().all()
-    student_profile_ids = [student.id for student in students]  # student_profiles.id
-    student_user_ids = [student.user_id for student in students]  # users.id
+    # 学生数、简历数、申请数读取统计汇总（一次查询）
+    counts = await sum_rollup_metrics(db, ["students", "resumes", "applications"], **scope)
+    total_students = counts["students"]
     
-    if student_profile_ids:
-        # Resume.student_id 关联到 student_profiles.id
-        resume_count_query = select(func.count(Resume.id)).where(
-            Resume.student_id.in_(student_profile_ids)
-        )
-        resume_result = await db.execute(resume_count_query)
-        resume_count = resume_result.scalar() or 0
-    else:
-        resume_count = 0
-    
-    if student_user_ids:
-        # JobApplication.student_id 关联到 users.id
-        application_count_query = select(func.count(JobApplication.id)).where(
-            JobApplication.student_id.in_(student_user_ids)
-        )
-        application_result = await db.execute(application_count_query)
-        application_count = application_result.scalar() or 0
-    else:
-        application_count = 0
-    
-    # 有简历或申请的学生视为活跃学生（去重）
-    # 计算有简历的学生数
-    if student_profile_ids:
-        students_with_resume_query = select(func.count(func.distinct(Resume.student_id))).where(
-            Resume.student_id.in_(student_profile_ids)
-        )
-        students_with_resume_result = await db.execute(students_with_resume_query)
-        students_with_resume = students_with_resume_result.scalar() or 0
-    else:
-        students_with_resume = 0
-    
-    # 计算有申请的学生数
-    if student_user_ids:
-        students_with_application_query = select(func.count(func.distinct(JobApplication.student_id))).where(
-            JobApplication.student_id.in_(student_user_ids)
-        )
-        students_with_application_result = await db.execute(students_with_application_query)
-        students_with_application = students_with_application_result.scalar() or 0
-    else:
-        students_with_application = 0
+    # 活跃学生（有简历或申请）是去重计数，不能按汇总桶相加，用 EXISTS 半连接在明细表上计数（一次查询）
+    active_students = await count_active_students(db, **scope)
     
-    # 活跃学生数：有简历或申请的学生（需要去重）
-    # 获取有简历的学生user_id集合
-    students_with_resume_user_ids = set()
-    if student_profile_ids:
-        # 获取有简历的学生的user_id（通过子查询）
-        resume_students_result = await db.execute(
-            select(StudentProfile.user_id).where(
-                StudentProfile.id.in_(
-                    select(Resume.student_id).where(Resume.student_id.in_(student_profile_ids)).distinct()
-                )
-            ).distinct()
-        )
-        students_with_resume_user_ids = set(row[0] for row in resume_students_result.all() if row[0])
-    
-    # 获取有申请的学生user_id集合（JobApplication.student_id已经是user_id）
-    students_with_application_user_ids = set()
-    if student_user_ids:
-        application_students_result = await db.execute(
-            select(JobApplication.student_id).where(
-                JobApplication.student_id.in_(student_user_ids)
-            ).distinct()
-        )
-        students_with_application_user_ids = set(row[0] for row in application_students_result.all() if row[0])
-    
-    # 合并去重
-    active_student_user_ids = students_with_resume_user_ids | students_with_application_user_ids
-    active_students = len(active_student_user_ids)
-    
-    # 按部门统计
+    # 按部门统计（统计汇总）
     by_department = []
     if teacher.department_id:
         # 如果教师有部门，统计该部门的学生
-        dept_query = select(
-            StudentProfile.department_id,
-            func.count(StudentProfile.id).label("count")
-        ).where(
-            StudentProfile.department_id == teacher.department_id
-        ).group_by(StudentProfile.department_id)
-        
-        dept_result = await db.execute(dept_query)
+        department_counts = await sum_rollup_groups(
+            db, "students", ["department_id"], department_id=teacher.department_id
+        )
         by_department = [
-            {"department_id": row[0], "count": row[1]}
-            for row in dept_result.all()
+            {"department_id": department, "count": count}
+            for (department,), count in department_counts.items()
         ]
     
     return {
         "total_students": total_students,
         "active_students": min(active_students, total_students),
-        "resume_count": resume_count,
-        "application_count": application_count,
+        "resume_count": counts["resumes"],
+        "application_count": counts["applications"],
         "by_department": by_department
     }
 
 
 @router.get("/platform/overview")
 async def get_platform_overview(
-    current_user: User = Depends(require_admin),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(require_admin())
 ):
     """
     获取平台概览统计（仅管理员）
+    读取缓存快照（最多旧 STATISTICS_CACHE_TTL 秒），cache 字段说明快照的生成时间和年龄
     
     Args:
         current_user: 当前登录用户（管理员）
-        db: 数据库会话
         
     Returns:
         dict: 平台统计数据
     """
-    # 统计用户数
-    from app.models.user import User
-    user_count_query = select(func.count(User.id))
-    user_result = await db.execute(user_count_query)
-    total_users = user_result.scalar() or 0
-    
-    # 统计学生数
-    student_count_query = select(func.count(StudentProfile.id))
-    student_result = await db.execute(student_count_query)
-    total_students = student_result.scalar() or 0
-    
-    # 统计职位数（所有状态的职位）
-    from app.models.job import Job
-    job_count_query = select(func.count(Job.id))
-    job_result = await db.execute(job_count_query)
-    total_jobs = job_result.scalar() or 0
-    
-    # 统计申请数
-    application_count_query = select(func.count(JobApplication.id))
-    application_result = await db.execute(application_count_query)
-    total_applications = application_result.scalar() or 0
-    
-    # 统计双选会数（所有状态的双选会）
-    job_fair_count_query = select(func.count(JobFair.id))
-    job_fair_result = await db.execute(job_fair_count_query)
-    total_job_fairs = job_fair_result.scalar() or 0
-    
-    # 统计宣讲会数（所有状态的宣讲会）
-    info_session_count_query = select(func.count(InfoSession.id))
-    info_session_result = await db.execute(info_session_count_query)
-    total_info_sessions = info_session_result.scalar() or 0
-    
-    return {
-        "total_users": total_users,
-        "total_students": total_students,
-        "total_jobs": total_jobs,
-        "total_applications": total_applications,
-        "total_job_fairs": total_job_fairs,
-        "total_info_sessions": total_info_sessions
-    }
+    return await _cached_statistics("platform_overview", _load_platform_overview)
 
 
 @router.get("/job-fairs/analysis")
@@ -398,126 +388,24 @@ async def get_job_fair_analysis(
             detail="教师信息不存在"
         )
     
-    # 构建查询条件
-    query = select(JobFair)
-    
-    # 数据权限隔离：教师只能查看管辖范围内的双选会
-    if teacher.school_id:
-        query = query.where(JobFair.school_id == teacher.school_id)
-    
-    # 学校过滤
-    if school_id:
-        query = query.where(JobFair.school_id == school_id)
-    
-    # 状态过滤
-    if status_filter:
-        query = query.where(JobFair.status == status_filter)
-    
-    # 时间过滤
-    if start_date:
-        start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-        query = query.where(JobFair.start_time >= start_datetime)
-    if end_date:
-        end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
-        # 结束日期应该包含整天，所以加一天
-        end_datetime = end_datetime + timedelta(days=1)
-        query = query.where(JobFair.start_time < end_datetime)
-    
-    # 获取双选会总数
-    count_query = select(func.count(JobFair.id))
-    if teacher.school_id:
-        count_query = count_query.where(JobFair.school_id == teacher.school_id)
-    if school_id:
-        count_query = count_query.where(JobFair.school_id == school_id)
-    if status_filter:
-        count_query = count_query.where(JobFair.status == status_filter)
-    if start_date:
-        start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-        count_query = count_query.where(JobFair.start_time >= start_datetime)
-    if end_date:
-        end_datetime = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-        count_query = count_query.where(JobFair.start_time < end_datetime)
-    
-    total_result = await db.execute(count_query)
-    total_job_fairs = total_result.scalar() or 0
-    
-    # 获取符合条件的双选会ID列表
-    job_fairs_result = await db.execute(query)
-    job_fairs = job_fairs_result.scalars().all()
-    job_fair_ids = [jf.id for jf in job_fairs]
-    
-    # 统计报名企业数
-    registered_enterprises = 0
-    if job_fair_ids:
-        enterprise_count_query = select(func.count(func.distinct(JobFairRegistration.enterprise_id))).where(
-            JobFairRegistration.job_fair_id.in_(job_fair_ids)
-        )
-        enterprise_result = await db.execute(enterprise_count_query)
-        registered_enterprises = enterprise_result.scalar() or 0
-    
-    # 统计报名学生数（通过院系过滤）
-    registered_students = 0
-    if job_fair_ids and department_id:
-        # 如果指定了院系，统计该院系的学生报名数
-        from app.models.profile import StudentProfile
-        student_ids_query = select(StudentProfile.user_id).where(
-            StudentProfile.department_id == department_id
-        )
-        student_ids_result = await db.execute(student_ids_query)
-        student_user_ids = [row[0] for row in student_ids_result.all() if row[0]]
-        
-        # 这里需要根据实际的报名表结构来统计
-        # 假设有学生报名表，如果没有则需要通过其他方式统计
-        registered_students = len(student_user_ids)  # 临时实现
-    elif job_fair_ids and teacher.department_id:
-        # 如果教师有部门，统计该部门的学生
-        from app.models.profile import StudentProfile
-        student_ids_query = select(StudentProfile.user_id).where(
-            StudentProfile.department_id == teacher.department_id
-        )
-        student_ids_result = await db.execute(student_ids_query)
-        student_user_ids = [row[0] for row in student_ids_result.all() if row[0]]
-        registered_students = len(student_user_ids)  # 临时实现
-    
-    # 按状态统计
-    by_status = []
-    if job_fair_ids:
-        status_query = select(
-            JobFair.status,
-            func.count(JobFair.id).label("count")
-        ).where(
-            JobFair.id.in_(job_fair_ids)
-        ).group_by(JobFair.status)
-        
-        status_result = await db.execute(status_query)
-        by_status = [
-            {"status": row[0], "count": row[1]}
-            for row in status_result.all()
-        ]
-    
-    # 按学校统计
-    by_school = []
-    if job_fair_ids:
-        school_query = select(
-            JobFair.school_id,
-            func.count(JobFair.id).label("count")
-        ).where(
-            JobFair.id.in_(job_fair_ids)
-        ).group_by(JobFair.school_id)
-        
-        school_result = await db.execute(school_query)
-        by_school = [
-            {"school_id": row[0], "count": row[1]}
-            for row in school_result.all()
-        ]
+    filters = _activity_filters(teacher.school_id, school_id, status_filter, start_date, end_date)
+    if filters is None:
+        return {
+            "total_job_fairs": 0,
+            "registered_enterprises": 0,
+            "registered_students": 0,
+            "by_status": [],
+            "by_school": []
+        }
     
-    return {
-        "total_job_fairs": total_job_fairs,
-        "registered_enterprises": registered_enterprises,
-        "registered_students": registered_students,
-        "by_status": by_status,
-        "by_school": by_school
-    }
+    # 报名学生数暂按院系学生数统计
+    student_department_id = department_id or teacher.department_id
+    return await _cached_statistics(
+        "job_fairs",
+        lambda: _load_job_fair_analysis(filters, student_department_id),
+        **filters,
+        student_department_id=student_department_id
+    )
 
 
 @router.get("/info-sessions/analysis")
@@ -560,106 +448,17 @@ async def get_info_session_analysis(
             detail="教师信息不存在"
         )
     
-    # 构建查询条件
-    query = select(InfoSession)
-    
-    # 数据权限隔离：教师只能查看管辖范围内的宣讲会
-    if teacher.school_id:
-        query = query.where(InfoSession.school_id == teacher.school_id)
-    
-    # 学校过滤
-    if school_id:
-        query = query.where(InfoSession.school_id == school_id)
-    
-    # 企业过滤
-    if enterprise_id:
-        query = query.where(InfoSession.enterprise_id == enterprise_id)
-    
-    # 状态过滤
-    if status_filter:
-        query = query.where(InfoSession.status == status_filter)
-    
-    # 时间过滤
-    if start_date:
-        start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-        query = query.where(InfoSession.start_time >= start_datetime)
-    if end_date:
-        end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
-        end_datetime = end_datetime + timedelta(days=1)
-        query = query.where(InfoSession.start_time < end_datetime)
-    
-    # 获取宣讲会总数
-    count_query = select(func.count(InfoSession.id))
-    if teacher.school_id:
-        count_query = count_query.where(InfoSession.school_id == teacher.school_id)
-    if school_id:
-        count_query = count_query.where(InfoSession.school_id == school_id)
-    if enterprise_id:
-        count_query = count_query.where(InfoSession.enterprise_id == enterprise_id)
-    if status_filter:
-        count_query = count_query.where(InfoSession.status == status_filter)
-    if start_date:
-        start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-        count_query = count_query.where(InfoSession.start_time >= start_datetime)
-    if end_date:
-        end_datetime = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-        count_query = count_query.where(InfoSession.start_time < end_datetime)
-    
-    total_result = await db.execute(count_query)
-    total_info_sessions = total_result.scalar() or 0
-    
-    # 获取符合条件的宣讲会ID列表
-    info_sessions_result = await db.execute(query)
-    info_sessions = info_sessions_result.scalars().all()
-    info_session_ids = [is_obj.id for is_obj in info_sessions]
-    
-    # 统计报名学生数
-    registered_students = 0
-    if info_session_ids:
-        student_count_query = select(func.count(func.distinct(InfoSessionRegistration.student_id))).where(
-            InfoSessionRegistration.session_id.in_(info_session_ids)
-        )
-        student_result = await db.execute(student_count_query)
-        registered_students = student_result.scalar() or 0
-    
-    # 按状态统计
-    by_status = []
-    if info_session_ids:
-        status_query = select(
-            InfoSession.status,
-            func.count(InfoSession.id).label("count")
-        ).where(
-            InfoSession.id.in_(info_session_ids)
-        ).group_by(InfoSession.status)
-        
-        status_result = await db.execute(status_query)
-        by_status = [
-            {"status": row[0], "count": row[1]}
-            for row in status_result.all()
-        ]
-    
-    # 按企业统计
-    by_enterprise = []
-    if info_session_ids:
-        enterprise_query = select(
-            InfoSession.enterprise_id,
-            func.count(InfoSession.id).label("count")
-        ).where(
-            InfoSession.id.in_(info_session_ids)
-        ).group_by(InfoSession.enterprise_id)
-        
-        enterprise_result = await db.execute(enterprise_query)
-        by_enterprise = [
-            {"enterprise_id": row[0], "count": row[1]}
-            for row in enterprise_result.all()
-        ]
+    filters = _activity_filters(teacher.school_id, school_id, status_filter, start_date, end_date)
+    if filters is None:
+        return {
+            "total_info_sessions": 0,
+            "registered_students": 0,
+            "by_status": [],
+            "by_enterprise": []
+        }
+    filters["enterprise_id"] = enterprise_id
     
-    return {
-        "total_info_sessions": total_info_sessions,
-        "registered_students": registered_students,
-        "by_status": by_status,
-        "by_enterprise": by_enterprise
-    }
+    return await _cached_statistics("info_sessions", lambda: _load_info_session_analysis(filters), **filters)
 
 
 # ==================== 企业端数据统计 ====================
@@ -700,208 +499,38 @@ async def get_enterprise_personal_statistics(
             detail="企业信息不存在"
         )
     
-    # 统计职位数
-    from app.models.job import Job
-    jobs_result = await db.execute(
-        select(func.count(Job.id)).where(Job.enterprise_id == enterprise.id)
-    )
-    total_jobs = jobs_result.scalar() or 0
-    
-    # 统计已发布职位数
-    published_jobs_result = await db.execute(
-        select(func.count(Job.id)).where(
-            Job.enterprise_id == enterprise.id,
-            Job.status == "PUBLISHED"
-        )
-    )
-    published_jobs = published_jobs_result.scalar() or 0
-    
-    # 统计职位申请数
-    applications_result = await db.execute(
-        select(func.count(JobApplication.id)).where(
-            JobApplication.job_id.in_(
-                select(Job.id).where(Job.enterprise_id == enterprise.id)
-            )
-        )
-    )
-    total_applications = applications_result.scalar() or 0
-    
-    # 统计已通过申请数
-    accepted_applications_result = await db.execute(
-        select(func.count(JobApplication.id)).where(
-            JobApplication.job_id.in_(
-                select(Job.id).where(Job.enterprise_id == enterprise.id)
-            ),
-            JobApplication.status == "ACCEPTED"
-        )
-    )
-    accepted_applications = accepted_applications_result.scalar() or 0
-    
-    # 统计面试数
-    interviews_result = await db.execute(
-        select(func.count(Interview.id)).where(Interview.enterprise_id == enterprise.id)
-    )
-    total_interviews = interviews_result.scalar() or 0
-    
-    # 统计Offer数
-    offers_result = await db.execute(
-        select(func.count(Offer.id)).where(Offer.enterprise_id == enterprise.id)
-    )
-    total_offers = offers_result.scalar() or 0
-    
-    # 统计已接受Offer数
-    accepted_offers_result = await db.execute(
-        select(func.count(Offer.id)).where(
-            Offer.enterprise_id == enterprise.id,
-            Offer.status == "ACCEPTED"
-        )
-    )
-    accepted_offers = accepted_offers_result.scalar() or 0
-    
-    # 统计收藏数（收藏的简历）
-    favorites_result = await db.execute(
-        select(func.count(Favorite.id)).where(
-            Favorite.user_id == current_user.id,
-            Favorite.target_type == "RESUME"
-        )
-    )
-    total_favorites = favorites_result.scalar() or 0
-    
-    # 统计宣讲会数
-    info_sessions_result = await db.execute(
-        select(func.count(InfoSession.id)).where(InfoSession.enterprise_id == enterprise.id)
-    )
-    total_info_sessions = info_sessions_result.scalar() or 0
-    
-    # 统计双选会报名数
-    job_fair_registrations_result = await db.execute(
-        select(func.count(JobFairRegistration.id)).where(
-            JobFairRegistration.enterprise_id == enterprise.id
-        )
-    )
-    total_job_fair_registrations = job_fair_registrations_result.scalar() or 0
-    
-    # 统计聊天会话数（ChatSession使用user1_id和user2_id）
-    chat_sessions_result = await db.execute(
-        select(func.count(ChatSession.id)).where(
-            or_(
-                ChatSession.user1_id == current_user.id,
-                ChatSession.user2_id == current_user.id
-            )
-        )
-    )
-    total_chat_sessions = chat_sessions_result.scalar() or 0
-    
-    # 统计触达人才数（通过申请、面试、Offer、收藏、聊天）
-    from app.models.profile import StudentProfile
-    
-    # 通过申请触达的学生（JobApplication.student_id是user_id，需要转换为student_profiles.id）
-    application_student_ids = set()
-    if total_applications > 0:
-        app_students_result = await db.execute(
-            select(StudentProfile.id).join(
-                JobApplication, StudentProfile.user_id == JobApplication.student_id
-            ).where(
-                JobApplication.job_id.in_(
-                    select(Job.id).where(Job.enterprise_id == enterprise.id)
-                )
-            ).distinct()
-        )
-        application_student_ids = set(row[0] for row in app_students_result.all() if row[0])
-    
-    # 通过面试触达的学生
-    interview_student_ids = set()
-    if total_interviews > 0:
-        interview_students_result = await db.execute(
-            select(Interview.student_id).where(Interview.enterprise_id == enterprise.id).distinct()
-        )
-        interview_student_ids = set(row[0] for row in interview_students_result.all() if row[0])
-    
-    # 通过Offer触达的学生
-    offer_student_ids = set()
-    if total_offers > 0:
-        offer_students_result = await db.execute(
-            select(Offer.student_id).where(Offer.enterprise_id == enterprise.id).distinct()
-        )
-        offer_student_ids = set(row[0] for row in offer_students_result.all() if row[0])
-    
-    # 通过收藏触达的学生
-    favorite_student_ids = set()
-    if total_favorites > 0:
-        favorite_resume_ids_result = await db.execute(
-            select(Favorite.target_id).where(
-                Favorite.user_id == current_user.id,
-                Favorite.target_type == "RESUME"
-            ).distinct()
-        )
-        favorite_resume_ids = set(row[0] for row in favorite_resume_ids_result.all() if row[0])
-        if favorite_resume_ids:
-            favorite_students_result = await db.execute(
-                select(Resume.student_id).where(Resume.id.in_(favorite_resume_ids)).distinct()
-            )
-            favorite_student_ids = set(row[0] for row in favorite_students_result.all() if row[0])
-    
-    # 通过聊天触达的学生（ChatSession使用user1_id和user2_id）
-    chat_student_ids = set()
-    if total_chat_sessions > 0:
-        # 查询user1_id为当前用户的会话
-        chat_user_ids_result1 = await db.execute(
-            select(ChatSession.user2_id).where(
-                ChatSession.user1_id == current_user.id
-            ).distinct()
-        )
-        chat_user_ids1 = set(row[0] for row in chat_user_ids_result1.all() if row[0])
-        
-        # 查询user2_id为当前用户的会话
-        chat_user_ids_result2 = await db.execute(
-            select(ChatSession.user1_id).where(
-                ChatSession.user2_id == current_user.id
-            ).distinct()
-        )
-        chat_user_ids2 = set(row[0] for row in chat_user_ids_result2.all() if row[0])
-        
-        chat_user_ids = chat_user_ids1 | chat_user_ids2
-        if chat_user_ids:
-            chat_students_result = await db.execute(
-                select(StudentProfile.id).where(StudentProfile.user_id.in_(chat_user_ids)).distinct()
-            )
-            chat_student_ids = set(row[0] for row in chat_students_result.all() if row[0])
-    
-    # 合并去重
-    all_talent_ids = application_student_ids | interview_student_ids | offer_student_ids | favorite_student_ids | chat_student_ids
-    total_talents = len(all_talent_ids)
-    
-    # 按职位统计申请数
+    # 各项计数（含触达人才数）一次查询，按职位统计申请数一次GROUP BY
+    counts = await get_enterprise_dashboard_counts(db, current_user.id, enterprise.id)
     applications_by_job = []
-    if total_applications > 0:
-        job_applications_result = await db.execute(
-            select(
-                JobApplication.job_id,
-                func.count(JobApplication.id).label("count")
-            ).where(
-                JobApplication.job_id.in_(
-                    select(Job.id).where(Job.enterprise_id == enterprise.id)
-                )
-            ).group_by(JobApplication.job_id)
-        )
-        applications_by_job = [
-            {"job_id": row[0], "count": row[1]}
-            for row in job_applications_result.all()
-        ]
+    if counts["total_applications"] > 0:
+        applications_by_job = await get_applications_by_job(db, enterprise.id)
     
     return {
-        "total_jobs": total_jobs,
-        "published_jobs": published_jobs,
-        "total_applications": total_applications,
-        "accepted_applications": accepted_applications,
-        "total_interviews": total_interviews,
-        "total_offers": total_offers,
-        "accepted_offers": accepted_offers,
-        "total_favorites": total_favorites,
-        "total_info_sessions": total_info_sessions,
-        "total_job_fair_registrations": total_job_fair_registrations,
-        "total_chat_sessions": total_chat_sessions,
-        "total_talents": total_talents,
+        **counts,
         "applications_by_job": applications_by_job
     }
 
+
+
+# ==================== 缓存命中统计（管理员） ====================
+
+@router.get("/cache")
+async def get_cache_statistics(
+    current_user: User = Depends(require_admin()),
+):
+    """
+    获取缓存命中统计（当前工作进程），用于调优缓存TTL
+    
+    Args:
+        current_user: 当前登录用户（管理员）
+        
+    Returns:
+        dict: 各缓存命名空间的命中数、未命中数和命中率，进程内一级缓存的容量，
+            以及Redis熔断器状态和各状态累计时长
+    """
+    from app.core.cache import get_cache_stats, local_cache, redis_health
+    return {
+        "namespaces": get_cache_stats(),
+        "local": local_cache.stats(),
+        "redis": redis_health.stats()
+    }
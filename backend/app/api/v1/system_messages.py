@@ -9,9 +9,15 @@ from uuid import uuid4
 
 from app.core.database import get_db
 from app.api.v1.auth import get_current_user
+from app.core.permissions import require_admin
 from app.models.user import User
 from app.models.chat import Message, ChatSession
 from app.models.enums import MessageType
+from app.services import read_state_service
+from app.services.read_state_service import UNREAD_SYSTEM, mark_messages_read, record_new_message
+from app.utils.pagination import decode_cursor
+from app.services.broadcast_service import start_broadcast, get_broadcast_job
+from app.schemas.chat import SystemMessageBroadcast, BroadcastJobResponse
 
 router = APIRouter()
 
@@ -104,7 +110,7 @@ async def mark_message_read(
         成功消息
     """
     result = await db.execute(
-        select(Message).where(
+        select(Message.id).where(
             and_(
                 Message.id == message_id,
                 Message.receiver_id == current_user.id,
@@ -112,52 +118,45 @@ async def mark_message_read(
             )
         )
     )
-    message = result.scalar_one_or_none()
     
-    if not message:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="消息不存在"
         )
     
-    message.is_read = True
-    await db.commit()
+    await mark_messages_read(db, current_user.id, UNREAD_SYSTEM, Message.id == message_id)
     
     return {"message": "标记成功"}
 
 
 @router.post("/read-all")
 async def mark_all_messages_read(
+    up_to: Optional[str] = Query(None, description="游标：只标记不晚于该位置的消息，不传则标记全部"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    标记所有系统消息为已读
+    标记所有系统消息为已读（一条UPDATE）
     
     Args:
+        up_to: 高水位游标，避免把列表加载之后才到达的消息标记为已读
         current_user: 当前登录用户
         db: 数据库会话
         
     Returns:
         成功消息
     """
-    result = await db.execute(
-        select(Message).where(
-            and_(
-                Message.receiver_id == current_user.id,
-                Message.message_type == MessageType.SYSTEM,
-                Message.is_read == False
-            )
+    try:
+        high_water = decode_cursor(up_to) if up_to else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-    )
-    messages = result.scalars().all()
-    
-    for message in messages:
-        message.is_read = True
-    
-    await db.commit()
+    count = await mark_messages_read(db, current_user.id, UNREAD_SYSTEM, high_water=high_water)
     
-    return {"message": f"已标记{len(messages)}条消息为已读"}
+    return {"message": f"已标记{count}条消息为已读"}
 
 
 @router.get("/unread-count")
@@ -166,7 +165,7 @@ async def get_unread_count(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    获取未读系统消息数量
+    获取未读系统消息数量（读取未读计数，不扫描消息表）
     
     Args:
         current_user: 当前登录用户
@@ -175,20 +174,65 @@ async def get_unread_count(
     Returns:
         未读消息数量
     """
-    result = await db.execute(
-        select(func.count()).select_from(Message).where(
-            and_(
-                Message.receiver_id == current_user.id,
-                Message.message_type == MessageType.SYSTEM,
-                Message.is_read == False
-            )
-        )
-    )
-    count = result.scalar() or 0
+    count = await read_state_service.get_unread_count(db, current_user.id, UNREAD_SYSTEM)
     
     return {"unread_count": count}
 
 
+@router.post("/broadcast", response_model=BroadcastJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def broadcast_system_message(
+    broadcast_data: SystemMessageBroadcast,
+    current_user: User = Depends(require_admin())
+):
+    """
+    群发系统消息（管理员）
+    
+    后台分批发送，每批一个事务、用多行INSERT写入会话和消息；
+    接口立即返回任务，通过 GET /broadcast/{job_id} 查询进度。
+    
+    Args:
+        broadcast_data: 消息内容和受众条件
+        current_user: 当前登录用户（管理员）
+        
+    Returns:
+        BroadcastJobResponse: 群发任务
+    """
+    return await start_broadcast(
+        sender_id=current_user.id,
+        content=broadcast_data.content,
+        title=broadcast_data.title,
+        user_types=broadcast_data.user_types,
+        school_id=broadcast_data.school_id,
+        department_id=broadcast_data.department_id,
+        class_id=broadcast_data.class_id,
+        user_ids=broadcast_data.user_ids
+    )
+
+
+@router.get("/broadcast/{job_id}", response_model=BroadcastJobResponse)
+async def get_broadcast_progress(
+    job_id: str,
+    current_user: User = Depends(require_admin())
+):
+    """
+    查询群发任务进度（管理员）
+    
+    Args:
+        job_id: 任务ID
+        current_user: 当前登录用户（管理员）
+        
+    Returns:
+        BroadcastJobResponse: 群发任务进度
+    """
+    job = await get_broadcast_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="群发任务不存在或已过期"
+        )
+    return job
+
+
 @router.post("")
 async def create_system_message(
     receiver_id: str = Query(..., description="接收者用户ID"),
@@ -269,6 +313,7 @@ async def create_system_message(
     
     await db.commit()
     await db.refresh(message)
+    await record_new_message(receiver_id, MessageType.SYSTEM)
     
     return message
 
@@ -9,10 +9,11 @@ from uuid import uuid4
 from datetime import datetime
 
 from app.core.database import get_db
+from app.services.identity_context import get_identity_context
 from app.api.v1.auth import get_current_user
 from app.core.permissions import require_teacher
 from app.models.user import User
-from app.models.profile import TeacherProfile, StudentProfile
+from app.models.profile import StudentProfile
 from app.models.job import Job, Resume, JobApplication
 from pydantic import BaseModel, Field
 
@@ -88,11 +89,8 @@ async def recommend_talent(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="无权推荐学生"
         )
-    # 获取教师信息
-    teacher_result = await db.execute(
-        select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-    )
-    teacher = teacher_result.scalar_one_or_none()
+    # 获取教师信息（与权限检查共用请求级身份上下文）
+    teacher = await get_identity_context(db, current_user).get_teacher_profile()
     
     if not teacher:
         raise HTTPException(
@@ -253,10 +251,7 @@ async def get_talent_recommendations(
         TalentRecommendationListResponse: 推荐列表
     """
     # 获取教师信息
-    teacher_result = await db.execute(
-        select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-    )
-    teacher = teacher_result.scalar_one_or_none()
+    teacher = await get_identity_context(db, current_user).get_teacher_profile()
     
     if not teacher:
         raise HTTPException(
@@ -12,6 +12,7 @@ from app.core.database import get_db
 from app.api.v1.auth import get_current_user
 from app.core.permissions import require_admin, require_teacher
 from app.models.user import User
+from app.services.principal_service import invalidate_user_principal
 from app.models.profile import TeacherProfile, StudentProfile
 from app.models.school import Class, Department
 
@@ -236,13 +237,13 @@ async def create_sub_account(
         )
     
     # 创建用户
-    from app.core.security import get_password_hash
+    from app.core.security import get_password_hash_async
     new_user = User(
         id=str(uuid4()),
         username=account_data.username,
         phone=account_data.phone,
         email=account_data.email,
-        password_hash=get_password_hash(account_data.password),
+        password_hash=await get_password_hash_async(account_data.password),
         user_type="TEACHER",
         status="ACTIVE"
     )
@@ -338,6 +339,8 @@ async def delete_sub_account(
         await db.delete(user)
     
     await db.commit()
+    if user:
+        await invalidate_user_principal(user.username)
 
 
 # ==================== 教师注册审批 ====================
@@ -452,6 +455,7 @@ async def approve_teacher_registration(
     if approval_data.action == "APPROVE":
         user.status = "ACTIVE"
         await db.commit()
+        await invalidate_user_principal(user.username)
         return {
             "success": True,
             "message": "教师注册审批通过"
@@ -459,6 +463,7 @@ async def approve_teacher_registration(
     elif approval_data.action == "REJECT":
         user.status = "REJECTED"
         await db.commit()
+        await invalidate_user_principal(user.username)
         return {
             "success": True,
             "message": "教师注册审批拒绝"
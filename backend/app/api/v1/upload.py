@@ -4,12 +4,14 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, Query
 from fastapi.responses import JSONResponse
 from typing import List, Optional
+import asyncio
 from pathlib import Path
 
 from app.core.database import get_db
 from app.api.v1.auth import get_current_user
 from app.models.user import User
-from app.core.oss import oss_service
+from app.core.config import settings
+from app.core.storage import get_storage
 from app.schemas.upload import UploadResponse, UploadListResponse
 
 router = APIRouter()
@@ -27,26 +29,123 @@ ALLOWED_FILE_TYPES = ALLOWED_IMAGE_TYPES | ALLOWED_DOCUMENT_TYPES
 # 文件大小限制（10MB）
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
+# 文件头魔数：声明的类型必须与文件内容一致
+FILE_SIGNATURES = {
+    "image/jpeg": [b"\xff\xd8\xff"],
+    "image/jpg": [b"\xff\xd8\xff"],
+    "image/png": [b"\x89PNG\r\n\x1a\n"],
+    "image/gif": [b"GIF87a", b"GIF89a"],
+    "application/pdf": [b"%PDF-"],
+    "application/msword": [b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"],
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": [b"PK\x03\x04"],
+}
+
+
+class UploadRejected(Exception):
+    """上传文件不符合要求（类型、大小或内容）"""
 
-def validate_file(file: UploadFile, max_size: int = MAX_FILE_SIZE) -> None:
+
+def check_file_signature(content_type: str, head: bytes) -> bool:
     """
-    验证文件
+    检查文件头是否与声明的类型一致
+    
+    Args:
+        content_type: 声明的MIME类型
+        head: 文件开头的字节
+        
+    Returns:
+        bool: 是否一致
+    """
+    if content_type == "image/webp":
+        return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    if content_type == "text/plain":
+        # 纯文本不能包含空字节
+        return b"\x00" not in head
+    signatures = FILE_SIGNATURES.get(content_type)
+    return signatures is not None and any(head.startswith(signature) for signature in signatures)
+
+
+def _size_limit_message(max_size: int) -> str:
+    return f"文件大小超过限制（最大{max_size / 1024 / 1024}MB）"
+
+
+async def stream_upload(
+    file: UploadFile,
+    file_type: str,
+    allowed_types: set,
+    max_size: int = MAX_FILE_SIZE
+) -> dict:
+    """
+    流式上传单个文件
+    
+    按块读取上传文件（内存中最多保留一个块；python-multipart在请求解析时已把大文件写入临时文件），
+    在第一个块上校验大小和文件头，之后边读边写入存储，超过大小限制时中止并清理。
     
     Args:
         file: 上传的文件
+        file_type: 文件类型（存储目录）
+        allowed_types: 允许的MIME类型
         max_size: 最大文件大小（字节）
         
+    Returns:
+        dict: 上传结果（url、file_path、file_name、file_size、content_type）
+        
     Raises:
-        HTTPException: 如果文件不符合要求
+        UploadRejected: 文件类型、大小或内容不符合要求
+        Exception: 存储失败
     """
-    # 检查文件类型
-    if file.content_type not in ALLOWED_FILE_TYPES:
+    if file.content_type not in allowed_types:
+        raise UploadRejected(
+            f"不支持的文件类型：{file.content_type}。支持的类型：{', '.join(sorted(allowed_types))}"
+        )
+    if file.size is not None and file.size > max_size:
+        raise UploadRejected(_size_limit_message(max_size))
+    
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    first_chunk = await file.read(chunk_size)
+    if not first_chunk:
+        raise UploadRejected("文件内容为空")
+    if not check_file_signature(file.content_type, first_chunk):
+        raise UploadRejected(f"文件内容与声明的类型不符：{file.content_type}")
+    
+    received = 0
+    
+    async def chunks():
+        nonlocal received
+        chunk = first_chunk
+        while chunk:
+            received += len(chunk)
+            if received > max_size:
+                raise UploadRejected(_size_limit_message(max_size))
+            yield chunk
+            chunk = await file.read(chunk_size)
+    
+    storage = get_storage()
+    file_path = storage.generate_file_path(file_type, file.filename, file.content_type)
+    file_url = await storage.upload_stream(chunks(), file_path, content_type=file.content_type)
+    return {
+        "url": file_url,
+        "file_path": file_path,
+        "file_name": file.filename,
+        "file_size": received,
+        "content_type": file.content_type
+    }
+
+
+async def _upload_single(file: UploadFile, file_type: str, allowed_types: set) -> dict:
+    """上传单个文件，把错误转换为HTTP异常"""
+    try:
+        return await stream_upload(file, file_type, allowed_types)
+    except UploadRejected as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"不支持的文件类型：{file.content_type}。支持的类型：{', '.join(ALLOWED_FILE_TYPES)}"
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"文件上传失败：{str(e)}"
         )
-    
-    # 注意：文件大小需要在读取时检查
 
 
 @router.post("/image", response_model=UploadResponse)
@@ -71,46 +170,7 @@ async def upload_image(
     Raises:
         HTTPException: 如果文件不符合要求或上传失败
     """
-    # 验证文件类型
-    if file.content_type not in ALLOWED_IMAGE_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"不支持的文件类型：{file.content_type}。仅支持图片格式：{', '.join(ALLOWED_IMAGE_TYPES)}"
-        )
-    
-    # 读取文件内容
-    content = await file.read()
-    
-    # 检查文件大小
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"文件大小超过限制（最大{MAX_FILE_SIZE / 1024 / 1024}MB）"
-        )
-    
-    try:
-        # 生成文件路径
-        file_path = oss_service.generate_file_path(file_type, file.filename)
-        
-        # 上传到OSS
-        file_url = await oss_service.upload_file(
-            content,
-            file_path,
-            content_type=file.content_type
-        )
-        
-        return {
-            "url": file_url,
-            "file_path": file_path,
-            "file_name": file.filename,
-            "file_size": len(content),
-            "content_type": file.content_type
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"文件上传失败：{str(e)}"
-        )
+    return await _upload_single(file, file_type, ALLOWED_IMAGE_TYPES)
 
 
 @router.post("/document", response_model=UploadResponse)
@@ -135,69 +195,89 @@ async def upload_document(
     Raises:
         HTTPException: 如果文件不符合要求或上传失败
     """
-    # 验证文件类型
-    if file.content_type not in ALLOWED_DOCUMENT_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"不支持的文件类型：{file.content_type}。仅支持文档格式：{', '.join(ALLOWED_DOCUMENT_TYPES)}"
-        )
+    return await _upload_single(file, file_type, ALLOWED_DOCUMENT_TYPES)
+
+
+async def upload_files_concurrently(
+    files: List[UploadFile],
+    file_type: str,
+    allowed_types: set,
+    concurrency: int,
+    all_or_nothing: bool = False
+) -> dict:
+    """
+    并发上传多个文件，逐个报告结果
     
-    # 读取文件内容
-    content = await file.read()
+    Args:
+        files: 文件列表
+        file_type: 文件类型（存储目录）
+        allowed_types: 允许的MIME类型
+        concurrency: 同时上传的文件数
+        all_or_nothing: 为True时只要有文件失败，就删除本批已上传的文件
+        
+    Returns:
+        dict: files（成功的文件，按请求顺序）、total、failed（失败的文件和原因）、rolled_back
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
     
-    # 检查文件大小
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"文件大小超过限制（最大{MAX_FILE_SIZE / 1024 / 1024}MB）"
-        )
+    async def upload_one(file: UploadFile) -> dict:
+        async with semaphore:
+            return await stream_upload(file, file_type, allowed_types)
     
-    try:
-        # 生成文件路径
-        file_path = oss_service.generate_file_path(file_type, file.filename)
-        
-        # 上传到OSS
-        file_url = await oss_service.upload_file(
-            content,
-            file_path,
-            content_type=file.content_type
-        )
-        
-        return {
-            "url": file_url,
-            "file_path": file_path,
-            "file_name": file.filename,
-            "file_size": len(content),
-            "content_type": file.content_type
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"文件上传失败：{str(e)}"
+    results = await asyncio.gather(*(upload_one(file) for file in files), return_exceptions=True)
+    
+    uploaded_files = []
+    failed = []
+    for index, (file, result) in enumerate(zip(files, results)):
+        if isinstance(result, BaseException):
+            error = str(result) if isinstance(result, UploadRejected) else f"文件上传失败：{str(result)}"
+            failed.append({"index": index, "file_name": file.filename, "error": error})
+        else:
+            uploaded_files.append(result)
+    
+    rolled_back = False
+    if all_or_nothing and failed and uploaded_files:
+        storage = get_storage()
+        await asyncio.gather(
+            *(storage.delete_file(item["file_path"]) for item in uploaded_files),
+            return_exceptions=True
         )
+        uploaded_files = []
+        rolled_back = True
+    
+    return {
+        "files": uploaded_files,
+        "total": len(uploaded_files),
+        "failed": failed,
+        "rolled_back": rolled_back
+    }
 
 
 @router.post("/batch", response_model=UploadListResponse)
 async def upload_batch(
     files: List[UploadFile] = File(...),
     file_type: str = Query("general", description="文件类型"),
+    concurrency: Optional[int] = Query(None, ge=1, le=10, description="同时上传的文件数，默认使用配置UPLOAD_BATCH_CONCURRENCY"),
+    all_or_nothing: bool = Query(False, description="有文件失败时是否删除本批已上传的文件"),
     current_user: User = Depends(get_current_user),
     db = Depends(get_db)
 ):
     """
-    批量上传文件
+    批量上传文件（并发上传，逐个报告成功或失败）
     
     Args:
         files: 文件列表
         file_type: 文件类型
+        concurrency: 同时上传的文件数
+        all_or_nothing: 有文件失败时是否删除本批已上传的文件
         current_user: 当前登录用户
         db: 数据库会话
         
     Returns:
-        UploadListResponse: 上传结果列表
+        UploadListResponse: 上传成功的文件和失败的文件
         
     Raises:
-        HTTPException: 如果文件不符合要求或上传失败
+        HTTPException: 如果文件数量超过限制
     """
     if len(files) > 10:
         raise HTTPException(
@@ -205,46 +285,13 @@ async def upload_batch(
             detail="一次最多上传10个文件"
         )
     
-    uploaded_files = []
-    
-    for file in files:
-        # 验证文件类型
-        if file.content_type not in ALLOWED_FILE_TYPES:
-            continue
-        
-        # 读取文件内容
-        content = await file.read()
-        
-        # 检查文件大小
-        if len(content) > MAX_FILE_SIZE:
-            continue
-        
-        try:
-            # 生成文件路径
-            file_path = oss_service.generate_file_path(file_type, file.filename)
-            
-            # 上传到OSS
-            file_url = await oss_service.upload_file(
-                content,
-                file_path,
-                content_type=file.content_type
-            )
-            
-            uploaded_files.append({
-                "url": file_url,
-                "file_path": file_path,
-                "file_name": file.filename,
-                "file_size": len(content),
-                "content_type": file.content_type
-            })
-        except Exception as e:
-            # 跳过失败的文件，继续处理其他文件
-            continue
-    
-    return {
-        "files": uploaded_files,
-        "total": len(uploaded_files)
-    }
+    return await upload_files_concurrently(
+        files,
+        file_type,
+        ALLOWED_FILE_TYPES,
+        concurrency or settings.UPLOAD_BATCH_CONCURRENCY,
+        all_or_nothing=all_or_nothing
+    )
 
 
 @router.delete("/{file_path:path}")
@@ -268,7 +315,7 @@ async def delete_file(
         HTTPException: 如果删除失败
     """
     try:
-        success = await oss_service.delete_file(file_path)
+        success = await get_storage().delete_file(file_path)
         if success:
             return {"message": "文件删除成功"}
         else:
@@ -12,6 +12,7 @@ from app.core.database import get_db
 from app.api.v1.auth import get_current_user
 from app.core.permissions import require_admin
 from app.models.user import User
+from app.services.principal_service import invalidate_user_principal_by_id
 from app.models.profile import EnterpriseProfile
 from app.models.verification import EnterpriseVerification, PersonalVerification, SchoolVerification
 from app.models.profile import TeacherProfile
@@ -882,6 +883,7 @@ async def update_school_verification(
     verification.review_comment = verification_data.review_comment
     verification.reviewed_at = datetime.utcnow()
     
+    teacher = None
     if verification_data.status == VerificationStatus.APPROVED:
         # 更新教师为学校主账号
         teacher_result = await db.execute(
@@ -903,6 +905,8 @@ async def update_school_verification(
     
     await db.commit()
     await db.refresh(verification)
+    if teacher:
+        await invalidate_user_principal_by_id(db, teacher.user_id)
     
     import json
     other_docs = json.loads(verification.other_documents) if verification.other_documents else None
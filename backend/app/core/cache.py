@@ -1,9 +1,14 @@
 """
 Redis缓存工具模块
-使用连接池管理Redis连接
+使用连接池管理Redis连接，并在Redis前增加进程内LRU+TTL一级缓存
 """
+import asyncio
 import json
-from typing import Optional, Any
+import sys
+import time
+from datetime import datetime
+from collections import defaultdict, OrderedDict
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
 from redis.asyncio import Redis, ConnectionPool
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -14,6 +19,23 @@ logger = get_logger(__name__)
 redis_pool: Optional[ConnectionPool] = None
 redis_client: Optional[Redis] = None
 
+# 缓存命中统计（按命名空间，进程内计数，用于调优TTL）
+cache_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+# 标签集合的键前缀：标签 -> 该标签下的缓存键集合
+CACHE_TAG_PREFIX = "cache:tag:"
+
+# 各命名空间（键前缀）在进程内一级缓存中的TTL（秒）
+# 一级缓存无法被其他工作进程失效，TTL即跨进程数据的最大延迟
+LOCAL_CACHE_NAMESPACE_TTLS: Dict[str, int] = {
+    "industry:": 600,  # 行业、职位类型维表，几乎不变
+    "jobs:list:": 30,  # 职位列表
+    "sms_code:": 0,  # 短信验证码只走Redis，保证多进程一致
+    "auth:principal:": 0,  # 用户身份只走Redis：删除用户、修改密码等失效后所有worker立即生效
+    "broadcast:job:": 0,  # 群发任务进度只走Redis，任意worker都能查询到最新进度
+    "statistics:": 0,  # 统计快照只走Redis，一个worker刷新后其他worker立即读到新快照
+}
+
 
 def init_redis_pool():
     """初始化Redis连接池"""
@@ -29,7 +51,10 @@ def init_redis_pool():
                 decode_responses=True,
                 max_connections=50,  # 最大连接数
                 retry_on_timeout=True,
-                health_check_interval=30  # 健康检查间隔（秒）
+                health_check_interval=30,  # 健康检查间隔（秒）
+                # 超时后快速失败并计入熔断，避免Redis变慢拖慢请求
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
             )
             redis_client = Redis(connection_pool=redis_pool)
             logger.info("Redis连接池初始化成功")
@@ -39,63 +64,371 @@ def init_redis_pool():
             redis_client = None
 
 
+class RedisHealth:
+    """
+    Redis健康状态管理（熔断器）
+    
+    - closed：Redis正常，调用方直接使用客户端，不再逐次ping
+    - open：连续失败达到阈值后熔断，调用方直接降级到一级缓存；
+      到达下次探测时间后进入half_open，探测间隔按指数退避增长
+    - half_open：只放行一次探测（ping），成功则恢复closed，失败则重新open
+    
+    启动时状态未知，视为open且立即可探测，首次访问时探测一次。
+    健康状态由调用方上报的成功/失败以及后台心跳共同维护。
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, base_backoff: float, max_backoff: float):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = self.OPEN
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.next_probe_at = 0.0
+        self._state_since = time.monotonic()
+        self._state_seconds: Dict[str, float] = {
+            self.CLOSED: 0.0, self.OPEN: 0.0, self.HALF_OPEN: 0.0
+        }
+        self._transitions = 0
+    
+    def _transition(self, state: str):
+        """切换状态并累计上一状态的持续时间"""
+        if state == self.state:
+            return
+        now = time.monotonic()
+        self._state_seconds[self.state] += now - self._state_since
+        self._state_since = now
+        logger.debug(f"Redis健康状态: {self.state} -> {state}")
+        self.state = state
+        self._transitions += 1
+    
+    def should_probe(self) -> bool:
+        """熔断状态下是否到达探测时间（到达则进入half_open，只放行一次探测）"""
+        if self.state == self.OPEN and time.monotonic() >= self.next_probe_at:
+            self._transition(self.HALF_OPEN)
+            return True
+        return False
+    
+    def record_success(self):
+        """上报一次成功的Redis访问"""
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self.backoff = self.base_backoff
+            self._transition(self.CLOSED)
+    
+    def record_failure(self):
+        """上报一次失败的Redis访问"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN:
+            # 探测失败：延长下次探测间隔
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self._open()
+        elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+    
+    def _open(self):
+        """熔断，并安排下次探测时间"""
+        self.next_probe_at = time.monotonic() + self.backoff
+        self._transition(self.OPEN)
+    
+    def stats(self) -> Dict[str, Any]:
+        """健康状态指标：当前状态以及各状态累计时长（秒）"""
+        state_seconds = dict(self._state_seconds)
+        state_seconds[self.state] += time.monotonic() - self._state_since
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "next_probe_in": max(0.0, round(self.next_probe_at - time.monotonic(), 3))
+            if self.state == self.OPEN else 0.0,
+            "transitions": self._transitions,
+            "state_seconds": {k: round(v, 3) for k, v in state_seconds.items()},
+        }
+
+
+redis_health = RedisHealth(
+    failure_threshold=settings.REDIS_FAILURE_THRESHOLD,
+    base_backoff=settings.REDIS_PROBE_BACKOFF_BASE,
+    max_backoff=settings.REDIS_PROBE_BACKOFF_MAX,
+)
+
+# 后台心跳任务
+_heartbeat_task: Optional[asyncio.Task] = None
+
+
 async def get_redis() -> Optional[Redis]:
-    """获取Redis客户端（使用连接池）"""
-    global redis_client
+    """
+    获取Redis客户端（使用连接池）
     
+    正常状态下不再逐次ping：是否可用由redis_health判断，熔断期间返回None，
+    调用方降级到进程内缓存；到达探测时间时由本次调用ping一次。
+    调用方应通过redis_health上报访问结果。
+    """
     if redis_pool is None:
         init_redis_pool()
     
     if redis_client is None:
         return None
     
-    # 测试连接
+    if redis_health.state != RedisHealth.CLOSED:
+        if not redis_health.should_probe():
+            return None
+        await _probe_redis()
+        if redis_health.state != RedisHealth.CLOSED:
+            return None
+    
+    return redis_client
+
+
+async def _probe_redis():
+    """ping一次Redis并上报结果"""
     try:
         await redis_client.ping()
+        redis_health.record_success()
+    except asyncio.CancelledError:
+        # 探测在请求路径上执行，请求取消（客户端断开、超时）时按失败处理，
+        # 否则状态停留在half_open，之后既不放行访问也不再探测
+        redis_health.record_failure()
+        raise
     except Exception as e:
-        logger.warning(f"Redis连接测试失败: {str(e)}")
-        # 尝试重新初始化
-        init_redis_pool()
-        if redis_client:
-            try:
-                await redis_client.ping()
-            except Exception:
-                redis_client = None
+        logger.warning(f"Redis心跳检测失败: {str(e)}")
+        redis_health.record_failure()
+
+
+async def _heartbeat_loop():
+    """后台心跳：正常时定期ping，熔断时按退避时间探测"""
+    while True:
+        if redis_client is not None:
+            if redis_health.state == RedisHealth.CLOSED or redis_health.should_probe():
+                await _probe_redis()
+        await asyncio.sleep(settings.REDIS_HEARTBEAT_INTERVAL)
+
+
+def start_redis_heartbeat():
+    """启动Redis后台心跳（在应用启动时调用）"""
+    global _heartbeat_task
+    if _heartbeat_task is None or _heartbeat_task.done():
+        _heartbeat_task = asyncio.create_task(_heartbeat_loop())
+
+
+async def stop_redis_heartbeat():
+    """停止Redis后台心跳"""
+    global _heartbeat_task
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        try:
+            await _heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        _heartbeat_task = None
+
+
+class LocalCache:
+    """
+    进程内LRU+TTL缓存（Redis前的一级缓存）
     
-    return redis_client
+    - 按条目数和字节数双重限制容量，超出时淘汰最久未使用的条目
+    - 值以序列化后的字符串保存，与Redis语义一致，调用方修改返回值不会污染缓存
+    - 过期后的条目在stale窗口内仍可读取，用于“返回旧值并后台刷新”
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # key -> (序列化值, 过期时间, stale截止时间, 字节数)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # 标签 -> 缓存键集合（Redis不可用时也能按标签失效）
+        self._tags: Dict[str, Set[str]] = defaultdict(set)
+        # 缓存键 -> 标签集合（条目被删除、淘汰或过期时从标签中移除）
+        self._key_tags: Dict[str, Set[str]] = {}
+    
+    def get(self, key: str, allow_stale: bool = False) -> Tuple[Optional[str], bool]:
+        """
+        读取缓存
+        
+        Args:
+            key: 缓存键
+            allow_stale: 是否允许返回已过期但仍在stale窗口内的值
+            
+        Returns:
+            tuple: (序列化值或None, 是否为过期值)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        
+        value, expires_at, stale_until, _ = entry
+        now = time.monotonic()
+        if now < expires_at:
+            self._entries.move_to_end(key)
+            return value, False
+        if allow_stale and now < stale_until:
+            self._entries.move_to_end(key)
+            return value, True
+        if now >= stale_until:
+            self.delete(key)
+        return None, False
+    
+    def set(self, key: str, value: str, ttl: float, stale_ttl: float = 0):
+        """
+        写入缓存
+        
+        Args:
+            key: 缓存键
+            value: 序列化后的值
+            ttl: 有效期（秒）
+            stale_ttl: 过期后仍可作为旧值返回的时长（秒）
+        """
+        size = sys.getsizeof(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        
+        self.delete(key)
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl, now + ttl + stale_ttl, size)
+        self.current_bytes += size
+        
+        # 按LRU顺序淘汰，直到满足容量限制
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self.delete(oldest_key)
+    
+    def delete(self, key: str):
+        """删除缓存条目"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[3]
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+    
+    def tag(self, key: str, tags: Iterable[str]):
+        """将缓存键登记到标签下（只登记一级缓存中实际保存的键）"""
+        if key not in self._entries:
+            return
+        key_tags = self._key_tags.setdefault(key, set())
+        for tag in tags:
+            self._tags[tag].add(key)
+            key_tags.add(tag)
+    
+    def invalidate_tag(self, tag: str) -> Set[str]:
+        """删除标签下登记的所有条目，返回被删除的键"""
+        keys = set(self._tags.pop(tag, ()))
+        for key in keys:
+            self.delete(key)
+        return keys
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+        self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """容量统计"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# 进程内一级缓存
+local_cache = LocalCache(
+    max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+)
 
+# 正在后台刷新的缓存键 -> 刷新任务（避免同一个键重复刷新，并持有任务引用）
+_refreshing_tasks: Dict[str, asyncio.Task] = {}
 
-async def set_cache(key: str, value: Any, expire: int = 3600):
+# 正在加载的快照缓存键 -> 加载任务（并发未命中和提前刷新共用一次加载）
+_snapshot_tasks: Dict[str, asyncio.Task] = {}
+
+
+def get_local_ttl(key: str, expire: Optional[int] = None) -> int:
+    """
+    获取缓存键在进程内一级缓存中的TTL
+    
+    按最长前缀匹配 LOCAL_CACHE_NAMESPACE_TTLS，未匹配时使用默认值；
+    结果不超过该键在Redis中的过期时间。
+    
+    Args:
+        key: 缓存键
+        expire: Redis中的过期时间（秒），为None时不限制
+        
+    Returns:
+        int: 一级缓存TTL（秒）
     """
-    设置缓存
+    ttl = settings.LOCAL_CACHE_DEFAULT_TTL
+    matched = ""
+    for prefix, namespace_ttl in LOCAL_CACHE_NAMESPACE_TTLS.items():
+        if key.startswith(prefix) and len(prefix) > len(matched):
+            matched = prefix
+            ttl = namespace_ttl
+    return ttl if expire is None else min(ttl, expire)
+
+
+def _serialize(value: Any) -> str:
+    """字符串原样保存，其他值序列化为JSON"""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _deserialize(value: str) -> Any:
+    """尝试解析为JSON，如果失败则返回原始字符串"""
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+
+async def set_cache(key: str, value: Any, expire: int = 3600, stale_ttl: int = 0):
+    """
+    设置缓存（同时写入进程内一级缓存和Redis）
     
     Args:
         key: 缓存键
         value: 缓存值
         expire: 过期时间（秒）
+        stale_ttl: 一级缓存过期后仍可作为旧值返回的时长（秒）
     """
+    try:
+        serialized = _serialize(value)
+    except (TypeError, ValueError) as e:
+        logger.error(f"设置缓存失败: {str(e)}")
+        return
+    
     redis = await get_redis()
     if redis:
+        local_cache.set(key, serialized, get_local_ttl(key, expire), stale_ttl)
         try:
-            # 如果value是字符串，直接存储；否则序列化为JSON
-            if isinstance(value, str):
-                await redis.setex(key, expire, value)
-            else:
-                await redis.setex(
-                    key,
-                    expire,
-                    json.dumps(value, ensure_ascii=False)
-                )
+            await redis.setex(key, expire, serialized)
+            redis_health.record_success()
         except Exception as e:
+            redis_health.record_failure()
             logger.error(f"设置缓存失败: {str(e)}")
     else:
-        # 如果Redis不可用，使用内存缓存（简单实现）
+        # Redis不可用时，一级缓存按完整过期时间保存，保证降级期间仍有缓存
+        local_cache.set(key, serialized, expire, stale_ttl)
         logger.debug(f"[内存缓存] 设置 {key}")
 
 
 async def get_cache(key: str) -> Optional[Any]:
     """
-    获取缓存
+    获取缓存（先查进程内一级缓存，未命中再查Redis）
     
     Args:
         key: 缓存键
@@ -103,22 +436,148 @@ async def get_cache(key: str) -> Optional[Any]:
     Returns:
         缓存值，如果不存在返回None
     """
+    value, _ = local_cache.get(key)
+    if value is not None:
+        return _deserialize(value)
+    
     redis = await get_redis()
     if redis:
         try:
             value = await redis.get(key)
+            redis_health.record_success()
             if value:
-                # 尝试解析为JSON，如果失败则返回原始字符串
-                try:
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    return value
+                # 回填一级缓存，后续读取不再访问Redis
+                local_cache.set(key, value, get_local_ttl(key))
+                return _deserialize(value)
         except Exception as e:
+            redis_health.record_failure()
             logger.error(f"获取缓存失败: {str(e)}")
     
     return None
 
 
+async def get_or_set_cache(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    expire: int = 3600,
+    stale_ttl: int = 0
+) -> Any:
+    """
+    读穿缓存：命中直接返回，未命中调用loader加载并写入缓存
+    
+    stale_ttl大于0时启用“返回旧值并后台刷新”：一级缓存条目过期后的stale_ttl秒内，
+    直接返回旧值，同时在后台调用loader刷新（同一个键同时只刷新一次）。
+    loader会在请求结束后运行，不能依赖请求级别的数据库会话。
+    
+    Args:
+        key: 缓存键
+        loader: 加载数据的异步函数
+        expire: 过期时间（秒）
+        stale_ttl: 旧值可用时长（秒）
+        
+    Returns:
+        缓存值或loader的返回值
+    """
+    value, is_stale = local_cache.get(key, allow_stale=stale_ttl > 0)
+    if value is not None:
+        if is_stale and key not in _refreshing_tasks:
+            _refreshing_tasks[key] = asyncio.create_task(
+                _refresh_cache(key, loader, expire, stale_ttl)
+            )
+        return _deserialize(value)
+    
+    cached = await get_cache(key)
+    if cached is not None:
+        return cached
+    
+    result = await loader()
+    await set_cache(key, result, expire=expire, stale_ttl=stale_ttl)
+    return result
+
+
+async def _refresh_cache(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    expire: int,
+    stale_ttl: int
+):
+    """后台刷新缓存"""
+    try:
+        result = await loader()
+        await set_cache(key, result, expire=expire, stale_ttl=stale_ttl)
+    except Exception as e:
+        logger.error(f"后台刷新缓存失败 {key}: {str(e)}")
+    finally:
+        _refreshing_tasks.pop(key, None)
+
+
+async def get_or_load_snapshot(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int,
+    refresh_ahead: int = 0
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    读取带生成时间的缓存快照，快照最多比数据库旧ttl秒
+
+    - 未命中时同一个键只调用一次loader（single-flight），并发请求等待同一个加载任务
+    - 快照年龄超过 ttl - refresh_ahead 时仍返回当前快照，同时在后台提前刷新；
+      持续有访问时快照在过期前就被替换，请求不需要等待加载
+    - 快照保存生成时间（墙钟时间），Redis中的快照被所有工作进程共享，年龄按生成时间计算
+
+    loader在独立任务中运行（请求取消不会中断加载），不能依赖请求级别的数据库会话。
+
+    Args:
+        key: 缓存键
+        loader: 加载数据的异步函数，返回值需能序列化为JSON
+        ttl: 快照最大年龄（秒）
+        refresh_ahead: 过期前多少秒开始后台刷新
+
+    Returns:
+        tuple: (值, {generated_at: 生成时间, age_seconds: 快照年龄, ttl_seconds: ttl, refreshing: 是否正在刷新})
+    """
+    snapshot = await get_cache(key)
+    age = time.time() - snapshot.get("generated_at", 0) if isinstance(snapshot, dict) else ttl
+    if age < ttl:
+        if age >= ttl - refresh_ahead:
+            _start_snapshot_load(key, loader, ttl)
+    else:
+        snapshot = await asyncio.shield(_start_snapshot_load(key, loader, ttl))
+
+    generated_at = snapshot["generated_at"]
+    return snapshot["value"], {
+        "generated_at": datetime.fromtimestamp(generated_at).isoformat(),
+        "age_seconds": round(max(0.0, time.time() - generated_at), 3),
+        "ttl_seconds": ttl,
+        "refreshing": key in _snapshot_tasks,
+    }
+
+
+def _start_snapshot_load(key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> asyncio.Task:
+    """启动快照加载任务；同一个键已在加载时返回已有任务"""
+    task = _snapshot_tasks.get(key)
+    if task is None:
+        task = asyncio.create_task(_load_snapshot(key, loader, ttl))
+        _snapshot_tasks[key] = task
+        task.add_done_callback(lambda done: _finish_snapshot_load(key, done))
+    return task
+
+
+def _finish_snapshot_load(key: str, task: asyncio.Task):
+    """加载结束：移除任务，并记录失败（后台刷新失败时没有调用方等待该任务）"""
+    _snapshot_tasks.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"加载缓存快照失败 {key}: {str(task.exception())}")
+
+
+async def _load_snapshot(key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Dict[str, Any]:
+    """调用loader并写入快照；生成时间取加载开始时间"""
+    generated_at = time.time()
+    snapshot = {"value": await loader(), "generated_at": generated_at}
+    await set_cache(key, snapshot, expire=ttl)
+    return snapshot
+
+
 async def delete_cache(key: str):
     """
     删除缓存
@@ -126,17 +585,106 @@ async def delete_cache(key: str):
     Args:
         key: 缓存键
     """
+    local_cache.delete(key)
     redis = await get_redis()
     if redis:
         try:
             await redis.delete(key)
+            redis_health.record_success()
         except Exception as e:
+            redis_health.record_failure()
             logger.error(f"删除缓存失败: {str(e)}")
 
 
+def record_cache_access(namespace: str, hit: bool):
+    """
+    记录一次缓存访问（命中或未命中）
+    
+    Args:
+        namespace: 缓存命名空间（如 jobs:list）
+        hit: 是否命中
+    """
+    cache_stats[namespace]["hits" if hit else "misses"] += 1
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取各命名空间的缓存命中统计
+    
+    Returns:
+        dict: {命名空间: {hits, misses, hit_rate}}
+    """
+    stats = {}
+    for namespace, counters in cache_stats.items():
+        total = counters["hits"] + counters["misses"]
+        stats[namespace] = {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": round(counters["hits"] / total, 4) if total else 0.0,
+        }
+    return stats
+
+
+async def tag_cache_key(key: str, tags: Iterable[str], expire: int = 3600):
+    """
+    将缓存键登记到标签下，便于按标签批量失效
+    
+    Args:
+        key: 缓存键
+        tags: 标签列表
+        expire: 标签集合的过期时间（秒），应不小于缓存键的过期时间
+    """
+    tags = list(tags)
+    local_cache.tag(key, tags)
+    
+    redis = await get_redis()
+    if not redis:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                tag_key = f"{CACHE_TAG_PREFIX}{tag}"
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, expire)
+            await pipe.execute()
+        redis_health.record_success()
+    except Exception as e:
+        redis_health.record_failure()
+        logger.error(f"登记缓存标签失败: {str(e)}")
+
+
+async def invalidate_cache_tags(*tags: str):
+    """
+    按标签失效缓存：删除标签下登记的所有缓存键以及标签集合本身
+    
+    Args:
+        tags: 要失效的标签
+    """
+    for tag in tags:
+        local_cache.invalidate_tag(tag)
+    
+    redis = await get_redis()
+    if not redis:
+        return
+    try:
+        for tag in tags:
+            tag_key = f"{CACHE_TAG_PREFIX}{tag}"
+            keys = await redis.smembers(tag_key)
+            # 其他键可能由本进程从Redis回填到一级缓存，一并删除
+            for key in keys:
+                local_cache.delete(key)
+            await redis.delete(tag_key, *keys)
+            logger.debug(f"缓存标签已失效: {tag}（{len(keys)} 个键）")
+        redis_health.record_success()
+    except Exception as e:
+        redis_health.record_failure()
+        logger.error(f"按标签失效缓存失败: {str(e)}")
+
+
 async def close_redis():
     """关闭Redis连接和连接池"""
     global redis_client, redis_pool
+    await stop_redis_heartbeat()
     if redis_client:
         await redis_client.close()
         redis_client = None
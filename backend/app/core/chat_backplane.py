@@ -0,0 +1,268 @@
+"""
+聊天消息投递通道（跨worker）
+- LocalChatBackplane：进程内投递，单worker部署和测试使用
+- RedisChatBackplane：每个用户一个Redis发布/订阅频道，任意worker发布的消息
+  由持有该用户连接的worker投递；在线状态按worker记录在Redis中，随心跳续期
+
+worker只订阅本进程有连接的用户频道，以及一个全局广播频道。
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, Optional, Set
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 投递回调：(user_id, message)，user_id为None表示广播给本进程所有连接
+DeliverCallback = Callable[[Optional[str], dict], Awaitable[None]]
+
+CHAT_USER_CHANNEL_PREFIX = "chat:user:"
+CHAT_BROADCAST_CHANNEL = "chat:broadcast"
+CHAT_PRESENCE_PREFIX = "chat:presence:"  # 集合：chat:presence:<worker_id> -> 该worker上有连接的用户
+CHAT_PRESENCE_WORKERS_KEY = "chat:presence:workers"  # 有序集合：worker_id -> 最近一次心跳时间
+
+
+class LocalChatBackplane:
+    """进程内投递通道：消息直接交给本进程的连接管理器"""
+
+    def __init__(self):
+        self._deliver: Optional[DeliverCallback] = None
+        self._local_users: Set[str] = set()  # 本进程有连接的用户
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, user_id: str, message: dict):
+        if self._deliver and user_id in self._local_users:
+            await self._deliver(user_id, message)
+
+    async def broadcast(self, message: dict):
+        if self._deliver:
+            await self._deliver(None, message)
+
+    async def subscribe(self, user_id: str):
+        """本进程出现该用户的第一个连接时调用"""
+        self._local_users.add(user_id)
+
+    async def unsubscribe(self, user_id: str):
+        """本进程该用户的最后一个连接断开时调用"""
+        self._local_users.discard(user_id)
+
+    async def is_online(self, user_id: str) -> bool:
+        return user_id in self._local_users
+
+
+class RedisChatBackplane(LocalChatBackplane):
+    """
+    Redis发布/订阅投递通道
+
+    Redis不可用时退化为进程内投递（只能送达本worker上的连接），恢复后重新订阅。
+    每个worker把本进程有连接的用户记录在自己的集合中，订阅任务每隔REDIS_HEARTBEAT_INTERVAL秒
+    续期集合并更新worker心跳时间；worker异常退出后，其在线状态在CHAT_PRESENCE_TTL秒后失效。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.worker_id = uuid.uuid4().hex
+        self._presence_key = f"{CHAT_PRESENCE_PREFIX}{self.worker_id}"
+        self._presence_refreshed_at = 0.0
+        self._pubsub = None
+        self._pubsub_lock = asyncio.Lock()
+        self._listener_task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+        # 撤销本进程的在线状态
+        from app.core.cache import get_redis
+        redis = await get_redis()
+        if redis:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.delete(self._presence_key)
+                pipe.zrem(CHAT_PRESENCE_WORKERS_KEY, self.worker_id)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"撤销聊天在线状态失败: {str(e)}")
+        await self._close_pubsub()
+        await super().stop()
+
+    async def _close_pubsub(self):
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def _refresh_presence(self, redis, resync: bool = False):
+        """
+        续期本进程的在线状态并记录心跳时间，同时清理已失效的worker
+
+        集合已过期（如Redis重启或心跳中断超过CHAT_PRESENCE_TTL）或resync为True时，按本进程连接重新写入
+        """
+        ttl = settings.CHAT_PRESENCE_TTL
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.expire(self._presence_key, ttl)
+        pipe.zadd(CHAT_PRESENCE_WORKERS_KEY, {self.worker_id: now})
+        pipe.zremrangebyscore(CHAT_PRESENCE_WORKERS_KEY, "-inf", now - ttl)
+        refreshed = (await pipe.execute())[0]
+        if (resync or not refreshed) and self._local_users:
+            pipe = redis.pipeline(transaction=False)
+            pipe.delete(self._presence_key)
+            pipe.sadd(self._presence_key, *self._local_users)
+            pipe.expire(self._presence_key, ttl)
+            await pipe.execute()
+        self._presence_refreshed_at = time.monotonic()
+
+    async def _ensure_pubsub(self):
+        """
+        建立订阅连接：订阅广播频道和本进程所有用户频道，
+        并重新写入Redis不可用期间的在线状态
+        """
+        if self._pubsub is not None:
+            return self._pubsub
+        async with self._pubsub_lock:
+            if self._pubsub is not None:
+                return self._pubsub
+            from app.core.cache import get_redis
+            redis = await get_redis()
+            if not redis:
+                return None
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            channels = [CHAT_BROADCAST_CHANNEL] + [
+                f"{CHAT_USER_CHANNEL_PREFIX}{user_id}" for user_id in self._local_users
+            ]
+            await pubsub.subscribe(*channels)
+            await self._refresh_presence(redis, resync=True)
+            self._pubsub = pubsub
+            return pubsub
+
+    async def _listen(self):
+        """后台读取订阅消息并投递给本进程连接；连接出错时按间隔重建订阅"""
+        while True:
+            try:
+                pubsub = await self._ensure_pubsub()
+                if pubsub is None:
+                    await asyncio.sleep(settings.REDIS_HEARTBEAT_INTERVAL)
+                    continue
+                if time.monotonic() - self._presence_refreshed_at >= settings.REDIS_HEARTBEAT_INTERVAL:
+                    from app.core.cache import get_redis
+                    redis = await get_redis()
+                    if redis:
+                        await self._refresh_presence(redis)
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or self._deliver is None:
+                    continue
+                channel = message["channel"]
+                payload = json.loads(message["data"])
+                if channel == CHAT_BROADCAST_CHANNEL:
+                    await self._deliver(None, payload)
+                else:
+                    await self._deliver(channel[len(CHAT_USER_CHANNEL_PREFIX):], payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"聊天订阅连接出错，稍后重建: {str(e)}")
+                await self._close_pubsub()
+                await asyncio.sleep(settings.REDIS_PROBE_BACKOFF_BASE)
+
+    async def _publish(self, channel: str, message: dict) -> bool:
+        """发布消息，Redis不可用时返回False"""
+        from app.core.cache import get_redis, redis_health
+        redis = await get_redis()
+        if not redis:
+            return False
+        try:
+            await redis.publish(channel, json.dumps(message, ensure_ascii=False, default=str))
+            redis_health.record_success()
+            return True
+        except Exception as e:
+            redis_health.record_failure()
+            logger.warning(f"发布聊天消息失败，改为本进程投递: {str(e)}")
+            return False
+
+    async def publish(self, user_id: str, message: dict):
+        if not await self._publish(f"{CHAT_USER_CHANNEL_PREFIX}{user_id}", message):
+            await super().publish(user_id, message)
+
+    async def broadcast(self, message: dict):
+        if not await self._publish(CHAT_BROADCAST_CHANNEL, message):
+            await super().broadcast(message)
+
+    async def subscribe(self, user_id: str):
+        await super().subscribe(user_id)
+        try:
+            pubsub = await self._ensure_pubsub()
+            if pubsub is None:
+                # Redis恢复后由_ensure_pubsub补订阅
+                return
+            await pubsub.subscribe(f"{CHAT_USER_CHANNEL_PREFIX}{user_id}")
+            from app.core.cache import get_redis
+            redis = await get_redis()
+            if redis:
+                pipe = redis.pipeline(transaction=False)
+                pipe.sadd(self._presence_key, user_id)
+                pipe.expire(self._presence_key, settings.CHAT_PRESENCE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"订阅聊天频道失败: {str(e)}")
+
+    async def unsubscribe(self, user_id: str):
+        await super().unsubscribe(user_id)
+        try:
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(f"{CHAT_USER_CHANNEL_PREFIX}{user_id}")
+            from app.core.cache import get_redis
+            redis = await get_redis()
+            if redis:
+                await redis.srem(self._presence_key, user_id)
+        except Exception as e:
+            logger.warning(f"取消订阅聊天频道失败: {str(e)}")
+
+    async def is_online(self, user_id: str) -> bool:
+        if user_id in self._local_users:
+            return True
+        from app.core.cache import get_redis
+        redis = await get_redis()
+        if not redis:
+            return False
+        try:
+            # 只看最近CHAT_PRESENCE_TTL秒内有心跳的worker
+            workers = await redis.zrangebyscore(
+                CHAT_PRESENCE_WORKERS_KEY, time.time() - settings.CHAT_PRESENCE_TTL, "+inf"
+            )
+            if not workers:
+                return False
+            pipe = redis.pipeline(transaction=False)
+            for worker_id in workers:
+                pipe.sismember(f"{CHAT_PRESENCE_PREFIX}{worker_id}", user_id)
+            return any(await pipe.execute())
+        except Exception:
+            return False
+
+
+def create_chat_backplane():
+    """按配置创建聊天投递通道（CHAT_BACKPLANE：redis 或 local）"""
+    if settings.CHAT_BACKPLANE == "local":
+        return LocalChatBackplane()
+    return RedisChatBackplane()
@@ -29,6 +29,31 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: str = ""
+    REDIS_SOCKET_TIMEOUT: float = 1.0  # Redis读写/连接超时（秒）
+    REDIS_HEARTBEAT_INTERVAL: float = 5.0  # 后台心跳间隔（秒）
+    REDIS_FAILURE_THRESHOLD: int = 3  # 连续失败多少次后熔断
+    REDIS_PROBE_BACKOFF_BASE: float = 1.0  # 熔断后首次探测间隔（秒）
+    REDIS_PROBE_BACKOFF_MAX: float = 60.0  # 探测间隔上限（秒）
+    
+    # 聊天消息投递通道：redis（跨worker发布/订阅）或 local（单进程，测试使用）
+    CHAT_BACKPLANE: str = "redis"
+    CHAT_SEND_QUEUE_SIZE: int = 100  # 每个WebSocket连接的发送队列长度
+    CHAT_SEND_TIMEOUT: float = 5.0  # 单条消息发送超时（秒），超时断开连接
+    CHAT_SLOW_CONSUMER_POLICY: str = "disconnect"  # 发送队列满时：disconnect断开连接，drop丢弃新消息
+    CHAT_PRESENCE_TTL: int = 30  # worker在线状态的过期时间（秒），由订阅任务每隔REDIS_HEARTBEAT_INTERVAL秒续期
+    UNREAD_COUNTER_TTL: int = 86400  # Redis中每个用户未读计数的过期时间（秒），过期后从数据库重建
+    COUNTER_FLUSH_INTERVAL: float = 5.0  # 查看/下载/申请次数缓冲写入数据库的间隔（秒）
+    COUNTER_FLUSH_BATCH_SIZE: int = 500  # 每条计数UPDATE语句最多更新的行数
+    STATISTICS_ROLLUP_RECONCILE_INTERVAL: float = 3600  # 统计汇总表后台重算间隔（秒）
+    STATISTICS_ROLLUP_RECONCILE_DAYS: int = 7  # 每次重算最近多少天的汇总行（按创建日期分桶的指标）
+    STATISTICS_ROLLUP_FULL_REBUILD_INTERVAL: float = 86400  # 全部重算间隔（秒），修正重算天数之外的偏差；0表示不定期全部重算
+    STATISTICS_CACHE_TTL: int = 60  # 平台概览、双选会和宣讲会统计快照的最大年龄（秒）
+    STATISTICS_CACHE_REFRESH_AHEAD: int = 15  # 统计快照过期前多少秒开始后台刷新
+    
+    # 进程内一级缓存配置（Redis前的LRU+TTL缓存）
+    LOCAL_CACHE_MAX_ENTRIES: int = 10000
+    LOCAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    LOCAL_CACHE_DEFAULT_TTL: int = 60  # 未配置命名空间TTL时的默认值（秒）
     
     # JWT配置
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
@@ -36,12 +61,37 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # 密码哈希配置（bcrypt在独立线程池中执行，避免阻塞事件循环）
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt成本因子，修改后用户登录时自动按新成本重新哈希
+    PASSWORD_HASH_WORKERS: int = 4  # 密码哈希线程数
+    PASSWORD_HASH_MAX_PENDING: int = 64  # 执行中和排队中的哈希任务上限，超过后直接返回503
+    
+    # 令牌验证缓存和吊销名单
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # 已验证令牌缓存条目数，0表示不缓存
+    TOKEN_DENYLIST_BLOOM_BITS: int = 1 << 20  # 吊销名单布隆过滤器位数（128KB）
+    TOKEN_DENYLIST_SYNC_INTERVAL: float = 5.0  # 从Redis同步吊销名单的间隔（秒）
+    
+    # 限流配置（令牌桶，每分钟请求数）
+    RATE_LIMIT_DEFAULT_PER_MINUTE: int = 60  # 默认路由组（列表、详情等）
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 20  # 登录、注册、短信验证码
+    RATE_LIMIT_UPLOAD_PER_MINUTE: int = 20  # 文件上传
+    
     # OSS配置
     OSS_ACCESS_KEY_ID: str = ""
     OSS_ACCESS_KEY_SECRET: str = ""
     OSS_ENDPOINT: str = "oss-cn-hangzhou.aliyuncs.com"
     OSS_BUCKET_NAME: str = "nanyiqiutang"
     OSS_REGION: str = "cn-hangzhou"
+    OSS_MULTIPART_PART_SIZE: int = 5 * 1024 * 1024  # 分片上传的分片大小（字节），小于一个分片的文件直接put_object
+    SIGNED_URL_CACHE_MAX_ENTRIES: int = 10000  # 签名URL缓存条目数，0表示不缓存
+    SIGNED_URL_REFRESH_MARGIN: int = 3600  # 签名URL过期前多少秒不再从缓存返回（秒）
+    
+    # 文件存储配置
+    STORAGE_BACKEND: str = "oss"  # oss：阿里云OSS；local：本地文件系统（开发和测试）
+    LOCAL_STORAGE_ROOT: str = "uploads"  # 本地存储根目录
+    LOCAL_STORAGE_URL_PREFIX: str = "/uploads"  # 本地存储文件的访问URL前缀
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传时每次读取的块大小（字节）
+    UPLOAD_BATCH_CONCURRENCY: int = 4  # 批量上传时同时上传的文件数
     
     # CORS配置
     CORS_ORIGINS: str = "http://localhost:8008,http://localhost:3000"
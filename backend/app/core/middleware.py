@@ -2,50 +2,77 @@
 中间件模块
 包含日志、限流等中间件
 """
+import math
 import time
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from collections import defaultdict
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
 from app.core.logging import get_logger
-from app.core.cache import get_redis
+from app.core.cache import get_redis, redis_health
+from app.core.security import verify_token
 
 logger = get_logger(__name__)
 
-# 内存限流器（Redis不可用时的降级方案）
-rate_limiter = defaultdict(list)
+def _get_path(scope: Scope) -> str:
+    """获取请求路径（与 Request.url.path 一致，包含root_path）"""
+    return scope.get("root_path", "") + scope["path"]
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """请求日志中间件"""
+
+def _get_client_host(scope: Scope) -> str:
+    """获取客户端IP"""
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class LoggingMiddleware:
+    """
+    请求日志中间件（纯ASGI实现）
+    
+    不使用BaseHTTPMiddleware，避免每个请求额外创建任务和包装响应流，
+    流式响应也能正常透传。
+    """
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         start_time = time.time()
+        method = scope["method"]
+        path = _get_path(scope)
         
         # 记录请求信息
-        logger.info(
-            f"{request.method} {request.url.path} - "
-            f"Client: {request.client.host if request.client else 'unknown'}"
-        )
+        logger.info(f"{method} {path} - Client: {_get_client_host(scope)}")
+        
+        async def send_with_process_time(message: Message):
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                
+                # 记录响应信息
+                logger.info(
+                    f"{method} {path} - "
+                    f"Status: {message['status']} - "
+                    f"Time: {process_time:.3f}s"
+                )
+                
+                # 添加处理时间到响应头
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(process_time)
+            await send(message)
         
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # 记录响应信息
-            logger.info(
-                f"{request.method} {request.url.path} - "
-                f"Status: {response.status_code} - "
-                f"Time: {process_time:.3f}s"
-            )
-            
-            # 添加处理时间到响应头
-            response.headers["X-Process-Time"] = str(process_time)
-            return response
-            
+            await self.app(scope, receive, send_with_process_time)
         except Exception as e:
             process_time = time.time() - start_time
             logger.error(
-                f"{request.method} {request.url.path} - "
+                f"{method} {path} - "
                 f"Error: {str(e)} - "
                 f"Time: {process_time:.3f}s",
                 exc_info=True
@@ -53,94 +80,208 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             raise
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """API限流中间件（使用Redis实现分布式限流）"""
+# 令牌桶限流Lua脚本：读取、补充、扣减、写回在Redis中一次往返内原子完成
+# KEYS[1]: 令牌桶键；ARGV[1]: 桶容量；ARGV[2]: 每秒补充令牌数
+# 返回：{是否允许(1/0), 需要等待的秒数（向上取整）}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, retry_after}
+"""
+
+
+class RateLimitRule:
+    """路由组限流规则（令牌桶）"""
     
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
+    def __init__(self, group: str, prefixes: Tuple[str, ...], per_minute: int, burst: Optional[int] = None):
+        """
+        Args:
+            group: 路由组名称
+            prefixes: 归入该组的路径前缀
+            per_minute: 每分钟补充的令牌数（持续速率）
+            burst: 桶容量（允许的突发请求数），默认等于per_minute
+        """
+        self.group = group
+        self.prefixes = prefixes
+        self.capacity = burst or per_minute
+        self.rate = per_minute / 60.0
+
+
+# 默认的路由组限流规则：按顺序匹配路径前缀，未匹配的请求归入default组
+DEFAULT_RATE_LIMIT_RULES = [
+    # 登录、注册、短信验证码：防止暴力破解和短信轰炸
+    RateLimitRule("auth", ("/api/v1/auth", "/api/v1/sms"), settings.RATE_LIMIT_AUTH_PER_MINUTE),
+    # 文件上传：单次请求开销大
+    RateLimitRule("upload", ("/api/v1/upload",), settings.RATE_LIMIT_UPLOAD_PER_MINUTE),
+]
+
+
+class MemoryTokenBuckets:
+    """
+    内存令牌桶（Redis不可用时的降级方案）
+    
+    每个限流键只保存固定大小的 [令牌数, 上次更新时间]，
+    总键数超过上限时淘汰最久未访问的键，内存占用有界。
+    """
+    
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
     
-    async def _check_rate_limit_redis(self, client_ip: str) -> bool:
+    def acquire(self, key: str, rule: RateLimitRule) -> Tuple[bool, int]:
         """
-        使用Redis检查限流
+        尝试消耗一个令牌
         
         Returns:
-            True: 允许请求
-            False: 超过限制
+            tuple: (是否允许, 需要等待的秒数)
         """
-        redis = await get_redis()
-        if not redis:
-            return True  # Redis不可用时，降级到内存限流
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(rule.capacity), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
         
-        try:
-            key = f"rate_limit:{client_ip}"
-            current_count = await redis.incr(key)
-            
-            # 如果是第一次请求，设置过期时间
-            if current_count == 1:
-                await redis.expire(key, 60)  # 60秒过期
-            
-            # 检查是否超过限制
-            if current_count > self.requests_per_minute:
-                return False
-            
-            return True
-        except Exception as e:
-            logger.warning(f"Redis限流检查失败，降级到内存限流: {str(e)}")
-            return None  # 返回None表示需要降级
+        tokens = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, 0
+        bucket[0] = tokens
+        return False, math.ceil((1 - tokens) / rule.rate)
     
-    async def _check_rate_limit_memory(self, client_ip: str) -> bool:
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimitMiddleware:
+    """
+    API限流中间件（令牌桶，使用Redis实现分布式限流，纯ASGI实现）
+    
+    - 按路由组分别配额（auth/sms、upload、其他）
+    - 已登录用户按用户ID限流，未登录按客户端IP限流
+    - Redis中通过Lua脚本一次往返完成判断；Redis不可用时降级到有界的内存令牌桶
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        requests_per_minute: int = 60,
+        rules: Optional[List[RateLimitRule]] = None,
+        max_memory_keys: int = 10000
+    ):
+        self.app = app
+        self.requests_per_minute = requests_per_minute
+        self.rules = DEFAULT_RATE_LIMIT_RULES if rules is None else rules
+        self.default_rule = RateLimitRule("default", (), requests_per_minute)
+        self.memory_buckets = MemoryTokenBuckets(max_keys=max_memory_keys)
+        self._script = None
+    
+    def _match_rule(self, path: str) -> RateLimitRule:
+        """根据请求路径匹配路由组规则"""
+        for rule in self.rules:
+            if path.startswith(rule.prefixes):
+                return rule
+        return self.default_rule
+    
+    @staticmethod
+    def _get_identity(scope: Scope) -> str:
         """
-        使用内存检查限流（降级方案）
+        获取限流主体：已登录用户按用户ID，否则按客户端IP
         
-        Returns:
-            True: 允许请求
-            False: 超过限制
+        这里只校验令牌签名、不查询数据库；令牌无效时按IP限流。
         """
-        current_time = time.time()
-        minute_ago = current_time - 60
-        
-        # 清理过期记录
-        rate_limiter[client_ip] = [
-            req_time for req_time in rate_limiter[client_ip]
-            if req_time > minute_ago
-        ]
+        authorization = Headers(scope=scope).get("authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            payload = verify_token(authorization[7:])
+            if payload:
+                user_id = payload.get("user_id") or payload.get("sub")
+                if user_id:
+                    return f"user:{user_id}"
+        return f"ip:{_get_client_host(scope)}"
+    
+    async def _check_rate_limit_redis(self, key: str, rule: RateLimitRule) -> Optional[Tuple[bool, int]]:
+        """
+        使用Redis检查限流（Lua脚本，一次往返）
         
-        # 检查是否超过限制
-        if len(rate_limiter[client_ip]) >= self.requests_per_minute:
-            return False
+        Returns:
+            (是否允许, 需要等待的秒数)；None表示Redis不可用，需要降级
+        """
+        redis = await get_redis()
+        if not redis:
+            return None
         
-        # 记录本次请求
-        rate_limiter[client_ip].append(current_time)
-        return True
+        try:
+            if self._script is None:
+                self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, retry_after = await self._script(
+                keys=[key], args=[rule.capacity, rule.rate], client=redis
+            )
+            redis_health.record_success()
+            return bool(allowed), int(retry_after)
+        except Exception as e:
+            redis_health.record_failure()
+            logger.warning(f"Redis限流检查失败，降级到内存限流: {str(e)}")
+            return None
     
-    async def dispatch(self, request: Request, call_next):
-        # 获取客户端IP
-        client_ip = request.client.host if request.client else "unknown"
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
         # 跳过健康检查接口
-        if request.url.path in ["/health", "/"]:
-            return await call_next(request)
+        path = _get_path(scope)
+        if path in ["/health", "/"]:
+            await self.app(scope, receive, send)
+            return
         
-        # 先尝试使用Redis限流
-        redis_result = await self._check_rate_limit_redis(client_ip)
+        rule = self._match_rule(path)
+        identity = self._get_identity(scope)
+        key = f"rate_limit:{rule.group}:{identity}"
         
-        if redis_result is None:
-            # Redis不可用，降级到内存限流
-            if not await self._check_rate_limit_memory(client_ip):
-                logger.warning(f"Rate limit exceeded for IP: {client_ip} (内存限流)")
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="请求过于频繁，请稍后再试"
-                )
-        elif not redis_result:
-            # Redis限流：超过限制
-            logger.warning(f"Rate limit exceeded for IP: {client_ip} (Redis限流)")
-            raise HTTPException(
+        # 先尝试使用Redis限流，不可用时降级到内存限流
+        result = await self._check_rate_limit_redis(key, rule)
+        source = "Redis限流"
+        if result is None:
+            result = self.memory_buckets.acquire(key, rule)
+            source = "内存限流"
+        
+        allowed, retry_after = result
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {identity} on {rule.group} ({source})")
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="请求过于频繁，请稍后再试"
+                content={
+                    "error_code": status.HTTP_429_TOO_MANY_REQUESTS * 10,
+                    "error_message": "请求过于频繁，请稍后再试",
+                    "detail": "请求过于频繁，请稍后再试"
+                },
+                headers={"Retry-After": str(max(retry_after, 1))}
             )
+            await response(scope, receive, send)
+            return
         
-        return await call_next(request)
-
-
+        await self.app(scope, receive, send)
@@ -2,11 +2,15 @@
 OSS文件上传工具
 当 oss2 或阿里云 SDK 不可用（如 certifi 兼容性问题）时，使用禁用态 stub，保证应用能正常启动。
 """
-from typing import Optional
+from typing import AsyncIterator, Optional
+import asyncio
 import uuid
 from datetime import datetime
 from pathlib import Path
 from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
 
 # 延迟导入 oss2，避免 aliyunsdkcore 与 certifi 不兼容时阻塞应用启动
 try:
@@ -18,6 +22,48 @@ except Exception as e:
     _OSS2_IMPORT_ERROR = str(e)
 
 
+# MIME类型 -> 存储文件扩展名。扩展名决定文件被访问时的Content-Type，
+# 只能由校验过的MIME类型决定，不能使用客户端文件名中的扩展名（如把纯文本命名为 x.html）
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "text/plain": ".txt",
+}
+
+
+def generate_file_path(file_type: str, filename: str, content_type: Optional[str] = None) -> str:
+    """
+    生成文件路径（存储对象键）
+    
+    Args:
+        file_type: 文件类型（avatar, resume, job, etc.）
+        filename: 原始文件名
+        content_type: 校验过的文件MIME类型，扩展名按类型确定
+        
+    Returns:
+        str: 文件路径
+    """
+    if content_type is not None:
+        ext = CONTENT_TYPE_EXTENSIONS.get(content_type, "")
+    else:
+        # 未提供类型时只保留白名单中的扩展名
+        ext = Path(filename or "").suffix.lower()
+        if ext not in CONTENT_TYPE_EXTENSIONS.values():
+            ext = ""
+    # 生成唯一文件名
+    unique_filename = f"{uuid.uuid4().hex}{ext}"
+    # 按日期组织目录结构
+    date_str = datetime.now().strftime("%Y/%m/%d")
+    # 生成完整路径
+    return f"{file_type}/{date_str}/{unique_filename}"
+
+
 class OSSService:
     """
     OSS服务类，用于文件上传和管理
@@ -46,26 +92,17 @@ class OSSService:
             self.bucket = None
             self.enabled = False
     
-    def generate_file_path(self, file_type: str, filename: str) -> str:
-        """
-        生成文件路径
-        
-        Args:
-            file_type: 文件类型（avatar, resume, job, etc.）
-            filename: 原始文件名
-            
-        Returns:
-            str: 文件路径
-        """
-        # 获取文件扩展名
-        ext = Path(filename).suffix
-        # 生成唯一文件名
-        unique_filename = f"{uuid.uuid4().hex}{ext}"
-        # 按日期组织目录结构
-        date_str = datetime.now().strftime("%Y/%m/%d")
-        # 生成完整路径
-        file_path = f"{file_type}/{date_str}/{unique_filename}"
-        return file_path
+    def generate_file_path(self, file_type: str, filename: str, content_type: Optional[str] = None) -> str:
+        """生成文件路径"""
+        return generate_file_path(file_type, filename, content_type)
+    
+    def _public_url(self, file_path: str) -> str:
+        """生成文件的公共URL"""
+        if settings.OSS_ENDPOINT.startswith("https://"):
+            # endpoint格式：https://oss-cn-hangzhou.aliyuncs.com
+            return f"{settings.OSS_ENDPOINT}/{file_path}"
+        # endpoint格式：oss-cn-hangzhou.aliyuncs.com
+        return f"https://{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/{file_path}"
     
     async def upload_file(
         self,
@@ -95,21 +132,88 @@ class OSSService:
         if content_type:
             headers['Content-Type'] = content_type
         
-        # 上传文件
-        result = self.bucket.put_object(file_path, file_content, headers=headers)
+        # 上传文件（oss2是同步SDK，在线程池中执行，不阻塞事件循环）
+        result = await asyncio.to_thread(self.bucket.put_object, file_path, file_content, headers=headers)
         
         if result.status == 200:
-            # 生成文件URL（如果endpoint已经包含https://，则使用bucket.endpoint格式）
-            if settings.OSS_ENDPOINT.startswith("https://"):
-                # endpoint格式：https://oss-cn-hangzhou.aliyuncs.com
-                file_url = f"{settings.OSS_ENDPOINT}/{file_path}"
-            else:
-                # endpoint格式：oss-cn-hangzhou.aliyuncs.com
-                file_url = f"https://{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/{file_path}"
-            return file_url
+            return self._public_url(file_path)
         else:
             raise Exception(f"文件上传失败，状态码：{result.status}")
     
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_path: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """
+        流式上传文件到OSS
+        
+        按OSS_MULTIPART_PART_SIZE累积分片，内存中最多保留一个分片：
+        不足一个分片的文件直接put_object，否则使用分片上传（每个分片失败时重试一次），
+        出错时中止分片上传，不留下未完成的分片。
+        
+        Args:
+            chunks: 文件内容块的异步迭代器
+            file_path: 文件路径
+            content_type: 文件MIME类型
+            
+        Returns:
+            str: 文件URL
+            
+        Raises:
+            Exception: 如果OSS未配置或上传失败；chunks抛出的异常原样抛出
+        """
+        if not self.enabled:
+            raise Exception("OSS未配置，无法上传文件")
+        
+        headers = {"Content-Type": content_type} if content_type else None
+        part_size = settings.OSS_MULTIPART_PART_SIZE
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        
+        async def upload_part(data: bytes):
+            part_number = len(parts) + 1
+            for attempt in range(2):
+                try:
+                    result = await asyncio.to_thread(
+                        self.bucket.upload_part, file_path, upload_id, part_number, data
+                    )
+                    parts.append(oss2.models.PartInfo(part_number, result.etag))
+                    return
+                except Exception:
+                    if attempt:
+                        raise
+        
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        result = await asyncio.to_thread(
+                            self.bucket.init_multipart_upload, file_path, headers=headers
+                        )
+                        upload_id = result.upload_id
+                    await upload_part(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+            
+            if upload_id is None:
+                # 小文件：一次上传
+                return await self.upload_file(bytes(buffer), file_path, content_type=content_type)
+            
+            if buffer:
+                await upload_part(bytes(buffer))
+            await asyncio.to_thread(self.bucket.complete_multipart_upload, file_path, upload_id, parts)
+            return self._public_url(file_path)
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(self.bucket.abort_multipart_upload, file_path, upload_id)
+                except Exception:
+                    pass
+            raise
+    
     async def delete_file(self, file_path: str) -> bool:
         """
         删除OSS中的文件
@@ -132,7 +236,7 @@ class OSSService:
                 # 提取路径部分
                 file_path = file_path.split(f"{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/")[-1]
             
-            result = self.bucket.delete_object(file_path)
+            result = await asyncio.to_thread(self.bucket.delete_object, file_path)
             return result.status == 204
         except Exception as e:
             print(f"删除文件失败：{e}")
@@ -142,6 +246,8 @@ class OSSService:
         """
         获取文件URL（支持生成签名URL）
         
+        签名URL请优先使用 app.core.url_signer.url_signer（带缓存，支持批量）。
+        
         Args:
             file_path: 文件路径或完整URL
             signed: 是否生成签名URL（用于私有文件）
@@ -153,81 +259,21 @@ class OSSService:
         if not self.enabled:
             return file_path
         
-        # 如果输入是完整URL，提取路径部分（object_key）
-        if file_path.startswith("http"):
-            from urllib.parse import urlparse, unquote
-            
-            # 解析URL
-            parsed = urlparse(file_path)
-            
-            # 提取object_key：从路径部分提取，去掉查询参数
-            path = parsed.path.lstrip("/")
-            
-            # 如果路径以bucket名称开头，去掉它
-            # 格式：https://bucket-name.oss-cn-hangzhou.aliyuncs.com/resume/2025/12/11/xxx.pdf
-            # 或：https://bucket-name.oss-cn-hangzhou.aliyuncs.com/bucket-name/resume/2025/12/11/xxx.pdf
-            if path.startswith(f"{settings.OSS_BUCKET_NAME}/"):
-                path = path[len(f"{settings.OSS_BUCKET_NAME}/"):]
-            
-            # URL解码（可能被多次编码）
-            object_key = path
-            try:
-                # 多次解码，直到无法再解码
-                max_decode_iterations = 10
-                for _ in range(max_decode_iterations):
-                    new_decoded = unquote(object_key)
-                    if new_decoded == object_key:
-                        break
-                    object_key = new_decoded
-            except Exception as e:
-                print(f"URL解码失败: {e}, 原始路径: {path}")
-                # 解码失败，使用原始路径
-            
-            # 验证object_key是否有效（不能包含http、?、&等特殊字符）
-            if not object_key or object_key.startswith("http") or "?" in object_key or "&" in object_key:
-                # 如果提取失败，可能是格式不正确的URL
-                print(f"无法从URL提取有效的object_key: {file_path}")
-                # 如果已经是签名URL且不需要重新签名，直接返回
-                if not signed and ("OSSAccessKeyId" in file_path or "Signature" in file_path):
-                    return file_path
-                # 否则返回原URL（虽然可能不正确）
-                return file_path
-            
-            # 使用提取的object_key
-            file_path = object_key
+        from app.core.url_signer import normalize_object_key
+        object_key = normalize_object_key(file_path)
+        if object_key is None:
+            # 无法提取有效的对象键，返回原URL
+            logger.warning(f"无法从URL提取有效的对象键，返回原URL: {file_path}")
+            return file_path
         
         if signed:
             # 生成签名URL（用于私有文件访问）
             try:
-                # 确保file_path是有效的object_key（不包含特殊字符）
-                if "?" in file_path or "&" in file_path or file_path.startswith("http"):
-                    print(f"无效的object_key，无法生成签名URL: {file_path}")
-                    # 如果已经是URL，尝试直接返回
-                    if file_path.startswith("http"):
-                        return file_path
-                    # 否则生成公共URL
-                    if settings.OSS_ENDPOINT.startswith("https://"):
-                        return f"{settings.OSS_ENDPOINT}/{file_path}"
-                    else:
-                        return f"https://{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/{file_path}"
-                
-                url = self.bucket.sign_url('GET', file_path, expires)
-                return url
+                return self.bucket.sign_url('GET', object_key, expires)
             except Exception as e:
-                # 如果生成签名URL失败，返回原URL或生成公共URL
-                print(f"生成签名URL失败: {e}, file_path: {file_path}")
-                if file_path.startswith("http"):
-                    return file_path
-                if settings.OSS_ENDPOINT.startswith("https://"):
-                    return f"{settings.OSS_ENDPOINT}/{file_path}"
-                else:
-                    return f"https://{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/{file_path}"
-        else:
-            # 生成公共URL
-            if settings.OSS_ENDPOINT.startswith("https://"):
-                return f"{settings.OSS_ENDPOINT}/{file_path}"
-            else:
-                return f"https://{settings.OSS_BUCKET_NAME}.{settings.OSS_ENDPOINT}/{file_path}"
+                # 如果生成签名URL失败，返回公共URL
+                logger.warning(f"生成签名URL失败: {e}, object_key: {object_key}")
+        return self._public_url(object_key)
 
 
 # 创建全局OSS服务实例
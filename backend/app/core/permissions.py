@@ -10,8 +10,9 @@ from sqlalchemy import select
 
 from app.models.user import User
 from app.models.user_type import UserType
-from app.models.profile import TeacherProfile, StudentProfile, EnterpriseProfile
+from app.models.profile import StudentProfile, EnterpriseProfile
 from app.core.database import get_db
+from app.services.identity_context import get_identity_context
 
 
 # ==================== 完善的权限定义 ====================
@@ -235,26 +236,12 @@ async def check_permission(
     # 检查具体权限
     if permission in role_permissions:
         # 如果是子账号，检查是否有权限限制
-        if db:
-            if user.user_type == UserType.ENTERPRISE:
-                from app.models.profile import EnterpriseProfile
-                enterprise_result = await db.execute(
-                    select(EnterpriseProfile).where(EnterpriseProfile.user_id == user.id)
-                )
-                enterprise = enterprise_result.scalar_one_or_none()
-                if enterprise and not enterprise.is_main_account:
-                    # 企业子账号权限限制
-                    if permission in ENTERPRISE_SUB_ACCOUNT_RESTRICTIONS:
-                        return False
-            elif user.user_type == UserType.TEACHER:
-                teacher_result = await db.execute(
-                    select(TeacherProfile).where(TeacherProfile.user_id == user.id)
-                )
-                teacher = teacher_result.scalar_one_or_none()
-                if teacher and not teacher.is_main_account:
-                    # 教师子账号权限限制
-                    if permission in TEACHER_SUB_ACCOUNT_RESTRICTIONS:
-                        return False
+        if db and await get_identity_context(db, user).is_sub_account():
+            # 企业/教师子账号权限限制
+            if user.user_type == UserType.ENTERPRISE and permission in ENTERPRISE_SUB_ACCOUNT_RESTRICTIONS:
+                return False
+            if user.user_type == UserType.TEACHER and permission in TEACHER_SUB_ACCOUNT_RESTRICTIONS:
+                return False
         
         return True
     
@@ -280,24 +267,9 @@ async def get_user_modules(user: User, db: Optional[AsyncSession] = None) -> Lis
     modules = ROLE_MODULES.get(user.user_type, set())
     
     # 如果是子账号，检查是否有模块访问限制
-    if db:
-        if user.user_type == UserType.ENTERPRISE:
-            from app.models.profile import EnterpriseProfile
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
-            if enterprise and not enterprise.is_main_account:
-                # 企业子账号不能访问子账号管理模块
-                modules = modules - {"settings"} if "sub_account:create" not in ROLE_PERMISSIONS.get(user.user_type, set()) else modules
-        elif user.user_type == UserType.TEACHER:
-            teacher_result = await db.execute(
-                select(TeacherProfile).where(TeacherProfile.user_id == user.id)
-            )
-            teacher = teacher_result.scalar_one_or_none()
-            if teacher and not teacher.is_main_account:
-                # 教师子账号不能访问子账号管理模块
-                modules = modules - {"settings"} if "sub_account:create" not in ROLE_PERMISSIONS.get(user.user_type, set()) else modules
+    if db and await get_identity_context(db, user).is_sub_account():
+        # 企业/教师子账号不能访问子账号管理模块
+        modules = modules - {"settings"} if "sub_account:create" not in ROLE_PERMISSIONS.get(user.user_type, set()) else modules
     
     return list(modules)
 
@@ -556,10 +528,7 @@ async def check_data_permission(
     # 教师可以查看管辖的学生数据
     if current_user.user_type == UserType.TEACHER:
         # 检查是否是管辖的学生
-        teacher_result = await db.execute(
-            select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-        )
-        teacher = teacher_result.scalar_one_or_none()
+        teacher = await get_identity_context(db, current_user).get_teacher_profile()
         
         if teacher:
             # 查询学生是否在教师的管辖范围内
@@ -605,6 +574,8 @@ async def check_resource_access(
     if current_user.user_type == UserType.ADMIN:
         return True
     
+    identity = get_identity_context(db, current_user)
+    
     # 根据资源类型检查权限
     if resource_type == "resume":
         from app.models.job import Resume
@@ -647,14 +618,9 @@ async def check_resource_access(
             
             if applications:
                 from app.models.job import Job
-                from app.models.profile import EnterpriseProfile
-                enterprise_result = await db.execute(
-                    select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-                )
-                enterprise = enterprise_result.scalar_one_or_none()
+                enterprise = await identity.get_enterprise_profile()
                 if enterprise:
-                    from app.services.enterprise_service import get_enterprise_ids_for_query
-                    enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                    enterprise_ids = await identity.get_enterprise_ids()
                     # 检查是否有任何申请关联到该企业的职位
                     for application in applications:
                         job_result = await db.execute(
@@ -675,14 +641,9 @@ async def check_resource_access(
             talent_pools = talent_pool_result.scalars().all()
             
             if talent_pools:
-                from app.models.profile import EnterpriseProfile
-                enterprise_result = await db.execute(
-                    select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-                )
-                enterprise = enterprise_result.scalar_one_or_none()
+                enterprise = await identity.get_enterprise_profile()
                 if enterprise:
-                    from app.services.enterprise_service import get_enterprise_ids_for_query
-                    enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                    enterprise_ids = await identity.get_enterprise_ids()
                     # 检查是否有任何人才库记录属于该企业
                     for talent_pool in talent_pools:
                         if talent_pool.enterprise_id in enterprise_ids:
@@ -694,10 +655,7 @@ async def check_resource_access(
         
         # 教师：只能查看管辖学生的简历
         elif current_user.user_type == UserType.TEACHER:
-            teacher_result = await db.execute(
-                select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-            )
-            teacher = teacher_result.scalar_one_or_none()
+            teacher = await identity.get_teacher_profile()
             if teacher:
                 if teacher.department_id and student.department_id:
                     return teacher.department_id == student.department_id
@@ -727,13 +685,9 @@ async def check_resource_access(
             )
             job = job_result.scalar_one_or_none()
             if job:
-                enterprise_result = await db.execute(
-                    select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-                )
-                enterprise = enterprise_result.scalar_one_or_none()
+                enterprise = await identity.get_enterprise_profile()
                 if enterprise:
-                    from app.services.enterprise_service import get_enterprise_ids_for_query
-                    enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                    enterprise_ids = await identity.get_enterprise_ids()
                     return job.enterprise_id in enterprise_ids
         
         return False
@@ -749,13 +703,9 @@ async def check_resource_access(
         
         # 企业：只能操作自己的职位
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return job.enterprise_id in enterprise_ids
         
         # 学生：只能查看已发布的职位
@@ -779,21 +729,14 @@ async def check_resource_access(
         
         # 企业：只能操作自己企业的面试
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return interview.enterprise_id in enterprise_ids
         
         # 学生：只能操作自己的面试
         elif current_user.user_type == UserType.STUDENT:
-            student_result = await db.execute(
-                select(StudentProfile).where(StudentProfile.user_id == current_user.id)
-            )
-            student = student_result.scalar_one_or_none()
+            student = await identity.get_student_profile()
             if student:
                 return interview.student_id == student.id
         
@@ -810,21 +753,14 @@ async def check_resource_access(
         
         # 企业：只能操作自己企业的Offer
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return offer.enterprise_id in enterprise_ids
         
         # 学生：只能操作自己的Offer
         elif current_user.user_type == UserType.STUDENT:
-            student_result = await db.execute(
-                select(StudentProfile).where(StudentProfile.user_id == current_user.id)
-            )
-            student = student_result.scalar_one_or_none()
+            student = await identity.get_student_profile()
             if student:
                 return offer.student_id == student.id
         
@@ -841,21 +777,14 @@ async def check_resource_access(
         
         # 企业：只能操作自己创建的双选会
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return job_fair.created_by in enterprise_ids
         
         # 教师：只能操作自己学校的双选会
         elif current_user.user_type == UserType.TEACHER:
-            teacher_result = await db.execute(
-                select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-            )
-            teacher = teacher_result.scalar_one_or_none()
+            teacher = await identity.get_teacher_profile()
             if teacher and teacher.school_id:
                 return job_fair.school_id == teacher.school_id
         
@@ -880,21 +809,14 @@ async def check_resource_access(
         
         # 企业：只能操作自己创建的宣讲会
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return info_session.enterprise_id in enterprise_ids
         
         # 教师：只能操作自己学校的宣讲会
         elif current_user.user_type == UserType.TEACHER:
-            teacher_result = await db.execute(
-                select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-            )
-            teacher = teacher_result.scalar_one_or_none()
+            teacher = await identity.get_teacher_profile()
             if teacher and teacher.school_id:
                 return info_session.school_id == teacher.school_id
         
@@ -919,13 +841,9 @@ async def check_resource_access(
         
         # 企业：只能操作自己的人才库
         if current_user.user_type == UserType.ENTERPRISE:
-            enterprise_result = await db.execute(
-                select(EnterpriseProfile).where(EnterpriseProfile.user_id == current_user.id)
-            )
-            enterprise = enterprise_result.scalar_one_or_none()
+            enterprise = await identity.get_enterprise_profile()
             if enterprise:
-                from app.services.enterprise_service import get_enterprise_ids_for_query
-                enterprise_ids = await get_enterprise_ids_for_query(db, enterprise)
+                enterprise_ids = await identity.get_enterprise_ids()
                 return talent_pool.enterprise_id in enterprise_ids
         
         return False
@@ -1068,10 +986,7 @@ async def check_teacher_student_access(
         return False
     
     # 获取教师信息
-    teacher_result = await db.execute(
-        select(TeacherProfile).where(TeacherProfile.user_id == current_user.id)
-    )
-    teacher = teacher_result.scalar_one_or_none()
+    teacher = await get_identity_context(db, current_user).get_teacher_profile()
     
     if not teacher:
         return False
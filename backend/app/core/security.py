@@ -2,11 +2,22 @@
 安全相关工具函数
 包括密码加密、JWT令牌生成和验证等
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from app.core.config import settings
+from app.core.token_cache import token_digest, verified_token_cache, token_denylist, revoke_token_digest
+
+# 密码哈希线程池（bcrypt计算期间释放GIL，可在线程中并行执行）
+_password_executor: Optional[ThreadPoolExecutor] = None
+_password_pending = 0  # 执行中和排队中的哈希任务数
+
+
+class PasswordHashBusyError(Exception):
+    """密码哈希任务过多（超过 PASSWORD_HASH_MAX_PENDING），请求应稍后重试"""
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -46,11 +57,95 @@ def get_password_hash(password: str) -> str:
         password_bytes = password_bytes[:72]
     
     # 生成盐并加密密码
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.PASSWORD_HASH_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    检查密码哈希的成本因子是否与当前配置不一致
+    
+    Args:
+        hashed_password: 加密后的密码（格式：$2b$<成本>$<盐和哈希>）
+        
+    Returns:
+        bool: 是否需要按当前成本重新哈希
+    """
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return rounds != settings.PASSWORD_HASH_ROUNDS
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    """获取密码哈希线程池（首次使用时创建）"""
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash"
+        )
+    return _password_executor
+
+
+async def _run_password_task(func, *args):
+    """
+    在密码哈希线程池中执行任务
+    
+    任务数超过上限时直接拒绝，而不是无限排队（排队的请求多半也会超时）
+    
+    Raises:
+        PasswordHashBusyError: 执行中和排队中的任务已达上限
+    """
+    global _password_pending
+    if _password_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashBusyError()
+    
+    _password_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_password_executor(), func, *args)
+    finally:
+        _password_pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    验证密码（在线程池中执行，不阻塞事件循环）
+    
+    Args:
+        plain_password: 明文密码
+        hashed_password: 加密后的密码
+        
+    Returns:
+        bool: 密码是否匹配
+    """
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    加密密码（在线程池中执行，不阻塞事件循环）
+    
+    Args:
+        password: 明文密码
+        
+    Returns:
+        str: 加密后的密码
+    """
+    return await _run_password_task(get_password_hash, password)
+
+
+def shutdown_password_executor():
+    """关闭密码哈希线程池（应用关闭时调用）"""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     创建JWT访问令牌
@@ -93,10 +188,20 @@ def create_refresh_token(data: dict) -> str:
     return encoded_jwt
 
 
+def _decode_token(token: str) -> Optional[dict]:
+    """解码并验证JWT令牌（验签和过期检查）"""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except (JWTError, Exception):
+        return None
+
+
 def verify_token(token: Optional[str]) -> Optional[dict]:
     """
     验证JWT令牌
     
+    已验证的令牌按摘要缓存到过期时间，后续请求不再验签；已吊销的令牌直接返回None
+    
     Args:
         token: JWT令牌字符串（可为None）
         
@@ -106,9 +211,34 @@ def verify_token(token: Optional[str]) -> Optional[dict]:
     if not token:
         return None
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except (JWTError, Exception):
+    digest = token_digest(token)
+    if token_denylist.contains(digest):
         return None
+    
+    payload = verified_token_cache.get(digest)
+    if payload is None:
+        payload = _decode_token(token)
+        if payload is None:
+            return None
+        verified_token_cache.set(digest, payload)
+    
+    # 返回副本，调用方修改不影响缓存
+    return dict(payload)
+
 
+async def revoke_token(token: Optional[str]) -> bool:
+    """
+    吊销JWT令牌（退出登录时调用），吊销记录保留到令牌过期
+    
+    Args:
+        token: JWT令牌字符串
+        
+    Returns:
+        bool: 是否吊销成功（令牌无效或已过期时返回False）
+    """
+    payload = verify_token(token)
+    if payload is None or "exp" not in payload:
+        return False
+    
+    await revoke_token_digest(token_digest(token), float(payload["exp"]))
+    return True
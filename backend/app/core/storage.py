@@ -0,0 +1,137 @@
+"""
+文件存储后端
+- oss：阿里云OSS（app.core.oss.oss_service）
+- local：本地文件系统，开发环境和测试使用，无需OSS配置
+
+两种后端提供相同的方法：generate_file_path、upload_stream、upload_file、delete_file、get_file_url。
+文件读写在线程池中执行，不阻塞事件循环。
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from starlette.staticfiles import StaticFiles
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.oss import generate_file_path, oss_service
+
+logger = get_logger(__name__)
+
+
+class LocalStorage:
+    """
+    本地文件系统存储
+
+    文件先写入同目录下的临时文件，写完后原子重命名，读取方不会看到写了一半的文件；
+    访问URL为 LOCAL_STORAGE_URL_PREFIX + 文件路径。
+    """
+
+    enabled = True
+
+    def __init__(self, root: str, url_prefix: str):
+        self.root = Path(root).resolve()
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def generate_file_path(self, file_type: str, filename: str, content_type: Optional[str] = None) -> str:
+        """生成文件路径"""
+        return generate_file_path(file_type, filename, content_type)
+
+    def _resolve(self, file_path: str) -> Path:
+        """把文件路径或URL转换为根目录下的绝对路径，拒绝越出根目录的路径"""
+        if file_path.startswith(self.url_prefix + "/"):
+            file_path = file_path[len(self.url_prefix) + 1:]
+        path = (self.root / file_path.lstrip("/")).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"无效的文件路径：{file_path}")
+        return path
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_path: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """
+        流式写入文件
+
+        Args:
+            chunks: 文件内容块的异步迭代器
+            file_path: 文件路径
+            content_type: 文件MIME类型（本地存储不使用）
+
+        Returns:
+            str: 文件URL
+        """
+        target = self._resolve(file_path)
+        await asyncio.to_thread(target.parent.mkdir, parents=True, exist_ok=True)
+        fd, tmp_name = await asyncio.to_thread(tempfile.mkstemp, dir=target.parent, suffix=".part")
+        tmp = os.fdopen(fd, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(tmp.write, chunk)
+            await asyncio.to_thread(tmp.close)
+            await asyncio.to_thread(os.replace, tmp_name, target)
+        except BaseException:
+            tmp.close()
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+        return self.get_file_url(file_path)
+
+    async def upload_file(
+        self,
+        file_content: bytes,
+        file_path: str,
+        content_type: Optional[str] = None
+    ) -> str:
+        """写入完整文件内容"""
+        async def single_chunk():
+            yield file_content
+        return await self.upload_stream(single_chunk(), file_path, content_type)
+
+    async def delete_file(self, file_path: str) -> bool:
+        """删除文件，文件不存在或路径无效时返回False"""
+        try:
+            await asyncio.to_thread(self._resolve(file_path).unlink)
+            return True
+        except (OSError, ValueError) as e:
+            logger.warning(f"删除本地文件失败：{e}")
+            return False
+
+    def get_file_url(self, file_path: str, signed: bool = False, expires: int = 3600) -> str:
+        """获取文件URL（本地存储不需要签名）"""
+        if file_path.startswith("http") or file_path.startswith(self.url_prefix + "/"):
+            return file_path
+        return f"{self.url_prefix}/{file_path.lstrip('/')}"
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    本地存储上传文件的静态访问（与API同源）
+
+    禁止浏览器嗅探内容类型；图片以外的文件一律作为附件下载，不在API源下渲染。
+    """
+
+    INLINE_EXTENSIONS = {".jpg", ".png", ".gif", ".webp"}
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        if Path(full_path).suffix.lower() not in self.INLINE_EXTENSIONS:
+            response.headers["Content-Disposition"] = "attachment"
+        return response
+
+
+local_storage = LocalStorage(settings.LOCAL_STORAGE_ROOT, settings.LOCAL_STORAGE_URL_PREFIX)
+
+
+def get_storage():
+    """按配置返回存储后端（STORAGE_BACKEND：oss 或 local）"""
+    if settings.STORAGE_BACKEND == "local":
+        return local_storage
+    return oss_service
@@ -0,0 +1,223 @@
+"""
+JWT令牌缓存和吊销名单
+- 已验证令牌缓存：按令牌摘要缓存解码后的声明，直到令牌过期，避免每个请求都重新验签
+- 吊销名单：布隆过滤器 + 精确集合，常数时间判断令牌是否已吊销；
+  吊销记录同时写入Redis有序集合，各worker定期同步
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Redis中的吊销名单（有序集合：成员为令牌摘要的十六进制，分数为令牌过期时间戳）
+TOKEN_DENYLIST_REDIS_KEY = "auth:token_denylist"
+
+
+def token_digest(token: str) -> bytes:
+    """计算令牌摘要（SHA-256），用作缓存键和吊销名单成员"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class BloomFilter:
+    """
+    定长布隆过滤器
+
+    输入已是SHA-256摘要，直接切分为多个32位整数作为哈希位置，无需额外哈希计算。
+    不支持删除，需要时整体重建。
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int = 4):
+        self.num_bits = num_bits
+        self.num_hashes = min(num_hashes, 8)  # 32字节摘要最多切出8个位置
+        self._bits = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        for i in range(self.num_hashes):
+            yield int.from_bytes(digest[i * 4:(i + 1) * 4], "big") % self.num_bits
+
+    def add(self, digest: bytes):
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def might_contain(self, digest: bytes) -> bool:
+        for pos in self._positions(digest):
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class TokenDenylist:
+    """
+    令牌吊销名单
+
+    绝大多数令牌未被吊销，布隆过滤器可直接判定“不在名单中”；
+    布隆过滤器命中时再查精确集合，排除误判。过期的吊销记录在清理时移除并重建过滤器。
+    """
+
+    def __init__(self, bloom_bits: int):
+        self.bloom_bits = bloom_bits
+        self._bloom = BloomFilter(bloom_bits)
+        self._entries: Dict[bytes, float] = {}  # 摘要 -> 令牌过期时间戳
+
+    def add(self, digest: bytes, expires_at: float):
+        if digest not in self._entries:
+            self._bloom.add(digest)
+        self._entries[digest] = expires_at
+
+    def contains(self, digest: bytes) -> bool:
+        return self._bloom.might_contain(digest) and digest in self._entries
+
+    def prune(self, now: Optional[float] = None):
+        """移除已过期的吊销记录（过期令牌本身已无法通过验证）并重建过滤器"""
+        now = time.time() if now is None else now
+        self.replace({d: exp for d, exp in self._entries.items() if exp > now})
+
+    def replace(self, entries: Dict[bytes, float]):
+        """用新的吊销记录整体替换（从Redis同步时使用）"""
+        bloom = BloomFilter(self.bloom_bits)
+        for digest in entries:
+            bloom.add(digest)
+        self._bloom = bloom
+        self._entries = entries
+
+    def items(self):
+        return self._entries.items()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VerifiedTokenCache:
+    """
+    已验证令牌缓存（进程内LRU）
+
+    缓存解码后的声明直到令牌的exp，过期后自动失效；容量为0时不缓存。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def set(self, digest: bytes, claims: dict):
+        expires_at = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        self._entries[digest] = (claims, float(expires_at))
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, digest: bytes):
+        self._entries.pop(digest, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+verified_token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_MAX_ENTRIES)
+token_denylist = TokenDenylist(settings.TOKEN_DENYLIST_BLOOM_BITS)
+_denylist_sync_task: Optional[asyncio.Task] = None
+
+
+async def revoke_token_digest(digest: bytes, expires_at: float):
+    """
+    吊销令牌：写入本进程名单，并写入Redis供其他worker同步
+
+    Args:
+        digest: 令牌摘要
+        expires_at: 令牌过期时间戳（吊销记录保留到此时间）
+    """
+    token_denylist.add(digest, expires_at)
+    verified_token_cache.discard(digest)
+
+    from app.core.cache import get_redis, redis_health
+    redis = await get_redis()
+    if not redis:
+        return
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.zadd(TOKEN_DENYLIST_REDIS_KEY, {digest.hex(): expires_at})
+        pipe.zremrangebyscore(TOKEN_DENYLIST_REDIS_KEY, "-inf", time.time())
+        await pipe.execute()
+        redis_health.record_success()
+    except Exception as e:
+        redis_health.record_failure()
+        logger.warning(f"写入令牌吊销名单失败: {str(e)}")
+
+
+async def sync_token_denylist():
+    """从Redis同步吊销名单（合并其他worker的吊销记录），Redis不可用时只清理本地过期记录"""
+    from app.core.cache import get_redis, redis_health
+    now = time.time()
+    redis = await get_redis()
+    if not redis:
+        token_denylist.prune(now)
+        return
+    try:
+        members = await redis.zrangebyscore(TOKEN_DENYLIST_REDIS_KEY, now, "+inf", withscores=True)
+        redis_health.record_success()
+    except Exception as e:
+        redis_health.record_failure()
+        logger.warning(f"同步令牌吊销名单失败: {str(e)}")
+        token_denylist.prune(now)
+        return
+
+    entries = {}
+    for member, expires_at in members:
+        if isinstance(member, bytes):
+            member = member.decode("utf-8")
+        entries[bytes.fromhex(member)] = expires_at
+    # 保留本进程尚未写入Redis的记录（例如吊销时Redis不可用）
+    for digest, expires_at in token_denylist.items():
+        if expires_at > now:
+            entries.setdefault(digest, expires_at)
+    token_denylist.replace(entries)
+
+
+async def _denylist_sync_loop():
+    while True:
+        try:
+            await sync_token_denylist()
+        except Exception as e:
+            # 例如名单中有格式错误的成员：下一轮重试，后台任务不能退出，否则其他worker吊销的令牌在本进程一直有效
+            logger.warning(f"同步令牌吊销名单失败: {str(e)}")
+        await asyncio.sleep(settings.TOKEN_DENYLIST_SYNC_INTERVAL)
+
+
+def start_token_denylist_sync():
+    """启动吊销名单后台同步（在应用启动时调用）"""
+    global _denylist_sync_task
+    if _denylist_sync_task is None or _denylist_sync_task.done():
+        _denylist_sync_task = asyncio.create_task(_denylist_sync_loop())
+
+
+async def stop_token_denylist_sync():
+    """停止吊销名单后台同步"""
+    global _denylist_sync_task
+    if _denylist_sync_task is not None:
+        _denylist_sync_task.cancel()
+        try:
+            await _denylist_sync_task
+        except asyncio.CancelledError:
+            pass
+        _denylist_sync_task = None
@@ -0,0 +1,141 @@
+"""
+文件URL签名服务
+- 对象键归一化：把数据库中保存的完整URL、重复编码的URL或已签名URL统一转换为OSS对象键
+- 签名URL缓存：按 (原始路径, 有效期) 缓存签名结果，到期前提前失效，同一文件不重复计算签名
+- 批量签名：列表接口按页收集URL后一次调用 sign_many，页内重复的文件只签名一次
+
+本地存储（STORAGE_BACKEND=local）不需要签名，直接返回访问URL。
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 签名URL默认有效期（秒）：24小时，避免用户打开页面后点击时已过期
+DEFAULT_SIGN_EXPIRES = 86400
+
+
+def normalize_object_key(file_path: str) -> Optional[str]:
+    """
+    把文件路径或URL转换为OSS对象键
+
+    Args:
+        file_path: 对象键、完整URL（可能带bucket前缀、签名参数或被多次编码）
+
+    Returns:
+        Optional[str]: 对象键；无法提取有效对象键时返回None
+    """
+    if not file_path:
+        return None
+    if not file_path.startswith("http"):
+        object_key = file_path.lstrip("/")
+    else:
+        # 格式：https://bucket-name.oss-cn-hangzhou.aliyuncs.com/resume/2025/12/11/xxx.pdf
+        # 或：https://bucket-name.oss-cn-hangzhou.aliyuncs.com/bucket-name/resume/2025/12/11/xxx.pdf
+        object_key = urlparse(file_path).path.lstrip("/")
+        if object_key.startswith(f"{settings.OSS_BUCKET_NAME}/"):
+            object_key = object_key[len(settings.OSS_BUCKET_NAME) + 1:]
+        # URL可能被多次编码，解码到不再变化为止
+        for _ in range(10):
+            decoded = unquote(object_key)
+            if decoded == object_key:
+                break
+            object_key = decoded
+
+    if not object_key or object_key.startswith("http") or "?" in object_key or "&" in object_key:
+        return None
+    return object_key
+
+
+class UrlSigner:
+    """
+    签名URL缓存（进程内LRU）
+
+    缓存条目在签名URL过期前 SIGNED_URL_REFRESH_MARGIN 秒失效，保证返回给客户端的URL
+    至少还有这段有效期；容量为0时不缓存。
+    """
+
+    def __init__(self, max_entries: int, refresh_margin: int):
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+
+    def _sign_uncached(self, file_path: str, expires: int) -> str:
+        from app.core.oss import oss_service
+        from app.core.storage import get_storage
+
+        storage = get_storage()
+        if storage is not oss_service or not oss_service.enabled:
+            return storage.get_file_url(file_path)
+
+        object_key = normalize_object_key(file_path)
+        if object_key is None:
+            logger.warning(f"无法从URL提取有效的对象键，返回原URL: {file_path}")
+            return file_path
+        try:
+            return oss_service.bucket.sign_url("GET", object_key, expires)
+        except Exception as e:
+            logger.warning(f"生成签名URL失败: {e}, object_key: {object_key}")
+            return oss_service._public_url(object_key)
+
+    def sign(self, file_path: Optional[str], expires: int = DEFAULT_SIGN_EXPIRES) -> Optional[str]:
+        """
+        获取文件的签名URL（优先使用缓存）
+
+        Args:
+            file_path: 文件路径或URL，为空时原样返回
+            expires: 签名有效期（秒）
+
+        Returns:
+            Optional[str]: 签名URL
+        """
+        if not file_path:
+            return file_path
+        key = (file_path, expires)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            url, valid_until = entry
+            if valid_until > now:
+                self._entries.move_to_end(key)
+                return url
+            del self._entries[key]
+
+        url = self._sign_uncached(file_path, expires)
+        margin = min(self.refresh_margin, expires // 2)
+        if self.max_entries > 0 and expires > margin:
+            self._entries[key] = (url, now + expires - margin)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url
+
+    def sign_many(
+        self,
+        file_paths: Iterable[Optional[str]],
+        expires: int = DEFAULT_SIGN_EXPIRES
+    ) -> Dict[str, str]:
+        """
+        批量获取签名URL（列表接口按页调用）
+
+        Args:
+            file_paths: 文件路径或URL（可包含None和重复项）
+            expires: 签名有效期（秒）
+
+        Returns:
+            dict: 原始路径 -> 签名URL
+        """
+        return {path: self.sign(path, expires) for path in set(file_paths) if path}
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+url_signer = UrlSigner(settings.SIGNED_URL_CACHE_MAX_ENTRIES, settings.SIGNED_URL_REFRESH_MARGIN)
@@ -11,6 +11,7 @@ from app.core.config import settings
 from app.core.database import engine, Base
 from app.core.logging import setup_logging, get_logger
 from app.core.middleware import LoggingMiddleware, RateLimitMiddleware
+from app.core.security import PasswordHashBusyError
 from app.api.v1 import api_router
 
 # 初始化日志
@@ -34,9 +35,23 @@ async def lifespan(app: FastAPI):
     from app.core.production import check_production_settings
     check_production_settings()
     
-    # 初始化Redis连接池
-    from app.core.cache import init_redis_pool
+    # 初始化Redis连接池，并启动后台心跳（由心跳维护Redis健康状态，请求路径上不再ping）
+    from app.core.cache import init_redis_pool, start_redis_heartbeat
     init_redis_pool()  # 同步函数，不需要await
+    start_redis_heartbeat()
+    
+    # 启动令牌吊销名单同步（各worker从Redis合并吊销记录）
+    from app.core.token_cache import start_token_denylist_sync
+    start_token_denylist_sync()
+    
+    # 启动计数后台写入（查看、下载、申请次数）
+    from app.services.counter_service import start_counter_flush
+    start_counter_flush()
+    
+    # 统计汇总：注册增量更新事件，启动后台重算
+    from app.services.rollup_service import register_rollup_events, start_rollup_reconciler
+    register_rollup_events()
+    start_rollup_reconciler()
     
     async with engine.begin() as conn:
         # 创建数据库表（生产环境应使用Alembic迁移）
@@ -48,9 +63,29 @@ async def lifespan(app: FastAPI):
     # 关闭时执行
     logger.info("应用正在关闭...")
     
+    # 关闭聊天投递通道（撤销本进程的在线状态）
+    from app.api.v1.chat import manager as chat_manager
+    await chat_manager.close()
+    
+    # 停止令牌吊销名单同步
+    from app.core.token_cache import stop_token_denylist_sync
+    await stop_token_denylist_sync()
+    
+    # 停止统计汇总后台重算
+    from app.services.rollup_service import stop_rollup_reconciler
+    await stop_rollup_reconciler()
+    
+    # 停止计数后台写入（写入剩余增量，需在关闭数据库连接前执行）
+    from app.services.counter_service import stop_counter_flush
+    await stop_counter_flush()
+    
     # 关闭Redis连接池
     from app.core.cache import close_redis
     await close_redis()
+    
+    # 关闭密码哈希线程池
+    from app.core.security import shutdown_password_executor
+    shutdown_password_executor()
 
 
 # 创建FastAPI应用实例（禁用默认docs，稍后自定义）
@@ -80,12 +115,19 @@ app.add_middleware(LoggingMiddleware)
 from fastapi.middleware.gzip import GZipMiddleware
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# 添加限流中间件（每分钟60次请求）
-app.add_middleware(RateLimitMiddleware, requests_per_minute=60)
+# 添加限流中间件（令牌桶，按路由组配额；默认每分钟60次请求）
+app.add_middleware(RateLimitMiddleware, requests_per_minute=settings.RATE_LIMIT_DEFAULT_PER_MINUTE)
 
 # 注册API路由
 app.include_router(api_router, prefix="/api/v1")
 
+# 本地文件存储（开发和测试环境）：提供上传文件的访问
+if settings.STORAGE_BACKEND == "local":
+    from pathlib import Path
+    from app.core.storage import UploadStaticFiles
+    Path(settings.LOCAL_STORAGE_ROOT).mkdir(parents=True, exist_ok=True)
+    app.mount(settings.LOCAL_STORAGE_URL_PREFIX, UploadStaticFiles(directory=settings.LOCAL_STORAGE_ROOT), name="uploads")
+
 
 # 自定义Swagger UI，使用国内CDN或本地资源
 @app.get("/docs", include_in_schema=False)
@@ -124,6 +166,23 @@ async def http_exception_handler(request, exc: HTTPException):
     )
 
 
+@app.exception_handler(PasswordHashBusyError)
+async def password_hash_busy_handler(request, exc: PasswordHashBusyError):
+    """
+    密码哈希繁忙处理器
+    登录高峰时哈希任务超过上限，返回503并提示稍后重试
+    """
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error_code": 5030,
+            "error_message": "登录人数过多，请稍后重试",
+            "detail": "登录人数过多，请稍后重试"
+        },
+        headers={"Retry-After": "1"}
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """
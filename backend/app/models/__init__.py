@@ -26,6 +26,7 @@ from app.models.rights import Rights, RightsPackage, RightsPackageItem, UserRigh
 from app.models.talent_pool import TalentPool
 from app.models.verification import EnterpriseVerification, PersonalVerification, SchoolVerification
 from app.models.student_comment import StudentComment
+from app.models.statistics import StatisticsRollup
 
 __all__ = [
     # 用户相关
@@ -97,4 +98,6 @@ __all__ = [
     "EnterpriseVerification",
     "PersonalVerification",
     "VerificationStatus",
+    # 统计汇总
+    "StatisticsRollup",
 ]
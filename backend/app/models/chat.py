@@ -57,6 +57,13 @@ class Message(Base):
     session = relationship("ChatSession", back_populates="messages")
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
+    
+    __table_args__ = (
+        # 游标分页：会话消息按 (created_at, id) 翻页，系统消息按接收者和类型过滤后翻页
+        Index('idx_message_session_created', 'session_id', 'created_at', 'id'),
+        Index('idx_message_receiver_type_created', 'receiver_id', 'message_type', 'created_at'),
+        {"comment": "消息表"},
+    )
 
 
 
@@ -0,0 +1,31 @@
+"""
+统计汇总模型
+"""
+from sqlalchemy import Column, String, Date, DateTime, Integer, Index, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class StatisticsRollup(Base):
+    """
+    统计汇总表模型
+    
+    每行是一个计数桶：指标 + 日期 + 维度（学校、院系、企业、状态，不适用的维度为空字符串）。
+    写入时增量更新，后台定期按明细表重算纠正偏差，统计面板只读取汇总行。
+    """
+    __tablename__ = "statistics_rollups"
+    
+    metric = Column(String(40), nullable=False, comment="指标")
+    bucket_date = Column(Date, nullable=False, comment="日期（创建日期，活动为开始日期）")
+    school_id = Column(String(36), nullable=False, default="", comment="学校ID")
+    department_id = Column(String(36), nullable=False, default="", comment="院系ID")
+    enterprise_id = Column(String(36), nullable=False, default="", comment="企业ID")
+    status = Column(String(20), nullable=False, default="", comment="状态")
+    count = Column(Integer, nullable=False, default=0, comment="计数")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
+    
+    __table_args__ = (
+        PrimaryKeyConstraint("metric", "bucket_date", "school_id", "department_id", "enterprise_id", "status"),
+        Index("idx_rollup_metric_school_department", "metric", "school_id", "department_id"),
+        {"comment": "统计汇总表"},
+    )
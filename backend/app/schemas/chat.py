@@ -1,9 +1,10 @@
 """
 聊天相关Pydantic模式
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
 from datetime import datetime
+from app.models.user_type import UserType
 
 
 class MessageCreate(BaseModel):
@@ -31,11 +32,13 @@ class MessageResponse(BaseModel):
 
 
 class MessageListResponse(BaseModel):
-    """消息列表响应模式"""
+    """消息列表响应模式（游标分页，按时间倒序）"""
     items: list[MessageResponse]
-    total: int
-    page: int
+    total: Optional[int] = Field(None, description="总数（仅include_total=true时统计）")
     page_size: int
+    has_more: bool = Field(False, description="当前翻页方向上是否还有更多消息")
+    next_cursor: Optional[str] = Field(None, description="加载更早消息的游标（传给before）")
+    prev_cursor: Optional[str] = Field(None, description="加载更新消息的游标（传给after）")
 
 
 class ChatSessionResponse(BaseModel):
@@ -62,3 +65,31 @@ class ChatSessionListResponse(BaseModel):
     items: list[ChatSessionResponse]
     total: int
 
+
+
+class SystemMessageBroadcast(BaseModel):
+    """群发系统消息请求模式（受众条件之间为“且”关系，至少指定一个条件）"""
+    content: str = Field(..., min_length=1, max_length=5000, description="消息内容")
+    title: Optional[str] = Field(None, max_length=100, description="消息标题")
+    user_types: Optional[list[UserType]] = Field(None, description="用户类型")
+    school_id: Optional[str] = Field(None, description="学校ID（匹配该校学生和教师）")
+    department_id: Optional[str] = Field(None, description="院系ID（匹配该院系学生和教师）")
+    class_id: Optional[str] = Field(None, description="班级ID（只匹配学生）")
+    user_ids: Optional[list[str]] = Field(None, max_length=10000, description="指定用户ID列表")
+    
+    @model_validator(mode="after")
+    def check_audience(self):
+        if not any([self.user_types, self.school_id, self.department_id, self.class_id, self.user_ids]):
+            raise ValueError("至少需要指定一个受众条件")
+        return self
+
+
+class BroadcastJobResponse(BaseModel):
+    """群发任务进度响应模式"""
+    id: str
+    status: str = Field(..., description="PENDING、RUNNING、COMPLETED、FAILED")
+    total: Optional[int] = Field(None, description="受众人数（开始执行后统计）")
+    processed: int = Field(0, description="已发送人数")
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
@@ -72,6 +72,7 @@ class JobListResponse(BaseModel):
     total: int
     page: int
     page_size: int
+    total_capped: bool = False  # 为True时实际结果多于total（全文搜索默认不精确计数，显示为“1000+”）
 
 
 # ==================== 求职意向相关Schema ====================
@@ -14,10 +14,19 @@ class UploadResponse(BaseModel):
     content_type: Optional[str] = Field(None, description="文件MIME类型")
 
 
+class UploadFailure(BaseModel):
+    """批量上传中失败的文件"""
+    index: int = Field(..., description="文件在请求中的序号（从0开始）")
+    file_name: Optional[str] = Field(None, description="文件名")
+    error: str = Field(..., description="失败原因")
+
+
 class UploadListResponse(BaseModel):
     """批量上传响应模式"""
     files: list[UploadResponse]
     total: int
+    failed: list[UploadFailure] = Field(default_factory=list, description="上传失败的文件")
+    rolled_back: bool = Field(False, description="是否因全部成功模式下有文件失败而删除了已上传的文件")
 
 
 
@@ -0,0 +1,219 @@
+"""
+系统消息群发服务
+按受众（用户类型、学校、院系、班级或指定用户）批量发送系统消息：
+- 后台任务执行，接口立即返回任务ID
+- 每批接收者用多行INSERT创建缺少的系统会话和消息，一批一个事务
+- 任务进度写入缓存（只走Redis，多worker一致），可按任务ID查询
+- 每批提交后通过聊天连接管理器推送WebSocket通知，并增加接收者的未读计数
+"""
+import asyncio
+from typing import Dict, List, Optional, Set
+from uuid import uuid4
+
+from sqlalchemy import insert, or_, select, update
+
+from app.core.cache import get_cache, set_cache
+from app.core.database import AsyncSessionLocal
+from app.core.datetime_utils import utc_now
+from app.core.logging import get_logger
+from app.models.chat import ChatSession, Message
+from app.models.enums import MessageType
+from app.models.profile import StudentProfile, TeacherProfile
+from app.models.user import User
+from app.services.read_state_service import UNREAD_SYSTEM, adjust_unread_counts
+
+logger = get_logger(__name__)
+
+BROADCAST_JOB_PREFIX = "broadcast:job:"
+BROADCAST_JOB_TTL = 86400  # 任务进度保留时间（秒）
+BROADCAST_BATCH_SIZE = 500  # 每批接收者数量（每批一个事务、一条多行INSERT）
+
+# 持有运行中任务的引用，避免被垃圾回收
+_running_jobs: Set[asyncio.Task] = set()
+
+
+def build_audience_query(
+    user_types: Optional[List[str]] = None,
+    school_id: Optional[str] = None,
+    department_id: Optional[str] = None,
+    class_id: Optional[str] = None,
+    user_ids: Optional[List[str]] = None,
+):
+    """
+    构建受众用户ID查询（只包含状态为ACTIVE的用户），各条件之间为“且”关系
+
+    学校、院系条件同时匹配学生和教师档案；班级条件只匹配学生档案。
+
+    Args:
+        user_types: 用户类型列表
+        school_id: 学校ID
+        department_id: 院系ID
+        class_id: 班级ID
+        user_ids: 指定用户ID列表
+
+    Returns:
+        Select: 按用户ID排序的查询
+    """
+    query = select(User.id).where(User.status == "ACTIVE")
+    if user_types:
+        query = query.where(User.user_type.in_(user_types))
+    if user_ids:
+        query = query.where(User.id.in_(user_ids))
+
+    if class_id:
+        student_query = select(StudentProfile.user_id).where(StudentProfile.class_id == class_id)
+        if school_id:
+            student_query = student_query.where(StudentProfile.school_id == school_id)
+        if department_id:
+            student_query = student_query.where(StudentProfile.department_id == department_id)
+        query = query.where(User.id.in_(student_query))
+    elif school_id or department_id:
+        student_query = select(StudentProfile.user_id)
+        teacher_query = select(TeacherProfile.user_id)
+        if school_id:
+            student_query = student_query.where(StudentProfile.school_id == school_id)
+            teacher_query = teacher_query.where(TeacherProfile.school_id == school_id)
+        if department_id:
+            student_query = student_query.where(StudentProfile.department_id == department_id)
+            teacher_query = teacher_query.where(TeacherProfile.department_id == department_id)
+        query = query.where(or_(User.id.in_(student_query), User.id.in_(teacher_query)))
+
+    return query.order_by(User.id)
+
+
+async def get_broadcast_job(job_id: str) -> Optional[dict]:
+    """获取群发任务进度"""
+    return await get_cache(f"{BROADCAST_JOB_PREFIX}{job_id}")
+
+
+async def _save_job(job: dict):
+    await set_cache(f"{BROADCAST_JOB_PREFIX}{job['id']}", job, expire=BROADCAST_JOB_TTL)
+
+
+async def _send_batch(db, receiver_ids: List[str], sender_id: str, content: str) -> Dict[str, str]:
+    """
+    向一批接收者发送系统消息（一个事务）
+
+    Returns:
+        dict: 接收者ID -> 消息ID
+    """
+    # 查找已有的系统会话，缺少的用一条多行INSERT创建
+    result = await db.execute(
+        select(ChatSession.user1_id, ChatSession.id).where(
+            ChatSession.user1_id.in_(receiver_ids),
+            ChatSession.user2_id.is_(None),
+            ChatSession.school_id.is_(None)
+        )
+    )
+    session_ids = dict(result.all())
+    new_sessions = [
+        {"id": str(uuid4()), "user1_id": receiver_id, "user2_id": None, "school_id": None}
+        for receiver_id in receiver_ids if receiver_id not in session_ids
+    ]
+    if new_sessions:
+        await db.execute(insert(ChatSession).values(new_sessions))
+        session_ids.update({row["user1_id"]: row["id"] for row in new_sessions})
+
+    # 一条多行INSERT写入本批所有消息
+    message_ids = {receiver_id: str(uuid4()) for receiver_id in receiver_ids}
+    await db.execute(insert(Message).values([
+        {
+            "id": message_ids[receiver_id],
+            "session_id": session_ids[receiver_id],
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "content": content,
+            "message_type": MessageType.SYSTEM,
+            "is_read": False,
+        }
+        for receiver_id in receiver_ids
+    ]))
+
+    # 更新会话的最后消息时间
+    await db.execute(
+        update(ChatSession)
+        .where(ChatSession.id.in_(list(session_ids.values())))
+        .values(last_message_at=utc_now())
+    )
+    await db.commit()
+    return message_ids
+
+
+async def _run_broadcast(job: dict, audience_query, content: str, title: Optional[str]):
+    """执行群发任务：分批发送并更新进度"""
+    # 延迟导入，避免与聊天路由模块循环导入
+    from app.api.v1.chat import manager
+
+    job["status"] = "RUNNING"
+    await _save_job(job)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(audience_query)
+            receiver_ids = list(result.scalars().all())
+            job["total"] = len(receiver_ids)
+            await _save_job(job)
+
+            for start in range(0, len(receiver_ids), BROADCAST_BATCH_SIZE):
+                batch = receiver_ids[start:start + BROADCAST_BATCH_SIZE]
+                message_ids = await _send_batch(db, batch, job["sender_id"], content)
+                await adjust_unread_counts([(receiver_id, UNREAD_SYSTEM, 1) for receiver_id in batch])
+
+                # 推送在线用户（消息先入投递通道，不等待发送完成）
+                created_at = utc_now().isoformat()
+                for receiver_id, message_id in message_ids.items():
+                    await manager.send_personal_message({
+                        "type": "system_message",
+                        "message_id": message_id,
+                        "broadcast_id": job["id"],
+                        "title": title,
+                        "content": content,
+                        "created_at": created_at
+                    }, receiver_id)
+
+                job["processed"] += len(batch)
+                await _save_job(job)
+
+        job["status"] = "COMPLETED"
+    except Exception as e:
+        logger.error(f"系统消息群发任务失败: job_id={job['id']}, error={str(e)}", exc_info=True)
+        job["status"] = "FAILED"
+        job["error"] = str(e)
+    job["finished_at"] = utc_now().isoformat()
+    await _save_job(job)
+    logger.info(f"系统消息群发任务结束: job_id={job['id']}, status={job['status']}, "
+                f"processed={job['processed']}/{job['total']}")
+
+
+async def start_broadcast(
+    sender_id: str,
+    content: str,
+    title: Optional[str] = None,
+    **audience
+) -> dict:
+    """
+    创建并启动群发任务
+
+    Args:
+        sender_id: 发送者（管理员）用户ID
+        content: 消息内容
+        title: 消息标题（随WebSocket通知推送）
+        **audience: build_audience_query 的受众条件
+
+    Returns:
+        dict: 任务信息（初始进度）
+    """
+    job = {
+        "id": str(uuid4()),
+        "status": "PENDING",
+        "sender_id": sender_id,
+        "total": None,
+        "processed": 0,
+        "error": None,
+        "created_at": utc_now().isoformat(),
+        "finished_at": None,
+    }
+    await _save_job(job)
+    task = asyncio.create_task(_run_broadcast(dict(job), build_audience_query(**audience), content, title))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+    return job
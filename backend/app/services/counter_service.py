@@ -0,0 +1,189 @@
+"""
+计数器延迟写入服务
+- 查看、下载、申请次数等计数在请求路径上只累加到进程内缓冲区，不再每次UPDATE并提交
+- 后台任务每隔 COUNTER_FLUSH_INTERVAL 秒把缓冲区合并写入数据库：
+  增量相同的行合并为一条 UPDATE ... SET x = x + n WHERE id IN (...)
+- 读取时返回数据库中的值加上本进程尚未写入的增量，计数与实际值只差其他worker未写入的部分
+
+计数都是加法，各worker分别写入互不影响；每个计数器一个事务，写入失败时只把该计数器的增量放回缓冲区，下次重试。
+进程退出时（应用关闭）写入剩余增量。
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.job import Job, Resume
+
+logger = get_logger(__name__)
+
+_counters: List["WriteBehindCounter"] = []
+_flush_task: Optional[asyncio.Task] = None
+
+
+class WriteBehindCounter:
+    """
+    单个计数列的延迟写入缓冲区
+
+    Args:
+        model: ORM模型（必须有id主键列）
+        column: 计数列名
+    """
+
+    def __init__(self, model, column: str):
+        self.model = model
+        self.column = column
+        self._pending: Dict[str, int] = {}
+        _counters.append(self)
+
+    def increment(self, row_id: str, amount: int = 1):
+        """累加计数（只写缓冲区，不访问数据库）"""
+        self._pending[row_id] = self._pending.get(row_id, 0) + amount
+
+    def pending(self, row_id: str) -> int:
+        """本进程尚未写入数据库的增量"""
+        return self._pending.get(row_id, 0)
+
+    def current(self, row_id: str, stored: Optional[int]) -> int:
+        """数据库中的值加上未写入的增量"""
+        return (stored or 0) + self.pending(row_id)
+
+    def drain(self) -> Dict[str, int]:
+        """取出并清空缓冲区"""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: Dict[str, int]):
+        """写入失败时把增量放回缓冲区"""
+        for row_id, amount in pending.items():
+            self.increment(row_id, amount)
+
+    def build_updates(self, pending: Dict[str, int]) -> list:
+        """按增量分组生成批量UPDATE语句"""
+        by_amount: Dict[int, List[str]] = defaultdict(list)
+        for row_id, amount in pending.items():
+            if amount:
+                by_amount[amount].append(row_id)
+
+        column = getattr(self.model, self.column)
+        values = {}
+        if hasattr(self.model, "updated_at"):
+            # 计数变化不算作内容更新，保持updated_at不变（否则会触发onupdate）
+            values["updated_at"] = self.model.updated_at
+        batch_size = settings.COUNTER_FLUSH_BATCH_SIZE
+        statements = []
+        for amount, row_ids in sorted(by_amount.items()):
+            row_ids.sort()  # 固定加锁顺序，避免并发写入死锁
+            for start in range(0, len(row_ids), batch_size):
+                statements.append(
+                    update(self.model)
+                    .where(self.model.id.in_(row_ids[start:start + batch_size]))
+                    .values({**values, self.column: column + amount})
+                    .execution_options(synchronize_session=False)
+                )
+        return statements
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+resume_view_counter = WriteBehindCounter(Resume, "view_count")
+resume_download_counter = WriteBehindCounter(Resume, "download_count")
+job_view_counter = WriteBehindCounter(Job, "view_count")
+job_apply_counter = WriteBehindCounter(Job, "apply_count")
+
+
+async def flush_counters(db: Optional[AsyncSession] = None) -> int:
+    """
+    把所有计数器的缓冲增量写入数据库
+
+    每个计数器一个事务：一个计数器写入失败（如统计汇总表尚未迁移）只放回该计数器的增量，
+    不影响其他计数器写入。
+
+    Args:
+        db: 数据库会话，为None时创建新会话
+
+    Returns:
+        int: 写入的行数（按计数器和行累计）
+    """
+    drained = [(counter, counter.drain()) for counter in _counters]
+    drained = [(counter, pending) for counter, pending in drained if pending]
+    if not drained:
+        return 0
+
+    if db is None:
+        from app.core.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as session:
+            return await _write_each_counter(session, drained)
+    return await _write_each_counter(db, drained)
+
+
+async def _write_each_counter(db: AsyncSession, drained) -> int:
+    written = 0
+    for index, item in enumerate(drained):
+        try:
+            written += await _write_counters(db, [item])
+        except asyncio.CancelledError:
+            # 尚未写入的计数器的增量也放回缓冲区
+            for counter, pending in drained[index + 1:]:
+                counter.restore(pending)
+            raise
+    return written
+
+
+async def _write_counters(db: AsyncSession, drained) -> int:
+    try:
+        for counter, pending in drained:
+            for statement in counter.build_updates(pending):
+                await db.execute(statement)
+        await db.commit()
+    except asyncio.CancelledError:
+        # 关闭时取消了正在进行的写入：增量放回缓冲区，由stop_counter_flush重新写入
+        for counter, pending in drained:
+            counter.restore(pending)
+        raise
+    except Exception as e:
+        # 先放回增量再回滚：连接断开时回滚本身也可能失败
+        for counter, pending in drained:
+            counter.restore(pending)
+        logger.warning(f"写入计数失败，等待下次重试: {str(e)}")
+        try:
+            await db.rollback()
+        except Exception as rollback_error:
+            logger.warning(f"回滚计数写入失败: {str(rollback_error)}")
+        return 0
+    return sum(len(pending) for _, pending in drained)
+
+
+async def _counter_flush_loop():
+    while True:
+        await asyncio.sleep(settings.COUNTER_FLUSH_INTERVAL)
+        try:
+            await flush_counters()
+        except Exception as e:
+            # 例如创建会话失败：本轮的增量仍在缓冲区中，下一轮重试，后台任务不能退出
+            logger.warning(f"写入计数失败: {str(e)}")
+
+
+def start_counter_flush():
+    """启动计数后台写入（在应用启动时调用）"""
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_counter_flush_loop())
+
+
+async def stop_counter_flush():
+    """停止计数后台写入，并写入剩余增量"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_counters()
@@ -4,6 +4,7 @@
 from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.profile import EnterpriseProfile
+from app.services.identity_context import get_request_memo
 
 
 async def get_effective_enterprise_id(
@@ -45,17 +46,16 @@ async def get_enterprise_ids_for_query(
         list[str]: 企业ID列表
     """
     if enterprise.is_main_account:
-        # 主账号：返回主账号ID + 所有子账号ID
-        enterprise_ids = [enterprise.id]
-        # 获取所有子账号
-        sub_accounts_result = await db.execute(
-            select(EnterpriseProfile).where(
-                EnterpriseProfile.main_account_id == enterprise.id
+        # 主账号：返回主账号ID + 所有子账号ID（同一请求内只查询一次）
+        memo = get_request_memo(db, "enterprise_sub_account_ids")
+        if enterprise.id not in memo:
+            sub_accounts_result = await db.execute(
+                select(EnterpriseProfile.id).where(
+                    EnterpriseProfile.main_account_id == enterprise.id
+                )
             )
-        )
-        sub_accounts = sub_accounts_result.scalars().all()
-        enterprise_ids.extend([sub.id for sub in sub_accounts])
-        return enterprise_ids
+            memo[enterprise.id] = list(sub_accounts_result.scalars().all())
+        return [enterprise.id] + memo[enterprise.id]
     elif enterprise.main_account_id:
         # 子账号：只返回主账号ID（子账号只能查看主账号的数据）
         return [enterprise.main_account_id]
@@ -0,0 +1,152 @@
+"""
+请求级身份上下文 - 在一次请求内缓存当前用户的档案、主账号状态、子账号ID和学校/院系范围
+避免权限检查函数和处理函数在同一请求中重复查询档案
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+from app.models.user_type import UserType
+from app.models.profile import StudentProfile, TeacherProfile, EnterpriseProfile
+
+# 会话info中的键（每个请求使用独立的数据库会话，因此按会话保存即为请求级缓存）
+_IDENTITY_CONTEXTS_KEY = "identity_contexts"
+_REQUEST_MEMO_KEY = "request_memo"
+
+# 档案模型 -> UserPrincipal中对应的档案ID属性
+_PRINCIPAL_PROFILE_ATTRS = {
+    StudentProfile: "student_profile_id",
+    TeacherProfile: "teacher_profile_id",
+    EnterpriseProfile: "enterprise_profile_id",
+}
+
+
+def get_request_memo(db: AsyncSession, namespace: str) -> dict:
+    """
+    获取请求级缓存字典（随数据库会话一起释放）
+
+    Args:
+        db: 数据库会话
+        namespace: 缓存命名空间
+
+    Returns:
+        dict: 该命名空间的缓存字典
+    """
+    memo = db.info.setdefault(_REQUEST_MEMO_KEY, {})
+    return memo.setdefault(namespace, {})
+
+
+class IdentityContext:
+    """
+    当前用户的请求级身份上下文
+
+    档案按需加载且每个请求只加载一次。若用户带有 principal（来自身份缓存），
+    没有对应档案时直接返回None，有档案时按主键读取（命中会话标识映射时不查询数据库）。
+    注意：请求内修改档案的主账号状态后，上下文中的值不会自动刷新。
+    """
+
+    def __init__(self, db: AsyncSession, user: User):
+        self.db = db
+        self.user = user
+        self._profiles: Dict[type, Optional[object]] = {}
+        self._enterprise_ids: Optional[List[str]] = None
+
+    async def _get_profile(self, model):
+        if model in self._profiles:
+            return self._profiles[model]
+
+        principal = getattr(self.user, "principal", None)
+        if principal is not None:
+            profile_id = getattr(principal, _PRINCIPAL_PROFILE_ATTRS[model])
+            profile = await self.db.get(model, profile_id) if profile_id else None
+        else:
+            result = await self.db.execute(
+                select(model).where(model.user_id == self.user.id)
+            )
+            profile = result.scalar_one_or_none()
+
+        self._profiles[model] = profile
+        return profile
+
+    async def get_student_profile(self) -> Optional[StudentProfile]:
+        """获取当前用户的学生档案"""
+        return await self._get_profile(StudentProfile)
+
+    async def get_teacher_profile(self) -> Optional[TeacherProfile]:
+        """获取当前用户的教师档案"""
+        return await self._get_profile(TeacherProfile)
+
+    async def get_enterprise_profile(self) -> Optional[EnterpriseProfile]:
+        """获取当前用户的企业档案"""
+        return await self._get_profile(EnterpriseProfile)
+
+    async def is_sub_account(self) -> bool:
+        """
+        当前用户是否为教师/企业子账号（档案存在且不是主账号）
+
+        Returns:
+            bool: 是否子账号
+        """
+        if self.user.user_type == UserType.ENTERPRISE:
+            model = EnterpriseProfile
+        elif self.user.user_type == UserType.TEACHER:
+            model = TeacherProfile
+        else:
+            return False
+
+        principal = getattr(self.user, "principal", None)
+        if principal is not None and model not in self._profiles:
+            profile_id = getattr(principal, _PRINCIPAL_PROFILE_ATTRS[model])
+            return bool(profile_id) and not principal.is_main_account
+
+        profile = await self._get_profile(model)
+        return bool(profile) and not profile.is_main_account
+
+    async def get_enterprise_ids(self) -> List[str]:
+        """
+        获取用于查询的企业ID列表（主账号包含所有子账号ID）
+
+        Returns:
+            List[str]: 企业ID列表，没有企业档案时返回空列表
+        """
+        if self._enterprise_ids is None:
+            enterprise = await self.get_enterprise_profile()
+            if enterprise:
+                from app.services.enterprise_service import get_enterprise_ids_for_query
+                self._enterprise_ids = await get_enterprise_ids_for_query(self.db, enterprise)
+            else:
+                self._enterprise_ids = []
+        return self._enterprise_ids
+
+    async def get_school_scope(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        获取教师的管辖范围
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (学校ID, 院系ID)，非教师返回(None, None)
+        """
+        teacher = await self.get_teacher_profile()
+        if not teacher:
+            return None, None
+        return teacher.school_id, teacher.department_id
+
+
+def get_identity_context(db: AsyncSession, user: User) -> IdentityContext:
+    """
+    获取当前请求中用户的身份上下文（同一会话、同一用户只创建一次）
+
+    Args:
+        db: 数据库会话
+        user: 当前用户
+
+    Returns:
+        IdentityContext: 身份上下文
+    """
+    contexts = db.info.setdefault(_IDENTITY_CONTEXTS_KEY, {})
+    context = contexts.get(user.id)
+    if context is None:
+        context = IdentityContext(db, user)
+        contexts[user.id] = context
+    return context
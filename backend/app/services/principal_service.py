@@ -0,0 +1,175 @@
+"""
+用户身份缓存服务 - 缓存已认证用户及其档案ID
+避免每个已认证请求都查询用户表和档案表
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import get_cache, set_cache, delete_cache
+from app.models.user import User
+from app.models.user_type import UserType
+from app.models.profile import StudentProfile, TeacherProfile, EnterpriseProfile
+
+# 缓存键前缀（按令牌subject，即用户名）和有效期
+PRINCIPAL_CACHE_PREFIX = "auth:principal:"
+PRINCIPAL_CACHE_TTL = 120  # 2分钟
+
+# 缓存的用户字段（不缓存密码哈希）
+_USER_FIELDS = ("id", "username", "phone", "email", "user_type", "status", "created_at", "updated_at")
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+class UserPrincipal:
+    """
+    已认证用户的档案信息（随用户一起缓存）
+
+    通过 current_user.principal 访问，避免处理函数重复查询档案ID
+    """
+
+    def __init__(
+        self,
+        student_profile_id: Optional[str] = None,
+        teacher_profile_id: Optional[str] = None,
+        enterprise_profile_id: Optional[str] = None,
+        is_main_account: bool = False,
+        main_account_id: Optional[str] = None
+    ):
+        self.student_profile_id = student_profile_id
+        self.teacher_profile_id = teacher_profile_id
+        self.enterprise_profile_id = enterprise_profile_id
+        self.is_main_account = is_main_account  # 教师/企业档案是否主账号
+        self.main_account_id = main_account_id  # 教师/企业子账号所属的主账号档案ID
+
+    def to_dict(self) -> dict:
+        return {
+            "student_profile_id": self.student_profile_id,
+            "teacher_profile_id": self.teacher_profile_id,
+            "enterprise_profile_id": self.enterprise_profile_id,
+            "is_main_account": self.is_main_account,
+            "main_account_id": self.main_account_id,
+        }
+
+
+def _principal_cache_key(subject: str) -> str:
+    return f"{PRINCIPAL_CACHE_PREFIX}{subject}"
+
+
+async def _query_user(db: AsyncSession, subject: str) -> Optional[Tuple[User, dict]]:
+    """
+    一次查询用户及其档案ID
+
+    Returns:
+        tuple: (用户对象, 可缓存的用户数据)，用户不存在时返回None
+    """
+    result = await db.execute(
+        select(
+            User,
+            StudentProfile.id,
+            TeacherProfile.id,
+            TeacherProfile.is_main_account,
+            TeacherProfile.main_account_id,
+            EnterpriseProfile.id,
+            EnterpriseProfile.is_main_account,
+            EnterpriseProfile.main_account_id,
+        )
+        .outerjoin(StudentProfile, StudentProfile.user_id == User.id)
+        .outerjoin(TeacherProfile, TeacherProfile.user_id == User.id)
+        .outerjoin(EnterpriseProfile, EnterpriseProfile.user_id == User.id)
+        .where(User.username == subject)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    (user, student_profile_id, teacher_profile_id, teacher_is_main, teacher_main_id,
+     enterprise_profile_id, enterprise_is_main, enterprise_main_id) = row
+
+    data = {field: getattr(user, field) for field in _USER_FIELDS}
+    data["user_type"] = user.user_type.value if isinstance(user.user_type, UserType) else user.user_type
+    for field in _DATETIME_FIELDS:
+        data[field] = data[field].isoformat() if data[field] else None
+
+    data["principal"] = UserPrincipal(
+        student_profile_id=student_profile_id,
+        teacher_profile_id=teacher_profile_id,
+        enterprise_profile_id=enterprise_profile_id,
+        is_main_account=bool(teacher_is_main or enterprise_is_main),
+        main_account_id=teacher_main_id or enterprise_main_id,
+    ).to_dict()
+    return user, data
+
+
+async def _restore_user(db: AsyncSession, data: dict) -> User:
+    """
+    由缓存数据还原User对象，并以“已持久化”状态关联到当前会话（不查询数据库）
+
+    关联到会话后，处理函数对用户字段的修改仍会在提交时写回数据库；
+    未缓存的字段（如password_hash）需要先通过 db.refresh 加载。
+    """
+    fields = {field: data[field] for field in _USER_FIELDS}
+    fields["user_type"] = UserType(fields["user_type"])
+    for field in _DATETIME_FIELDS:
+        fields[field] = datetime.fromisoformat(fields[field]) if fields[field] else None
+
+    user = User(**fields)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+async def get_user_by_subject(db: AsyncSession, subject: str) -> Optional[User]:
+    """
+    按令牌subject（用户名）获取用户，优先使用缓存
+
+    返回的用户带有 principal 属性（UserPrincipal），包含档案ID和主账号信息
+
+    Args:
+        db: 数据库会话
+        subject: 令牌中的sub（用户名）
+
+    Returns:
+        Optional[User]: 用户对象，不存在时返回None
+    """
+    cache_key = _principal_cache_key(subject)
+    data = await get_cache(cache_key)
+    if isinstance(data, dict):
+        user = await _restore_user(db, data)
+    else:
+        queried = await _query_user(db, subject)
+        if queried is None:
+            return None
+        user, data = queried
+        await set_cache(cache_key, data, expire=PRINCIPAL_CACHE_TTL)
+
+    user.principal = UserPrincipal(**data["principal"])
+    return user
+
+
+async def invalidate_user_principal(username: str):
+    """
+    使用户身份缓存失效
+
+    在修改密码、禁用/启用账号、修改用户类型、修改手机号/邮箱、
+    创建档案、变更主账号状态以及删除用户后调用
+
+    Args:
+        username: 用户名（令牌subject）
+    """
+    await delete_cache(_principal_cache_key(username))
+
+
+async def invalidate_user_principal_by_id(db: AsyncSession, user_id: str):
+    """
+    按用户ID使用户身份缓存失效（只有档案中的user_id时使用）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+    """
+    result = await db.execute(select(User.username).where(User.id == user_id))
+    username = result.scalar_one_or_none()
+    if username:
+        await invalidate_user_principal(username)
@@ -0,0 +1,195 @@
+"""
+消息已读状态服务
+- 标记已读：按高水位（created_at, id）一条UPDATE批量标记，不加载ORM对象
+- 未读计数：每个用户一个Redis哈希（system：系统消息，chat：聊天消息），
+  新消息写入时加一、标记已读时按实际更新行数减少，轮询未读数只读Redis，不扫描messages表
+
+计数不存在时（首次访问、过期或Redis重启）从数据库重建一次；Redis不可用时直接查询数据库。
+计数键设置过期时间，重建与写入并发造成的偏差最多持续到下次重建。
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.chat import Message
+from app.models.enums import MessageType
+
+logger = get_logger(__name__)
+
+UNREAD_COUNTER_PREFIX = "chat:unread:"
+
+# 未读计数分类
+UNREAD_SYSTEM = "system"
+UNREAD_CHAT = "chat"
+UNREAD_KINDS = (UNREAD_SYSTEM, UNREAD_CHAT)
+
+# 仅在计数键存在时调整计数（键不存在时由下次读取重建，避免写入不完整的计数）
+_ADJUST_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    local value = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+    if value < 0 then
+        redis.call('HSET', KEYS[1], ARGV[1], 0)
+    end
+    return 1
+end
+return 0
+"""
+
+
+def unread_kind(message_type) -> str:
+    """按消息类型返回未读计数分类"""
+    return UNREAD_SYSTEM if message_type == MessageType.SYSTEM else UNREAD_CHAT
+
+
+def _kind_condition(kind: str):
+    if kind == UNREAD_SYSTEM:
+        return Message.message_type == MessageType.SYSTEM
+    return Message.message_type != MessageType.SYSTEM
+
+
+async def _count_unread_from_db(db: AsyncSession, user_id: str) -> Dict[str, int]:
+    """从数据库统计用户各分类的未读数（一次GROUP BY）"""
+    kind_column = case(
+        (Message.message_type == MessageType.SYSTEM, UNREAD_SYSTEM),
+        else_=UNREAD_CHAT
+    )
+    result = await db.execute(
+        select(kind_column, func.count())
+        .where(Message.receiver_id == user_id, Message.is_read == False)
+        .group_by(kind_column)
+    )
+    counts = {kind: 0 for kind in UNREAD_KINDS}
+    for kind, count in result.all():
+        counts[kind] = count
+    return counts
+
+
+async def get_unread_counts(db: AsyncSession, user_id: str) -> Dict[str, int]:
+    """
+    获取用户各分类的未读数
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+
+    Returns:
+        dict: {"system": n, "chat": n}
+    """
+    from app.core.cache import get_redis, redis_health
+    key = f"{UNREAD_COUNTER_PREFIX}{user_id}"
+    redis = await get_redis()
+    if redis:
+        try:
+            values = await redis.hmget(key, *UNREAD_KINDS)
+            redis_health.record_success()
+            if all(value is not None for value in values):
+                return {kind: max(0, int(value)) for kind, value in zip(UNREAD_KINDS, values)}
+        except Exception as e:
+            redis_health.record_failure()
+            logger.warning(f"读取未读计数失败，改为查询数据库: {str(e)}")
+            redis = None
+
+    counts = await _count_unread_from_db(db, user_id)
+    if redis:
+        try:
+            pipe = redis.pipeline(transaction=True)
+            pipe.hset(key, mapping=counts)
+            pipe.expire(key, settings.UNREAD_COUNTER_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"重建未读计数失败: {str(e)}")
+    return counts
+
+
+async def get_unread_count(db: AsyncSession, user_id: str, kind: str) -> int:
+    """获取用户某一分类的未读数"""
+    return (await get_unread_counts(db, user_id))[kind]
+
+
+async def adjust_unread_counts(deltas: Iterable[Tuple[str, str, int]]):
+    """
+    批量调整未读计数（在数据库事务提交后调用）
+
+    Args:
+        deltas: (user_id, kind, delta) 列表，delta为正表示新增未读，为负表示已读
+    """
+    deltas = [(user_id, kind, delta) for user_id, kind, delta in deltas if delta]
+    if not deltas:
+        return
+    from app.core.cache import get_redis, redis_health
+    redis = await get_redis()
+    if not redis:
+        return
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for user_id, kind, delta in deltas:
+            pipe.eval(_ADJUST_IF_EXISTS_SCRIPT, 1, f"{UNREAD_COUNTER_PREFIX}{user_id}", kind, delta)
+        await pipe.execute()
+        redis_health.record_success()
+    except Exception as e:
+        redis_health.record_failure()
+        logger.warning(f"更新未读计数失败，删除计数等待重建: {str(e)}")
+        await invalidate_unread_counts({user_id for user_id, _, _ in deltas})
+
+
+async def invalidate_unread_counts(user_ids: Iterable[str]):
+    """删除用户的未读计数，下次读取时从数据库重建"""
+    from app.core.cache import get_redis
+    keys = [f"{UNREAD_COUNTER_PREFIX}{user_id}" for user_id in user_ids]
+    redis = await get_redis()
+    if not redis or not keys:
+        return
+    try:
+        await redis.delete(*keys)
+    except Exception as e:
+        logger.warning(f"删除未读计数失败: {str(e)}")
+
+
+async def record_new_message(receiver_id: str, message_type):
+    """新消息提交后增加接收者的未读计数"""
+    await adjust_unread_counts([(receiver_id, unread_kind(message_type), 1)])
+
+
+async def mark_messages_read(
+    db: AsyncSession,
+    user_id: str,
+    kind: str,
+    *conditions,
+    high_water: Optional[Tuple[datetime, str]] = None,
+) -> int:
+    """
+    用一条UPDATE把用户收到的未读消息标记为已读，提交事务并减少未读计数
+
+    Args:
+        db: 数据库会话
+        user_id: 接收者用户ID
+        kind: 未读计数分类（UNREAD_SYSTEM 或 UNREAD_CHAT），只更新该分类的消息
+        *conditions: 额外过滤条件（例如会话ID、消息ID）
+        high_water: 高水位 (created_at, id)，只标记不晚于该位置的消息；
+            为None时标记全部，调用方列表加载后到达的新消息也会被标记
+
+    Returns:
+        int: 实际由未读变为已读的消息数
+    """
+    statement = update(Message).where(
+        Message.receiver_id == user_id,
+        Message.is_read == False,
+        _kind_condition(kind),
+        *conditions
+    )
+    if high_water is not None:
+        created_at, message_id = high_water
+        statement = statement.where(or_(
+            Message.created_at < created_at,
+            and_(Message.created_at == created_at, Message.id <= message_id)
+        ))
+    # 会话中已加载的消息对象同步更新is_read
+    result = await db.execute(statement.values(is_read=True))
+    await db.commit()
+    updated = result.rowcount or 0
+    await adjust_unread_counts([(user_id, kind, -updated)])
+    return updated
@@ -0,0 +1,475 @@
+"""
+统计汇总服务
+- 汇总表 statistics_rollups 按 (指标, 日期, 学校, 院系, 企业, 状态) 计数，统计面板只读取汇总行，
+  耗时与桶数成正比，与明细行数无关
+- 增量更新：ORM会话flush后收集被跟踪模型的新增、删除和维度变化，事务提交后放入延迟写入缓冲区，
+  与查看次数共用后台写入任务（各自一个事务），批量 INSERT ... ON DUPLICATE KEY UPDATE count = count + n
+- 纠偏：后台每隔 STATISTICS_ROLLUP_RECONCILE_INTERVAL 秒用明细表 GROUP BY 重算最近
+  STATISTICS_ROLLUP_RECONCILE_DAYS 天（不含当天）的汇总行，按开始日期分桶的活动全部重算；
+  修正批量SQL写入、级联删除和学生转院系带来的偏差。更早日期的偏差（如删除老用户级联删除的简历、
+  学生转院系后的历史记录）由每隔 STATISTICS_ROLLUP_FULL_REBUILD_INTERVAL 秒一次的全部重算修正；
+  汇总表为空时（首次部署）也全部重算，也可手动执行 scripts/rebuild_statistics_rollups.py。
+  重算前先写入本进程缓冲区中的增量；其他worker缓冲区中的增量尚未写入，因此最近几个写入间隔内
+  新增或修改过明细行的日期本次不重算，以免随后写入的增量与重算结果重复计数（这些日期下次重算）。
+  删除行和活动改期不留痕迹，恰好发生在重算前几秒时，偏差留到下次重算该日期时修正
+
+去重计数（活跃学生数、报名企业数等）不能按桶相加，仍由接口查询明细表。
+"""
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, event, func, inspect, insert, literal, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.activity import InfoSession, InfoSessionRegistration, JobFair, JobFairRegistration
+from app.models.interview import Interview, Offer
+from app.models.job import Job, JobApplication, Resume
+from app.models.profile import StudentProfile
+from app.models.statistics import StatisticsRollup
+from app.models.user import User
+from app.services.counter_service import WriteBehindCounter, flush_counters
+
+logger = get_logger(__name__)
+
+# 汇总维度（不适用的维度为空字符串）
+DIMENSIONS = ("school_id", "department_id", "enterprise_id", "status")
+# 汇总键：(指标, 日期, 学校, 院系, 企业, 状态)
+KEY_COLUMNS = ("metric", "bucket_date") + DIMENSIONS
+
+ROLLUP_RECONCILE_LOCK_KEY = "statistics:rollup:reconcile"
+ROLLUP_FULL_REBUILD_KEY = "statistics:rollup:full_rebuild"
+# 明细行变化后，其汇总增量最多经过几个 COUNTER_FLUSH_INTERVAL 写入汇总表（含写入耗时的余量）
+ROLLUP_SETTLE_FLUSH_INTERVALS = 3
+_SESSION_DELTAS_KEY = "statistics_rollup_deltas"
+
+_reconcile_task: Optional[asyncio.Task] = None
+_last_full_rebuild: Optional[float] = None  # Redis不可用时记录本进程上次全部重算的时间
+
+
+class RollupSpec:
+    """
+    汇总指标定义
+
+    Args:
+        metric: 指标名
+        model: 明细表模型
+        bucket_column: 按哪一列的日期分桶
+        columns: 维度 -> 明细表上的列名（直接取自明细行）
+        student_column: 通过学生档案取学校和院系时，明细行上关联学生的列名
+        student_key: student_column 关联的学生档案列（id 或 user_id）
+    """
+
+    def __init__(
+        self,
+        metric: str,
+        model,
+        bucket_column: str = "created_at",
+        columns: Optional[Dict[str, str]] = None,
+        student_column: Optional[str] = None,
+        student_key: str = "id",
+    ):
+        self.metric = metric
+        self.model = model
+        self.bucket_column = bucket_column
+        self.columns = columns or {}
+        self.student_column = student_column
+        self.student_key = student_key
+        self.attributes = [bucket_column, *self.columns.values()] + ([student_column] if student_column else [])
+
+
+ROLLUP_SPECS = [
+    RollupSpec("users", User),
+    RollupSpec("students", StudentProfile, columns={"school_id": "school_id", "department_id": "department_id"}),
+    RollupSpec("resumes", Resume, student_column="student_id"),
+    RollupSpec("jobs", Job, columns={"enterprise_id": "enterprise_id"}),
+    RollupSpec("applications", JobApplication, student_column="student_id", student_key="user_id"),
+    RollupSpec("interviews", Interview, columns={"enterprise_id": "enterprise_id"}, student_column="student_id"),
+    RollupSpec("offers", Offer, columns={"enterprise_id": "enterprise_id"}, student_column="student_id"),
+    RollupSpec("job_fairs", JobFair, bucket_column="start_time",
+               columns={"school_id": "school_id", "status": "status"}),
+    RollupSpec("job_fair_registrations", JobFairRegistration, columns={"enterprise_id": "enterprise_id"}),
+    RollupSpec("info_sessions", InfoSession, bucket_column="start_time",
+               columns={"school_id": "school_id", "enterprise_id": "enterprise_id", "status": "status"}),
+    RollupSpec("info_session_registrations", InfoSessionRegistration, student_column="student_id"),
+]
+ROLLUP_SPECS_BY_MODEL = {spec.model: spec for spec in ROLLUP_SPECS}
+
+
+# ==================== 增量更新 ====================
+
+class RollupCounter(WriteBehindCounter):
+    """汇总增量的延迟写入缓冲区（键为汇总键）"""
+
+    def __init__(self):
+        super().__init__(StatisticsRollup, "count")
+
+    def build_updates(self, pending: Dict[tuple, int]) -> list:
+        """按汇总键生成批量 INSERT ... ON DUPLICATE KEY UPDATE"""
+        rows = [
+            {**dict(zip(KEY_COLUMNS, key)), "count": amount}
+            for key, amount in sorted(pending.items()) if amount
+        ]
+        batch_size = settings.COUNTER_FLUSH_BATCH_SIZE
+        statements = []
+        for start in range(0, len(rows), batch_size):
+            statement = mysql_insert(StatisticsRollup).values(rows[start:start + batch_size])
+            statements.append(statement.on_duplicate_key_update(
+                count=StatisticsRollup.count + statement.inserted.count
+            ))
+        return statements
+
+
+rollup_counter = RollupCounter()
+
+
+def _bucket_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # 服务器端默认值（created_at）在flush后未加载，按当前日期计
+    return datetime.now().date()
+
+
+def row_values(spec: RollupSpec, obj, old: bool = False) -> dict:
+    """
+    读取明细行上汇总需要的列（不触发数据库加载）
+
+    Args:
+        spec: 汇总指标定义
+        obj: ORM对象
+        old: True时取修改前的值（用于删除和维度变化）
+    """
+    state = inspect(obj)
+    values = {}
+    for name in spec.attributes:
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = state.dict.get(name)
+    return values
+
+
+def rollup_key(spec: RollupSpec, values: dict, students: Dict[Tuple[str, str], tuple]) -> tuple:
+    """
+    计算明细行所属的汇总键
+
+    Args:
+        spec: 汇总指标定义
+        values: row_values 返回的列值
+        students: (学生档案列, 值) -> (school_id, department_id)
+    """
+    dimensions = {dimension: values.get(column) or "" for dimension, column in spec.columns.items()}
+    if spec.student_column:
+        school_id, department_id = students.get((spec.student_key, values.get(spec.student_column)), (None, None))
+        dimensions["school_id"] = school_id or ""
+        dimensions["department_id"] = department_id or ""
+    return (spec.metric, _bucket_date(values.get(spec.bucket_column)),
+            *(dimensions.get(dimension, "") for dimension in DIMENSIONS))
+
+
+def _changed(spec: RollupSpec, obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in spec.attributes)
+
+
+def _load_student_dimensions(session: Session, entries) -> Dict[Tuple[str, str], tuple]:
+    """一次查询加载本次flush涉及的学生档案的学校和院系"""
+    wanted = {"id": set(), "user_id": set()}
+    for spec, values, _ in entries:
+        if spec.student_column and values.get(spec.student_column):
+            wanted[spec.student_key].add(values[spec.student_column])
+    if not wanted["id"] and not wanted["user_id"]:
+        return {}
+    result = session.execute(
+        select(StudentProfile.id, StudentProfile.user_id, StudentProfile.school_id, StudentProfile.department_id)
+        .where(or_(StudentProfile.id.in_(wanted["id"]), StudentProfile.user_id.in_(wanted["user_id"])))
+    )
+    students = {}
+    for student_id, user_id, school_id, department_id in result.all():
+        students[("id", student_id)] = (school_id, department_id)
+        students[("user_id", user_id)] = (school_id, department_id)
+    return students
+
+
+def _collect_rollup_deltas(session: Session, flush_context):
+    """flush后收集汇总增量，暂存在会话中，提交后再放入写入缓冲区"""
+    entries = []
+    for obj in session.new:
+        spec = ROLLUP_SPECS_BY_MODEL.get(type(obj))
+        if spec:
+            entries.append((spec, row_values(spec, obj), 1))
+    for obj in session.deleted:
+        spec = ROLLUP_SPECS_BY_MODEL.get(type(obj))
+        if spec:
+            entries.append((spec, row_values(spec, obj, old=True), -1))
+    for obj in session.dirty:
+        spec = ROLLUP_SPECS_BY_MODEL.get(type(obj))
+        if spec and _changed(spec, obj):
+            entries.append((spec, row_values(spec, obj, old=True), -1))
+            entries.append((spec, row_values(spec, obj), 1))
+    if not entries:
+        return
+
+    students = _load_student_dimensions(session, entries)
+    deltas = session.info.setdefault(_SESSION_DELTAS_KEY, {})
+    for spec, values, amount in entries:
+        key = rollup_key(spec, values, students)
+        deltas[key] = deltas.get(key, 0) + amount
+
+
+def _apply_rollup_deltas(session: Session):
+    for key, amount in session.info.pop(_SESSION_DELTAS_KEY, {}).items():
+        if amount:
+            rollup_counter.increment(key, amount)
+
+
+def _discard_rollup_deltas(session: Session):
+    session.info.pop(_SESSION_DELTAS_KEY, None)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def register_rollup_events():
+    """注册会话事件（应用启动时调用，重复调用无副作用）"""
+    # 维度列赋值时加载旧值（对象过期后修改也能得到旧值），用于把计数从旧桶移到新桶
+    for spec in ROLLUP_SPECS:
+        for name in spec.attributes:
+            attribute = getattr(spec.model, name)
+            if not event.contains(attribute, "set", _keep_old_value):
+                event.listen(attribute, "set", _keep_old_value, active_history=True, retval=True)
+    for name, listener in (
+        ("after_flush", _collect_rollup_deltas),
+        ("after_commit", _apply_rollup_deltas),
+        ("after_rollback", _discard_rollup_deltas),
+    ):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
+
+
+# ==================== 纠偏重算 ====================
+
+def build_recent_dates_query(spec: RollupSpec, settled_before: datetime):
+    """查询 settled_before 之后新增或修改过明细行的汇总日期（这些行的增量可能还在缓冲区中）"""
+    model = spec.model
+    changed = [model.created_at >= settled_before]
+    if hasattr(model, "updated_at"):
+        changed.append(model.updated_at >= settled_before)
+    return select(func.date(getattr(model, spec.bucket_column))).where(or_(*changed)).distinct()
+
+
+def build_reconcile_statements(
+    spec: RollupSpec,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    settled_before: Optional[datetime] = None,
+    skip_dates: Sequence[date] = (),
+) -> list:
+    """
+    生成重算一个指标汇总行的语句：删除日期范围内的汇总行，再用 INSERT ... SELECT 从明细表重算
+
+    Args:
+        spec: 汇总指标定义
+        start: 起始日期（含），None表示不限
+        end: 结束日期（不含），None表示不限
+        settled_before: 只统计此时间之前创建的明细行，之后创建的行由缓冲区中的增量计入
+        skip_dates: 不重算的日期（可能还有未写入的增量）
+    """
+    model = spec.model
+    bucket_column = getattr(model, spec.bucket_column)
+    bucket = func.date(bucket_column)
+    dimensions = {dimension: func.coalesce(getattr(model, column), "") for dimension, column in spec.columns.items()}
+    if spec.student_column:
+        dimensions["school_id"] = func.coalesce(StudentProfile.school_id, "")
+        dimensions["department_id"] = func.coalesce(StudentProfile.department_id, "")
+    grouped = [bucket] + [dimensions[dimension] for dimension in DIMENSIONS if dimension in dimensions]
+
+    query = select(
+        literal(spec.metric),
+        bucket,
+        *(dimensions.get(dimension, literal("")) for dimension in DIMENSIONS),
+        func.count(),
+    ).select_from(model)
+    if spec.student_column:
+        query = query.outerjoin(
+            StudentProfile, getattr(StudentProfile, spec.student_key) == getattr(model, spec.student_column)
+        )
+
+    cleanup = delete(StatisticsRollup).where(StatisticsRollup.metric == spec.metric)
+    if start is not None:
+        query = query.where(bucket_column >= datetime.combine(start, datetime.min.time()))
+        cleanup = cleanup.where(StatisticsRollup.bucket_date >= start)
+    if end is not None:
+        query = query.where(bucket_column < datetime.combine(end, datetime.min.time()))
+        cleanup = cleanup.where(StatisticsRollup.bucket_date < end)
+    if settled_before is not None:
+        query = query.where(model.created_at < settled_before)
+    if skip_dates:
+        query = query.where(bucket.notin_(list(skip_dates)))
+        cleanup = cleanup.where(StatisticsRollup.bucket_date.notin_(list(skip_dates)))
+
+    rebuild = insert(StatisticsRollup).from_select([*KEY_COLUMNS, "count"], query.group_by(*grouped))
+    return [cleanup, rebuild]
+
+
+async def reconcile_rollups(db: AsyncSession, days: Optional[int] = None):
+    """
+    用明细表重算汇总行（每个指标一个事务）
+
+    先写入本进程缓冲区中的增量；最近 ROLLUP_SETTLE_FLUSH_INTERVALS 个写入间隔内新增或修改过明细行的日期
+    不重算，这些时间之后创建的行也不计入重算结果，由各worker随后写入的增量计入。
+
+    Args:
+        db: 数据库会话
+        days: 重算最近多少天（不含当天，当天的增量可能还在写入缓冲区中）；None表示全部重算
+    """
+    await flush_counters(db)
+    if len(rollup_counter):
+        logger.warning("写入汇总增量失败，跳过本次重算")
+        return
+
+    # 明细表的时间列由数据库生成，按数据库时间计算
+    now = (await db.execute(select(func.now()))).scalar()
+    settled_before = now - timedelta(seconds=settings.COUNTER_FLUSH_INTERVAL * ROLLUP_SETTLE_FLUSH_INTERVALS)
+    today = now.date()
+    for spec in ROLLUP_SPECS:
+        start = end = None
+        if days is not None and spec.bucket_column == "created_at":
+            start, end = today - timedelta(days=days), today
+        skip_dates = [row[0] for row in (await db.execute(build_recent_dates_query(spec, settled_before))).all()]
+        for statement in build_reconcile_statements(spec, start, end, settled_before, skip_dates):
+            await db.execute(statement)
+        await db.commit()
+
+
+async def _acquire_reconcile_lock() -> bool:
+    """多个worker中只由一个执行重算；Redis不可用时各自执行"""
+    from app.core.cache import get_redis
+    redis = await get_redis()
+    if not redis:
+        return True
+    try:
+        ttl = max(1, int(settings.STATISTICS_ROLLUP_RECONCILE_INTERVAL) - 1)
+        return bool(await redis.set(ROLLUP_RECONCILE_LOCK_KEY, "1", nx=True, ex=ttl))
+    except Exception as e:
+        logger.warning(f"获取汇总重算锁失败: {str(e)}")
+        return True
+
+
+async def _full_rebuild_due() -> bool:
+    """
+    是否到了全部重算的时间（在持有重算锁时调用）
+
+    多个worker通过Redis键（过期时间为全部重算间隔）共享上次全部重算的时间；Redis不可用时按本进程记录
+    """
+    global _last_full_rebuild
+    interval = settings.STATISTICS_ROLLUP_FULL_REBUILD_INTERVAL
+    if interval <= 0:
+        return False
+
+    from app.core.cache import get_redis
+    redis = await get_redis()
+    if redis:
+        try:
+            return bool(await redis.set(ROLLUP_FULL_REBUILD_KEY, "1", nx=True, ex=max(1, int(interval))))
+        except Exception as e:
+            logger.warning(f"读取汇总全部重算时间失败: {str(e)}")
+
+    now = time.monotonic()
+    if _last_full_rebuild is not None and now - _last_full_rebuild < interval:
+        return False
+    _last_full_rebuild = now
+    return True
+
+
+async def _reconcile_loop():
+    from app.core.database import AsyncSessionLocal
+    while True:
+        try:
+            if await _acquire_reconcile_lock():
+                async with AsyncSessionLocal() as db:
+                    empty = (await db.execute(select(StatisticsRollup.metric).limit(1))).first() is None
+                    full = empty or await _full_rebuild_due()
+                    await reconcile_rollups(db, None if full else settings.STATISTICS_ROLLUP_RECONCILE_DAYS)
+        except Exception as e:
+            logger.warning(f"重算统计汇总失败: {str(e)}")
+        await asyncio.sleep(settings.STATISTICS_ROLLUP_RECONCILE_INTERVAL)
+
+
+def start_rollup_reconciler():
+    """启动汇总后台重算（在应用启动时调用）"""
+    global _reconcile_task
+    if _reconcile_task is None or _reconcile_task.done():
+        _reconcile_task = asyncio.create_task(_reconcile_loop())
+
+
+async def stop_rollup_reconciler():
+    """停止汇总后台重算"""
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        try:
+            await _reconcile_task
+        except asyncio.CancelledError:
+            pass
+        _reconcile_task = None
+
+
+# ==================== 读取 ====================
+
+def build_rollup_query(
+    metrics: Iterable[str],
+    group_by: Sequence[str] = (),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    **dimensions: Optional[str]
+):
+    """
+    汇总行求和查询
+
+    Args:
+        metrics: 指标
+        group_by: 分组维度
+        start_date: 起始日期（含）
+        end_date: 结束日期（含）
+        **dimensions: 维度过滤，值为None时不过滤，空字符串表示该维度为空
+    """
+    columns = [StatisticsRollup.metric] + [getattr(StatisticsRollup, dimension) for dimension in group_by]
+    query = select(*columns, func.sum(StatisticsRollup.count)).where(StatisticsRollup.metric.in_(list(metrics)))
+    for dimension, value in dimensions.items():
+        if value is not None:
+            query = query.where(getattr(StatisticsRollup, dimension) == value)
+    if start_date is not None:
+        query = query.where(StatisticsRollup.bucket_date >= start_date)
+    if end_date is not None:
+        query = query.where(StatisticsRollup.bucket_date <= end_date)
+    return query.group_by(*columns)
+
+
+async def sum_rollup_metrics(db: AsyncSession, metrics: Sequence[str], **filters) -> Dict[str, int]:
+    """多个指标的合计（一次查询），返回 {指标: 计数}"""
+    result = await db.execute(build_rollup_query(metrics, **filters))
+    totals = {metric: 0 for metric in metrics}
+    for metric, count in result.all():
+        totals[metric] = int(count or 0)
+    return totals
+
+
+async def sum_rollup_groups(
+    db: AsyncSession,
+    metric: str,
+    group_by: Sequence[str],
+    **filters
+) -> Dict[tuple, int]:
+    """一个指标按维度分组求和，返回 {(维度值, ...): 计数}，不含计数为0的分组"""
+    result = await db.execute(build_rollup_query([metric], group_by, **filters))
+    return {tuple(row[1:-1]): int(row[-1]) for row in result.all() if row[-1]}
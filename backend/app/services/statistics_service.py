@@ -0,0 +1,239 @@
+"""
+统计查询服务
+每个统计面板的计数合并为一条SELECT（一次数据库往返）：
+- 同一张表的多个计数用条件聚合：COUNT(*) 与 SUM(CASE WHEN ... THEN 1 ELSE 0 END)
+- 不同表的单行聚合子查询作为派生表拼接在同一条SELECT中
+- 去重计数（触达人才数）用 UNION 合并各来源后 COUNT
+- 按学生范围（学校、院系）统计时用 EXISTS 半连接和关联子查询，不把学生ID列表取回再拼成 IN (...)
+
+各函数只负责查询，权限检查和档案加载由接口完成。
+"""
+from typing import Dict, List
+
+from sqlalchemy import case, exists, func, or_, select, true, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.activity import InfoSession, JobFair, JobFairRegistration
+from app.models.chat import ChatSession
+from app.models.common import Favorite, Schedule
+from app.models.interview import Interview, Offer
+from app.models.job import Job, JobApplication, Resume
+from app.models.profile import StudentProfile
+from app.models.school import Department
+from app.models.user import User
+
+
+def count_if(condition):
+    """条件计数：SUM(CASE WHEN condition THEN 1 ELSE 0 END)，没有行时为0"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def build_aggregate_row(*subqueries):
+    """
+    把若干单行聚合子查询拼接为一条SELECT
+
+    Args:
+        *subqueries: 单行聚合查询（select(...)，列需带label）
+
+    Returns:
+        Select: 一行结果，列为所有子查询的列
+    """
+    derived = [subquery.subquery() for subquery in subqueries]
+    from_clause = derived[0]
+    for table in derived[1:]:
+        from_clause = from_clause.join(table, true())
+    return select(*[column for table in derived for column in table.c]).select_from(from_clause)
+
+
+async def fetch_aggregate_row(db: AsyncSession, *subqueries) -> Dict[str, int]:
+    """执行 build_aggregate_row 生成的查询，返回 {列名: 计数}"""
+    result = await db.execute(build_aggregate_row(*subqueries))
+    return {key: int(value or 0) for key, value in result.mappings().one().items()}
+
+
+def _count(model, label: str, *conditions):
+    return select(func.count().label(label)).select_from(model).where(*conditions)
+
+
+async def get_student_dashboard_counts(db: AsyncSession, user_id: str, student_id: str) -> Dict[str, int]:
+    """
+    学生个人统计（一次查询）
+
+    Args:
+        db: 数据库会话
+        user_id: 学生的用户ID（申请、收藏、日程按用户ID关联）
+        student_id: 学生档案ID（面试、Offer、简历按档案ID关联）
+
+    Returns:
+        dict: 申请、面试、Offer、收藏、简历和待办计数
+    """
+    return await fetch_aggregate_row(
+        db,
+        select(
+            func.count().label("total_applications"),
+            count_if(JobApplication.status == "ACCEPTED").label("accepted_applications"),
+        ).select_from(JobApplication).where(JobApplication.student_id == user_id),
+        _count(Interview, "total_interviews", Interview.student_id == student_id),
+        select(
+            func.count().label("total_offers"),
+            count_if(Offer.status == "ACCEPTED").label("accepted_offers"),
+        ).select_from(Offer).where(Offer.student_id == student_id),
+        _count(Favorite, "total_favorites", Favorite.user_id == user_id),
+        _count(Resume, "total_resumes", Resume.student_id == student_id),
+        _count(Schedule, "total_todos", Schedule.user_id == user_id, Schedule.is_completed == False),
+    )
+
+
+def build_talent_union(user_id: str, enterprise_id: str):
+    """
+    企业触达的学生档案ID（申请、面试、Offer、收藏简历、聊天），UNION去重
+
+    Args:
+        user_id: 企业用户ID
+        enterprise_id: 企业档案ID
+    """
+    return union(
+        select(StudentProfile.id)
+        .join(JobApplication, JobApplication.student_id == StudentProfile.user_id)
+        .join(Job, Job.id == JobApplication.job_id)
+        .where(Job.enterprise_id == enterprise_id),
+        select(Interview.student_id).where(Interview.enterprise_id == enterprise_id),
+        select(Offer.student_id).where(Offer.enterprise_id == enterprise_id),
+        select(Resume.student_id)
+        .join(Favorite, Favorite.target_id == Resume.id)
+        .where(Favorite.user_id == user_id, Favorite.target_type == "RESUME"),
+        # 两个方向分开查询，各自使用user1_id、user2_id上的索引
+        select(StudentProfile.id)
+        .join(ChatSession, ChatSession.user2_id == StudentProfile.user_id)
+        .where(ChatSession.user1_id == user_id),
+        select(StudentProfile.id)
+        .join(ChatSession, ChatSession.user1_id == StudentProfile.user_id)
+        .where(ChatSession.user2_id == user_id),
+    )
+
+
+async def get_enterprise_dashboard_counts(db: AsyncSession, user_id: str, enterprise_id: str) -> Dict[str, int]:
+    """
+    企业个人统计（一次查询）
+
+    Args:
+        db: 数据库会话
+        user_id: 企业用户ID（收藏、聊天按用户ID关联）
+        enterprise_id: 企业档案ID
+
+    Returns:
+        dict: 职位、申请、面试、Offer、收藏、宣讲会、双选会报名、聊天会话和触达人才计数
+    """
+    talents = build_talent_union(user_id, enterprise_id).subquery()
+    return await fetch_aggregate_row(
+        db,
+        select(
+            func.count().label("total_jobs"),
+            count_if(Job.status == "PUBLISHED").label("published_jobs"),
+        ).select_from(Job).where(Job.enterprise_id == enterprise_id),
+        select(
+            func.count().label("total_applications"),
+            count_if(JobApplication.status == "ACCEPTED").label("accepted_applications"),
+        ).select_from(JobApplication).join(Job, Job.id == JobApplication.job_id)
+        .where(Job.enterprise_id == enterprise_id),
+        _count(Interview, "total_interviews", Interview.enterprise_id == enterprise_id),
+        select(
+            func.count().label("total_offers"),
+            count_if(Offer.status == "ACCEPTED").label("accepted_offers"),
+        ).select_from(Offer).where(Offer.enterprise_id == enterprise_id),
+        _count(Favorite, "total_favorites", Favorite.user_id == user_id, Favorite.target_type == "RESUME"),
+        _count(InfoSession, "total_info_sessions", InfoSession.enterprise_id == enterprise_id),
+        _count(JobFairRegistration, "total_job_fair_registrations", JobFairRegistration.enterprise_id == enterprise_id),
+        _count(ChatSession, "total_chat_sessions", or_(
+            ChatSession.user1_id == user_id,
+            ChatSession.user2_id == user_id
+        )),
+        select(func.count().label("total_talents")).select_from(talents),
+    )
+
+
+async def get_applications_by_job(db: AsyncSession, enterprise_id: str) -> List[dict]:
+    """企业各职位的申请数（一次GROUP BY）"""
+    result = await db.execute(
+        select(JobApplication.job_id, func.count().label("count"))
+        .join(Job, Job.id == JobApplication.job_id)
+        .where(Job.enterprise_id == enterprise_id)
+        .group_by(JobApplication.job_id)
+    )
+    return [{"job_id": job_id, "count": count} for job_id, count in result.all()]
+
+
+async def get_platform_counts(db: AsyncSession) -> Dict[str, int]:
+    """平台概览计数（一次查询）"""
+    return await fetch_aggregate_row(
+        db,
+        _count(User, "total_users"),
+        _count(StudentProfile, "total_students"),
+        _count(Job, "total_jobs"),
+        _count(JobApplication, "total_applications"),
+        _count(JobFair, "total_job_fairs"),
+        _count(InfoSession, "total_info_sessions"),
+    )
+
+
+def student_scope_conditions(**scope) -> list:
+    """学生范围条件：StudentProfile 的列名 -> 值（如 department_id、school_id）"""
+    return [getattr(StudentProfile, column) == value for column, value in scope.items()]
+
+
+def active_student_condition():
+    """活跃学生：有简历或有申请（EXISTS 半连接，关联外层的 StudentProfile）"""
+    return or_(
+        # Resume.student_id 关联 student_profiles.id
+        exists().where(Resume.student_id == StudentProfile.id),
+        # JobApplication.student_id 关联 users.id
+        exists().where(JobApplication.student_id == StudentProfile.user_id),
+    )
+
+
+async def count_active_students(db: AsyncSession, **scope) -> int:
+    """
+    范围内的活跃学生数（一次查询）
+
+    Args:
+        db: 数据库会话
+        **scope: 学生范围（见 student_scope_conditions）
+    """
+    result = await db.execute(
+        select(func.count()).select_from(StudentProfile)
+        .where(*student_scope_conditions(**scope), active_student_condition())
+    )
+    return result.scalar() or 0
+
+
+def build_student_activity_rows(**scope):
+    """
+    范围内每个学生的简历数和申请数（导出用，按学生档案ID排序）
+
+    计数为关联子查询，各自使用 resumes.student_id、job_applications.student_id 上的索引。
+
+    Args:
+        **scope: 学生范围（见 student_scope_conditions）
+    """
+    resume_count = (
+        select(func.count()).where(Resume.student_id == StudentProfile.id)
+        .correlate(StudentProfile).scalar_subquery()
+    )
+    application_count = (
+        select(func.count()).where(JobApplication.student_id == StudentProfile.user_id)
+        .correlate(StudentProfile).scalar_subquery()
+    )
+    return (
+        select(
+            StudentProfile.student_id,
+            StudentProfile.real_name,
+            Department.name,
+            StudentProfile.major,
+            StudentProfile.grade,
+            resume_count.label("resume_count"),
+            application_count.label("application_count"),
+        )
+        .outerjoin(Department, Department.id == StudentProfile.department_id)
+        .where(*student_scope_conditions(**scope))
+        .order_by(StudentProfile.id)
+    )
@@ -0,0 +1,125 @@
+"""
+游标分页工具模块
+按 (created_at, id) 做键集分页：翻到任意深度都只走索引范围扫描，不需要OFFSET跳过前面的行
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    """
+    把 (created_at, id) 编码为不透明的游标字符串
+
+    Args:
+        created_at: 行的创建时间
+        row_id: 行ID
+
+    Returns:
+        str: URL安全的base64游标
+    """
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    解码游标字符串
+
+    Args:
+        cursor: encode_cursor生成的游标
+
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+async def keyset_paginate(
+    db: AsyncSession,
+    query,
+    model: Any,
+    page_size: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    include_total: bool = False,
+) -> dict:
+    """
+    按创建时间倒序做游标分页
+
+    不传游标时返回最新一页；before返回比游标更早的一页（向上翻历史），
+    after返回比游标更新的一页（拉取新消息）。结果始终按时间倒序排列。
+
+    Args:
+        db: 数据库会话
+        query: 已带过滤条件的select(model)查询
+        model: 模型类，需要有created_at和id列
+        page_size: 每页数量
+        before: 返回早于该游标的记录
+        after: 返回晚于该游标的记录
+        include_total: 是否统计符合条件的总数（需要额外一次COUNT，默认不统计）
+
+    Returns:
+        dict: items、page_size、has_more、next_cursor（更早一页）、prev_cursor（更新一页）、total
+
+    Raises:
+        ValueError: 游标格式无效，或同时传入before和after
+    """
+    if before and after:
+        raise ValueError("before和after不能同时使用")
+
+    total = None
+    if include_total:
+        total_result = await db.execute(select(func.count()).select_from(query.subquery()))
+        total = total_result.scalar()
+
+    created_col, id_col = model.created_at, model.id
+    if after:
+        created_at, row_id = decode_cursor(after)
+        query = query.where(or_(
+            created_col > created_at,
+            and_(created_col == created_at, id_col > row_id)
+        )).order_by(created_col.asc(), id_col.asc())
+    else:
+        if before:
+            created_at, row_id = decode_cursor(before)
+            query = query.where(or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < row_id)
+            ))
+        query = query.order_by(created_col.desc(), id_col.desc())
+
+    # 多取一条判断是否还有下一页
+    result = await db.execute(query.limit(page_size + 1))
+    items = list(result.scalars().all())
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if after:
+        items.reverse()
+
+    if after:
+        # 向新方向翻页时，游标本身更早，因此更早的一页总是存在
+        older_exists = bool(items)
+    else:
+        older_exists = has_more
+
+    return {
+        "items": items,
+        "total": total,
+        "page_size": page_size,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(items[-1].created_at, items[-1].id) if items and older_exists else None,
+        "prev_cursor": encode_cursor(items[0].created_at, items[0].id) if items else after,
+    }
@@ -2,23 +2,37 @@
 搜索工具模块
 提供全文搜索功能
 """
-from sqlalchemy import text, func
+from sqlalchemy import text, func, select
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.core.logging import get_logger
+from app.models.job import Job
 
 logger = get_logger(__name__)
 
+# 全文搜索默认只统计到该数量，超过时返回封顶的总数（显示为“1000+”）
+FULLTEXT_TOTAL_CAP = 1000
+
 
 async def fulltext_search_jobs(
     db: AsyncSession,
     keyword: str,
     location: Optional[str] = None,
     limit: int = 20,
-    offset: int = 0
-) -> tuple[List, int]:
+    offset: int = 0,
+    exact_total: bool = False
+) -> tuple[List, int, bool]:
     """
-    使用MySQL全文搜索搜索职位
+    使用MySQL全文搜索搜索职位（一条语句完成相关度计算、计数和分页）
+    
+    - 内层只取 id 和相关度排序，最多取 max(FULLTEXT_TOTAL_CAP, offset + limit) + 1 行，
+      不读取描述、要求等大字段
+    - 中层用窗口函数 COUNT(*) OVER() 得到匹配数（达到上限即为封顶值）并分页
+    - 外层按分页结果的 id 关联 jobs 取完整的职位行
+    
+    需要jobs表有FULLTEXT索引：
+    CREATE FULLTEXT INDEX idx_jobs_fulltext ON jobs(title, description, requirements);
     
     Args:
         db: 数据库会话
@@ -26,69 +40,48 @@ async def fulltext_search_jobs(
         location: 工作地点（可选）
         limit: 返回数量限制
         offset: 偏移量
+        exact_total: 是否返回精确总数（不限制内层行数，匹配行较多时较慢）
         
     Returns:
-        tuple: (职位列表, 总数)
+        tuple: (职位列表, 总数, 总数是否封顶)；总数封顶时实际匹配数多于总数（可显示为“1000+”），
+            偏移量超出匹配数时返回空列表和0
     """
     try:
-        # 构建全文搜索查询
-        # 注意：需要确保jobs表有FULLTEXT索引
-        # CREATE FULLTEXT INDEX idx_fulltext ON jobs(title, description, requirements);
-        
-        base_query = """
-            SELECT *, 
-                   MATCH(title, description, requirements) AGAINST(:keyword IN NATURAL LANGUAGE MODE) as relevance
-            FROM jobs
-            WHERE MATCH(title, description, requirements) AGAINST(:keyword IN NATURAL LANGUAGE MODE)
-            AND status = 'PUBLISHED'
-        """
-        
-        params = {"keyword": keyword}
-        
+        relevance = match(Job.title, Job.description, Job.requirements, against=keyword)
+        ranked = select(Job.id, relevance.label("relevance")).where(relevance, Job.status == "PUBLISHED")
         if location:
-            base_query += " AND work_location LIKE :location"
-            params["location"] = f"%{location}%"
-        
-        # 获取总数 - 使用参数化查询，避免SQL注入
-        count_query = text("SELECT COUNT(*) as total FROM (" + base_query + ") as subquery")
-        count_result = await db.execute(count_query, params)
-        total = count_result.scalar() or 0
-        
-        # 获取分页结果 - 使用参数化查询，避免SQL注入
-        search_query = text(base_query + " ORDER BY relevance DESC LIMIT :limit OFFSET :offset")
-        params.update({"limit": limit, "offset": offset})
-        
-        result = await db.execute(search_query, params)
-        rows = result.fetchall()
-        
-        # 将原始行数据转换为Job对象
-        from sqlalchemy import select
-        from app.models.job import Job
-        
-        jobs = []
-        job_ids = []
-        for row in rows:
-            # 从行数据获取job_id
-            job_id = row._mapping.get('id')
-            if job_id:
-                job_ids.append(job_id)
+            ranked = ranked.where(Job.work_location.contains(location))
+        scan_limit = None if exact_total else max(FULLTEXT_TOTAL_CAP, offset + limit) + 1
+        ranked = ranked.order_by(relevance.desc()).limit(scan_limit).subquery("ranked")
+        
+        page = (
+            select(ranked.c.id, ranked.c.relevance, func.count().over().label("matched"))
+            .order_by(ranked.c.relevance.desc())
+            .limit(limit)
+            .offset(offset)
+            .subquery("page")
+        )
+        result = await db.execute(
+            select(Job, page.c.matched)
+            .join(page, page.c.id == Job.id)
+            .order_by(page.c.relevance.desc())
+        )
+        rows = result.all()
         
-        # 批量查询Job对象（更高效）
-        if job_ids:
-            jobs_result = await db.execute(
-                select(Job).where(Job.id.in_(job_ids))
-            )
-            jobs = list(jobs_result.scalars().all())
-            # 按照relevance排序（如果需要，可以在这里排序）
+        jobs = [job for job, _ in rows]
+        matched = rows[0].matched if rows else 0
+        capped = scan_limit is not None and matched >= scan_limit
+        total = scan_limit - 1 if capped else matched
         
-        logger.info(f"全文搜索职位: 关键词='{keyword}', 找到 {total} 条结果")
+        logger.info(f"全文搜索职位: 关键词='{keyword}', 找到 {total}{'+' if capped else ''} 条结果")
         
-        return jobs, total
+        return jobs, total, capped
         
     except Exception as e:
         logger.error(f"全文搜索失败，回退到普通搜索: {str(e)}")
         # 如果全文搜索失败（可能没有FULLTEXT索引），回退到普通搜索
-        return await fallback_search_jobs(db, keyword, location, limit, offset)
+        jobs, total = await fallback_search_jobs(db, keyword, location, limit, offset)
+        return jobs, total, False
 
 
 async def fallback_search_jobs(
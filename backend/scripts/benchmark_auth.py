@@ -0,0 +1,88 @@
+"""
+认证依赖性能基准测试
+对比每次验签（原实现）与已验证令牌缓存的单次开销
+
+测试项：
+    verify_token: 只验证令牌
+    get_current_user: 完整认证依赖（用户身份来自身份缓存，不访问数据库）
+
+用法：
+    python scripts/benchmark_auth.py
+    python scripts/benchmark_auth.py --iterations 50000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import auth
+from app.core import security
+from app.core.cache import set_cache
+from app.core.security import create_access_token
+from app.core.token_cache import verified_token_cache
+from app.services.principal_service import PRINCIPAL_CACHE_PREFIX, PRINCIPAL_CACHE_TTL, UserPrincipal
+
+BENCH_USER = {
+    "id": "benchmark-user",
+    "username": "benchmark_user",
+    "phone": None,
+    "email": None,
+    "user_type": "STUDENT",
+    "status": "ACTIVE",
+    "created_at": None,
+    "updated_at": None,
+    "principal": UserPrincipal(student_profile_id="benchmark-student").to_dict(),
+}
+
+
+def bench_verify_token(token: str, iterations: int, cached: bool) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    verify = security.verify_token if cached else security._decode_token
+    verified_token_cache.clear()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        assert verify(token) is not None
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def bench_get_current_user(token: str, iterations: int, cached: bool) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    original = auth.verify_token
+    auth.verify_token = security.verify_token if cached else security._decode_token
+    verified_token_cache.clear()
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            async with AsyncSession() as db:
+                assert await auth.get_current_user(token=token, db=db) is not None
+        return (time.perf_counter() - start) / iterations * 1e6
+    finally:
+        auth.verify_token = original
+
+
+async def main(args):
+    token = create_access_token(
+        {"sub": BENCH_USER["username"], "user_id": BENCH_USER["id"], "user_type": BENCH_USER["user_type"]}
+    )
+    await set_cache(f"{PRINCIPAL_CACHE_PREFIX}{BENCH_USER['username']}", BENCH_USER, expire=PRINCIPAL_CACHE_TTL)
+
+    print(f"{'测试项':<20}{'每次验签(us)':>14}{'令牌缓存(us)':>14}{'加速比':>8}")
+    before = bench_verify_token(token, args.iterations, cached=False)
+    after = bench_verify_token(token, args.iterations, cached=True)
+    print(f"{'verify_token':<20}{before:>14.2f}{after:>14.2f}{before / after:>8.1f}")
+
+    iterations = max(1, args.iterations // 10)
+    before = await bench_get_current_user(token, iterations, cached=False)
+    after = await bench_get_current_user(token, iterations, cached=True)
+    print(f"{'get_current_user':<20}{before:>14.2f}{after:>14.2f}{before / after:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="认证依赖性能基准测试")
+    parser.add_argument("--iterations", type=int, default=20000, help="verify_token调用次数（get_current_user为其1/10）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+聊天连接注册表负载测试
+模拟大量空闲WebSocket连接，测量建立连接、心跳更新、超时检测和断开连接的单次开销
+
+测试项：
+    connect: 建立连接（注册表、发送队列、心跳堆）
+    heartbeat: 心跳更新
+    expiry_sweep: 一次超时检测（无连接到期 / 全部连接到期）
+    disconnect: 断开连接
+
+用法：
+    python scripts/benchmark_chat_connections.py
+    python scripts/benchmark_chat_connections.py --connections 100000 --users 20000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.api.v1.chat import ConnectionManager
+from app.core.chat_backplane import LocalChatBackplane
+
+
+class IdleWebSocket:
+    """不收发任何消息的空闲连接"""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def report(name: str, seconds: float, count: int):
+    print(f"{name:<28}{count:>10}{seconds * 1000:>12.1f}{seconds / max(count, 1) * 1e6:>12.2f}")
+
+
+async def main(args):
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    sockets = [IdleWebSocket() for _ in range(args.connections)]
+    print(f"{'测试项':<28}{'次数':>10}{'总耗时(ms)':>12}{'单次(us)':>12}")
+
+    start = time.perf_counter()
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, f"user-{i % args.users}")
+    report("connect", time.perf_counter() - start, len(sockets))
+
+    start = time.perf_counter()
+    for websocket in sockets:
+        await manager.update_heartbeat(websocket)
+    report("heartbeat", time.perf_counter() - start, len(sockets))
+
+    # 所有连接都未到期：只查看堆顶
+    start = time.perf_counter()
+    expired = manager._pop_expired_connections(time.monotonic())
+    report("expiry_sweep(none due)", time.perf_counter() - start, 1)
+    assert not expired
+
+    # 所有连接都到期（模拟空闲超时）
+    start = time.perf_counter()
+    expired = manager._pop_expired_connections(time.monotonic() + manager.heartbeat_timeout + 1)
+    report("expiry_sweep(all due)", time.perf_counter() - start, len(expired))
+    assert len(expired) == len(sockets)
+
+    start = time.perf_counter()
+    for websocket in expired:
+        await manager._remove_connection(websocket, "心跳超时")
+    report("disconnect", time.perf_counter() - start, len(expired))
+    assert not manager.active_connections and not manager.connection_users
+
+    await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="聊天连接注册表负载测试")
+    parser.add_argument("--connections", type=int, default=50000, help="空闲连接数")
+    parser.add_argument("--users", type=int, default=25000, help="用户数（连接按用户轮流分配）")
+    asyncio.run(main(parser.parse_args()))
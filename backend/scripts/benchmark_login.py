@@ -0,0 +1,119 @@
+"""
+登录密码校验性能基准测试
+模拟登录高峰时的并发密码校验，输出每秒登录数和事件循环延迟
+
+对比两种方式：
+    sync: 在事件循环中直接调用bcrypt（原实现）
+    pool: 在密码哈希线程池中执行（verify_password_async）
+
+用法：
+    python scripts/benchmark_login.py
+    python scripts/benchmark_login.py --logins 200 --concurrency 50 --rounds 10
+    python scripts/benchmark_login.py --mode pool
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def monitor_loop_lag(interval: float, lags: list, stop: asyncio.Event):
+    """
+    周期性休眠并记录实际唤醒延迟（事件循环被阻塞的时长）
+
+    Args:
+        interval: 休眠间隔（秒）
+        lags: 记录延迟的列表
+        stop: 停止信号
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def run_mode(mode: str, password: str, hashed: str, total: int, concurrency: int) -> dict:
+    """
+    并发执行密码校验并统计结果
+
+    Args:
+        mode: sync 或 pool
+        password: 明文密码
+        hashed: 密码哈希
+        total: 登录总数
+        concurrency: 并发数
+
+    Returns:
+        dict: 统计结果
+    """
+    from app.core.security import verify_password, verify_password_async
+
+    remaining = total
+    lags = []
+    stop = asyncio.Event()
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if mode == "sync":
+                assert verify_password(password, hashed)
+                await asyncio.sleep(0)
+            else:
+                assert await verify_password_async(password, hashed)
+
+    monitor = asyncio.create_task(monitor_loop_lag(0.005, lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "logins": total,
+        "logins_per_sec": total / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "lag_p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+async def main(args):
+    from app.core.security import get_password_hash, shutdown_password_executor
+
+    password = "benchmark_password_123"
+    hashed = get_password_hash(password)
+    modes = ["sync", "pool"] if args.mode == "both" else [args.mode]
+
+    print(f"bcrypt成本: {args.rounds}  线程数: {args.workers}  并发: {args.concurrency}")
+    print(f"{'方式':<8}{'登录数':>8}{'登录/秒':>10}{'延迟p50(ms)':>14}{'延迟p99(ms)':>14}{'延迟max(ms)':>14}")
+    for mode in modes:
+        result = await run_mode(mode, password, hashed, args.logins, args.concurrency)
+        print(
+            f"{result['mode']:<8}{result['logins']:>8}{result['logins_per_sec']:>10.1f}"
+            f"{result['lag_p50_ms']:>14.2f}{result['lag_p99_ms']:>14.2f}{result['lag_max_ms']:>14.2f}"
+        )
+    shutdown_password_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="登录密码校验性能基准测试")
+    parser.add_argument("--mode", choices=["sync", "pool", "both"], default="both", help="测试方式")
+    parser.add_argument("--logins", type=int, default=100, help="登录总数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt成本因子")
+    parser.add_argument("--workers", type=int, default=4, help="密码哈希线程数")
+    args = parser.parse_args()
+
+    # 在导入配置前设置，使成本因子和线程数生效；放宽排队上限，避免压测请求被拒绝
+    os.environ["PASSWORD_HASH_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(max(args.concurrency, 64)))
+    asyncio.run(main(args))
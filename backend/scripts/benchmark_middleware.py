@@ -0,0 +1,118 @@
+"""
+中间件栈性能基准测试
+在进程内通过ASGI直接压测应用（不经过网络），输出每秒请求数和延迟分位数
+
+用法：
+    python scripts/benchmark_middleware.py
+    python scripts/benchmark_middleware.py --requests 5000 --concurrency 50
+    python scripts/benchmark_middleware.py --paths /health /api/v1/jobs --prime-jobs-cache
+
+没有数据库时可使用 --prime-jobs-cache 预先写入职位列表缓存，
+使 /api/v1/jobs 的请求只经过中间件栈和缓存路径。
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 放宽限流，避免压测请求被限流中间件拦截
+os.environ.setdefault("RATE_LIMIT_DEFAULT_PER_MINUTE", "100000000")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from app.main import app
+
+
+async def prime_jobs_cache():
+    """预先写入匿名用户第一页职位列表的缓存"""
+    from app.api.v1.jobs import _build_jobs_list_cache_key, JOBS_LIST_CACHE_TTL
+    from app.core.cache import set_cache
+
+    cache_key = _build_jobs_list_cache_key(
+        page=1, page_size=20, keyword=None, location=None, status=None,
+        job_type=None, education=None, scope="public",
+    )
+    await set_cache(
+        cache_key,
+        {"items": [], "total": 0, "page": 1, "page_size": 20},
+        expire=JOBS_LIST_CACHE_TTL
+    )
+
+
+async def benchmark_path(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> dict:
+    """
+    并发请求指定路径并统计结果
+
+    Args:
+        client: HTTP客户端
+        path: 请求路径
+        total: 总请求数
+        concurrency: 并发数
+
+    Returns:
+        dict: 统计结果
+    """
+    latencies = []
+    status_codes = {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+    # 预热
+    for _ in range(min(50, total)):
+        await client.get(path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "status_codes": status_codes,
+    }
+
+
+async def main(args):
+    # 关闭控制台日志输出（文件日志保留，仍计入中间件开销）
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.CRITICAL)
+
+    if args.prime_jobs_cache:
+        await prime_jobs_cache()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        print(f"{'路径':<24}{'请求数':>8}{'req/s':>12}{'p50(ms)':>10}{'p99(ms)':>10}  状态码")
+        for path in args.paths:
+            result = await benchmark_path(client, path, args.requests, args.concurrency)
+            print(
+                f"{result['path']:<24}{result['requests']:>8}{result['rps']:>12.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}  {result['status_codes']}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="中间件栈性能基准测试")
+    parser.add_argument("--paths", nargs="+", default=["/health", "/api/v1/jobs"], help="压测路径")
+    parser.add_argument("--requests", type=int, default=2000, help="每个路径的请求数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数")
+    parser.add_argument("--prime-jobs-cache", action="store_true", help="预先写入职位列表缓存（无数据库时使用）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""
+批量上传性能基准测试
+对比串行与并发上传同一批文件的总耗时
+
+存储使用本地文件系统，并在每次上传后模拟一次存储服务往返延迟（在线程中休眠，
+与同步SDK调用占用线程的方式一致），不需要OSS配置。
+
+用法：
+    python scripts/benchmark_upload.py
+    python scripts/benchmark_upload.py --files 20 --size-kb 512 --latency-ms 80 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.datastructures import Headers, UploadFile
+
+from app.api.v1 import upload
+from app.core.storage import LocalStorage
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+class SlowLocalStorage(LocalStorage):
+    """每次上传额外增加固定延迟的本地存储，模拟远程存储服务"""
+
+    def __init__(self, root: str, latency: float):
+        super().__init__(root, "/uploads")
+        self.latency = latency
+
+    async def upload_stream(self, chunks, file_path, content_type=None):
+        url = await super().upload_stream(chunks, file_path, content_type)
+        await asyncio.to_thread(time.sleep, self.latency)
+        return url
+
+
+def make_files(count: int, size: int):
+    payload = PNG_HEADER + b"\0" * (size - len(PNG_HEADER))
+    return [
+        UploadFile(io.BytesIO(payload), size=size, filename=f"file-{i}.png",
+                   headers=Headers({"content-type": "image/png"}))
+        for i in range(count)
+    ]
+
+
+async def bench(args, storage, concurrency: int) -> float:
+    """返回上传一批文件的总耗时（秒）"""
+    files = make_files(args.files, args.size_kb * 1024)
+    start = time.perf_counter()
+    result = await upload.upload_files_concurrently(files, "benchmark", upload.ALLOWED_IMAGE_TYPES, concurrency)
+    elapsed = time.perf_counter() - start
+    assert result["total"] == args.files, result["failed"]
+    return elapsed
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as root:
+        storage = SlowLocalStorage(root, args.latency_ms / 1000)
+        upload.get_storage = lambda: storage
+        print(f"{args.files}个文件，每个{args.size_kb}KB，模拟存储延迟{args.latency_ms}ms")
+        print(f"{'并发数':<10}{'总耗时(ms)':>12}{'加速比':>8}")
+        baseline = None
+        for concurrency in args.concurrency:
+            elapsed = await bench(args, storage, concurrency)
+            baseline = baseline or elapsed
+            print(f"{concurrency:<10}{elapsed * 1000:>12.1f}{baseline / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量上传性能基准测试")
+    parser.add_argument("--files", type=int, default=20, help="文件数")
+    parser.add_argument("--size-kb", type=int, default=256, help="每个文件大小（KB）")
+    parser.add_argument("--latency-ms", type=float, default=50, help="模拟的每次上传存储延迟（毫秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="对比的并发数，第一个作为基准")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,34 @@
+"""
+重算统计汇总表
+用明细表重新生成 statistics_rollups 的汇总行（执行迁移009后填充数据，或手动修正汇总偏差）
+
+    python scripts/rebuild_statistics_rollups.py            # 全部重算
+    python scripts/rebuild_statistics_rollups.py --days 30  # 只重算最近30天（不含当天）
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import AsyncSessionLocal
+from app.services.rollup_service import reconcile_rollups
+
+
+async def rebuild_statistics_rollups(days=None):
+    """重算统计汇总表"""
+    async with AsyncSessionLocal() as db:
+        try:
+            await reconcile_rollups(db, days)
+            print("✓ 统计汇总重算完成" if days is None else f"✓ 最近{days}天的统计汇总重算完成")
+        except Exception as e:
+            await db.rollback()
+            print(f"✗ 重算失败: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重算统计汇总表")
+    parser.add_argument("--days", type=int, default=None, help="只重算最近多少天（不含当天），默认全部重算")
+    asyncio.run(rebuild_statistics_rollups(parser.parse_args().days))
@@ -67,3 +67,41 @@ async def test_password_hashing():
     assert verify_password(password, hashed) == True
     assert verify_password("wrong_password", hashed) == False
 
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_in_thread_pool():
+    """测试在线程池中加密和验证密码"""
+    from app.core.security import get_password_hash_async, verify_password_async
+    
+    hashed = await get_password_hash_async("test_password_123")
+    assert await verify_password_async("test_password_123", hashed) == True
+    assert await verify_password_async("wrong_password", hashed) == False
+
+
+@pytest.mark.asyncio
+async def test_password_needs_rehash_when_cost_changes(monkeypatch):
+    """测试成本因子变更后需要重新哈希"""
+    from app.core.config import settings
+    from app.core.security import get_password_hash, password_needs_rehash
+    
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 4)
+    hashed = get_password_hash("test_password_123")
+    assert hashed.startswith("$2b$04$")
+    assert password_needs_rehash(hashed) == False
+    
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 5)
+    assert password_needs_rehash(hashed) == True
+    assert password_needs_rehash("not-a-bcrypt-hash") == False
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_rejects_when_queue_full(monkeypatch):
+    """测试哈希任务超过上限时拒绝新任务"""
+    from app.core import security
+    from app.core.config import settings
+    
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 1)
+    monkeypatch.setattr(security, "_password_pending", 1)
+    with pytest.raises(security.PasswordHashBusyError):
+        await security.verify_password_async("test_password_123", "$2b$04$invalid")
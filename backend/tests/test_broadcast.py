@@ -0,0 +1,74 @@
+"""
+测试系统消息群发
+验证受众查询条件，以及每批用多行INSERT写入会话和消息
+"""
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user_type import UserType
+from app.schemas.chat import SystemMessageBroadcast
+from app.services.broadcast_service import build_audience_query, _send_batch
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的语句并返回预设结果的会话（不连接数据库）"""
+
+    def __init__(self, results):
+        super().__init__()
+        self.statements = []
+        self.commits = 0
+        self._results = results
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return self._results.pop(0)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeResult:
+    def __init__(self, rows=None):
+        self._rows = rows or []
+
+    def all(self):
+        return self._rows
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_audience_query():
+    """测试受众条件：学校匹配学生和教师，班级只匹配学生"""
+    sql = _sql(build_audience_query(user_types=[UserType.STUDENT], school_id="school-1"))
+    assert "users.status = 'ACTIVE'" in sql
+    assert "users.user_type IN ('STUDENT')" in sql
+    assert "student_profiles.school_id = 'school-1'" in sql
+    assert "teacher_profiles.school_id = 'school-1'" in sql
+
+    sql = _sql(build_audience_query(class_id="class-1"))
+    assert "student_profiles.class_id = 'class-1'" in sql
+    assert "teacher_profiles" not in sql
+
+    with pytest.raises(ValueError):
+        SystemMessageBroadcast(content="通知")
+
+
+@pytest.mark.asyncio
+async def test_send_batch_uses_multi_row_inserts():
+    """测试一批接收者只创建缺少的会话，消息用一条多行INSERT写入"""
+    db = RecordingSession([FakeResult([("user-1", "session-1")]), None, None, None])
+
+    message_ids = await _send_batch(db, ["user-1", "user-2", "user-3"], "admin-1", "通知")
+
+    assert set(message_ids) == {"user-1", "user-2", "user-3"}
+    assert db.commits == 1
+    select_sessions, insert_sessions, insert_messages, update_sessions = db.statements
+    assert "INSERT INTO chat_sessions" in _sql(insert_sessions)
+    assert _sql(insert_sessions).count("user-") == 2
+    messages_sql = _sql(insert_messages)
+    assert messages_sql.startswith("INSERT INTO messages")
+    assert messages_sql.count("'SYSTEM'") == 3
+    assert "session-1" in messages_sql
+    assert _sql(update_sessions).startswith("UPDATE chat_sessions SET last_message_at")
@@ -0,0 +1,102 @@
+"""
+测试聊天消息投递通道
+验证进程内投递，以及通过Redis发布/订阅跨worker投递和共享在线状态
+"""
+import asyncio
+import json
+import pytest
+from app.api.v1.chat import ConnectionManager
+from app.core.cache import init_redis_pool, get_redis
+from app.core.chat_backplane import LocalChatBackplane, RedisChatBackplane
+
+
+class FakeWebSocket:
+    """记录已发送消息的WebSocket替身"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = True
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+@pytest.mark.asyncio
+async def test_local_backplane_delivery():
+    """测试进程内投递和在线状态"""
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "user-1")
+
+    await manager.send_personal_message({"type": "message", "content": "hi"}, "user-1")
+    await manager.send_personal_message({"type": "message", "content": "other"}, "user-2")
+    await manager.broadcast({"type": "notice"})
+    assert await _wait_for(lambda: len(websocket.sent) == 2)
+    assert websocket.sent == [{"type": "message", "content": "hi"}, {"type": "notice"}]
+    assert await manager.is_user_online("user-1")
+
+    await manager._remove_connection(websocket, "测试断开")
+    assert not await manager.is_user_online("user-1")
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_backplane_cross_worker_delivery():
+    """测试连接在worker A上时，worker B发送的消息也能送达"""
+    init_redis_pool()
+    if not await get_redis():
+        pytest.skip("Redis不可用，跳过测试")
+
+    worker_a = ConnectionManager(backplane=RedisChatBackplane())
+    worker_b = ConnectionManager(backplane=RedisChatBackplane())
+    await worker_b.start_backplane()
+    websocket = FakeWebSocket()
+    try:
+        await worker_a.connect(websocket, "backplane-test-user")
+        assert await worker_b.is_user_online("backplane-test-user")
+
+        await worker_b.send_personal_message({"type": "message", "content": "跨worker"}, "backplane-test-user")
+        assert await _wait_for(lambda: websocket.sent == [{"type": "message", "content": "跨worker"}])
+
+        await worker_a._remove_connection(websocket, "测试断开")
+        assert not await worker_b.is_user_online("backplane-test-user")
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_backplane_presence_expires_with_worker():
+    """测试worker异常退出（不再续期心跳）后，其上的用户在CHAT_PRESENCE_TTL秒后不再在线"""
+    init_redis_pool()
+    if not await get_redis():
+        pytest.skip("Redis不可用，跳过测试")
+
+    crashed = RedisChatBackplane()
+    observer = RedisChatBackplane()
+    await crashed.subscribe("presence-test-user")
+    try:
+        assert await observer.is_online("presence-test-user")
+
+        # 心跳时间早于CHAT_PRESENCE_TTL，视为已退出的worker
+        redis = await get_redis()
+        await redis.zadd("chat:presence:workers", {crashed.worker_id: 0})
+        assert not await observer.is_online("presence-test-user")
+    finally:
+        await crashed.stop()
+        await observer.stop()
@@ -0,0 +1,73 @@
+"""
+测试聊天连接注册表
+验证基于集合和反向索引的连接增删，以及心跳截止时间堆的超时判断
+"""
+import time
+import pytest
+from app.api.v1.chat import ConnectionManager
+from app.core.chat_backplane import LocalChatBackplane
+
+
+class FakeWebSocket:
+    """只记录关闭状态的WebSocket替身"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_registry_add_and_remove():
+    """测试同一用户多连接的注册和移除，重复移除不出错"""
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    first, second = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(first, "user-1")
+    await manager.connect(second, "user-1")
+    assert manager.active_connections["user-1"] == {first, second}
+    assert manager.connection_users[first] == "user-1"
+
+    await manager._remove_connection(first, "测试断开")
+    await manager._remove_connection(first, "测试断开")
+    assert first.closed
+    assert manager.active_connections["user-1"] == {second}
+    assert first not in manager.connection_users
+    assert await manager.is_user_online("user-1")
+
+    await manager._remove_connection(second, "测试断开")
+    assert "user-1" not in manager.active_connections
+    assert not manager.connection_heartbeat
+    assert not await manager.is_user_online("user-1")
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_expiry_uses_last_ping():
+    """测试只有超过超时时间未心跳的连接被判定超时，有心跳的连接按新截止时间重新入堆"""
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    idle, active, removed = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for websocket in (idle, active, removed):
+        await manager.connect(websocket, "user-1")
+    await manager._remove_connection(removed, "测试断开")
+
+    now = time.monotonic()
+    assert manager._pop_expired_connections(now) == []
+
+    # 模拟30秒后活跃连接发送了心跳
+    manager.connection_heartbeat[active] = now + 30
+    expired = manager._pop_expired_connections(now + manager.heartbeat_timeout + 1)
+    assert expired == [idle]
+    # 活跃连接重新入堆，已移除连接的堆项被丢弃
+    assert [entry[2] for entry in manager._heartbeat_heap] == [active]
+
+    # 已移除的连接不再记录心跳
+    await manager.update_heartbeat(removed)
+    assert removed not in manager.connection_heartbeat
+    await manager.close()
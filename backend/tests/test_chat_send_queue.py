@@ -0,0 +1,107 @@
+"""
+测试WebSocket连接发送队列
+验证慢客户端不阻塞其他连接、队列满时的处理策略以及发送指标
+"""
+import asyncio
+import json
+import pytest
+from app.api.v1 import chat
+from app.api.v1.chat import ConnectionManager
+from app.core.chat_backplane import LocalChatBackplane
+from app.core.config import settings
+
+
+class SlowWebSocket:
+    """发送前等待放行的WebSocket替身"""
+
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed = False
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.release.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = True
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_block_others(monkeypatch):
+    """测试广播只序列化一次，慢客户端不影响其他连接"""
+    serialized = []
+    original = chat._serialize_message
+    monkeypatch.setattr(chat, "_serialize_message", lambda message: serialized.append(message) or original(message))
+
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    slow, fast = SlowWebSocket(blocked=True), SlowWebSocket()
+    await manager.connect(slow, "slow-user")
+    await manager.connect(fast, "fast-user")
+
+    await manager.broadcast({"type": "notice"})
+    await _settle()
+    assert fast.sent == [{"type": "notice"}]
+    assert slow.sent == []
+    assert len(serialized) == 1
+
+    metrics = manager.get_metrics()
+    assert metrics["connections"] == 2
+    assert metrics["total_sent"] == 1
+
+    slow.release.set()
+    await _settle()
+    assert slow.sent == [{"type": "notice"}]
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drop_policy(monkeypatch):
+    """测试drop策略：队列满时丢弃新消息并计数"""
+    monkeypatch.setattr(settings, "CHAT_SEND_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "CHAT_SLOW_CONSUMER_POLICY", "drop")
+
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    websocket = SlowWebSocket(blocked=True)
+    await manager.connect(websocket, "user-1")
+
+    for i in range(5):
+        await manager.send_personal_message({"seq": i}, "user-1")
+    await _settle()
+
+    stats = manager.get_metrics()["top_connections"][0]
+    # 连续入队时队列只容纳2条，其余3条丢弃；写协程随后取出1条阻塞在发送上
+    assert stats["dropped"] == 3
+    assert stats["queue_depth"] == 1
+    assert not websocket.closed
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_disconnect_policy(monkeypatch):
+    """测试disconnect策略：队列满时断开慢客户端"""
+    monkeypatch.setattr(settings, "CHAT_SEND_QUEUE_SIZE", 1)
+    monkeypatch.setattr(settings, "CHAT_SLOW_CONSUMER_POLICY", "disconnect")
+
+    manager = ConnectionManager(backplane=LocalChatBackplane())
+    websocket = SlowWebSocket(blocked=True)
+    await manager.connect(websocket, "user-1")
+
+    for i in range(3):
+        await manager.send_personal_message({"seq": i}, "user-1")
+    await _settle()
+
+    assert websocket.closed
+    assert not await manager.is_user_online("user-1")
+    assert manager.get_metrics()["connections"] == 0
+    await manager.close()
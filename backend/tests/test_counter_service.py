@@ -0,0 +1,128 @@
+"""
+测试计数器延迟写入
+验证增量缓冲、按增量分组的批量UPDATE，以及写入失败时增量放回缓冲区
+"""
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.job import Job, Resume
+from app.services import counter_service
+from app.services.counter_service import WriteBehindCounter, flush_counters
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的语句的会话（不连接数据库），fail=True时执行语句抛出异常，fail_rollback=True时回滚也抛出异常"""
+
+    def __init__(self, fail=False, fail_rollback=False):
+        super().__init__()
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail = fail
+        self.fail_rollback = fail_rollback
+
+    async def execute(self, statement, *args, **kwargs):
+        if self.fail:
+            raise RuntimeError("数据库不可用")
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+        if self.fail_rollback:
+            raise RuntimeError("连接已断开")
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    """只包含本测试创建的计数器"""
+    monkeypatch.setattr(counter_service, "_counters", [])
+    return WriteBehindCounter(Resume, "download_count"), WriteBehindCounter(Job, "view_count")
+
+
+def test_increment_and_current(counters):
+    """测试读取计数时加上尚未写入的增量"""
+    downloads, _ = counters
+    downloads.increment("r1")
+    downloads.increment("r1")
+    downloads.increment("r2", 3)
+    assert downloads.current("r1", 10) == 12
+    assert downloads.current("r2", None) == 3
+    assert downloads.current("r3", 5) == 5
+
+
+def test_build_updates_groups_by_amount(counters):
+    """测试增量相同的行合并为一条UPDATE，且不修改updated_at"""
+    downloads, _ = counters
+    statements = downloads.build_updates({"r2": 1, "r1": 1, "r3": 4})
+    assert [_sql(s) for s in statements] == [
+        "UPDATE resumes SET download_count=(resumes.download_count + 1), updated_at=resumes.updated_at WHERE resumes.id IN ('r1', 'r2')",
+        "UPDATE resumes SET download_count=(resumes.download_count + 4), updated_at=resumes.updated_at WHERE resumes.id IN ('r3')",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_each_counter_in_own_transaction(counters):
+    """测试每个计数器各自一个事务写入，并清空缓冲区"""
+    downloads, views = counters
+    downloads.increment("r1")
+    views.increment("j1")
+    views.increment("j2")
+    db = RecordingSession()
+
+    assert await flush_counters(db) == 3
+    assert db.commits == 2
+    assert [_sql(s).split(" SET")[0] for s in db.statements] == ["UPDATE resumes", "UPDATE jobs"]
+    assert len(downloads) == 0 and len(views) == 0
+    assert await flush_counters(db) == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_failure_restores_pending(counters):
+    """测试写入失败时增量放回缓冲区，期间新增的计数不丢失"""
+    downloads, _ = counters
+    downloads.increment("r1", 2)
+    db = RecordingSession(fail=True)
+
+    assert await flush_counters(db) == 0
+    assert db.rollbacks == 1
+    downloads.increment("r1")
+    assert downloads.pending("r1") == 3
+
+
+@pytest.mark.asyncio
+async def test_flush_keeps_pending_when_rollback_fails(counters):
+    """测试回滚也失败（连接断开）时增量仍放回缓冲区，且异常不向外抛出"""
+    downloads, _ = counters
+    downloads.increment("r1", 2)
+    db = RecordingSession(fail=True, fail_rollback=True)
+
+    assert await flush_counters(db) == 0
+    assert db.rollbacks == 1
+    assert downloads.pending("r1") == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_failure_isolated_per_counter(counters):
+    """测试一个计数器写入失败时只放回该计数器的增量，其他计数器照常写入"""
+    class BrokenCounter(WriteBehindCounter):
+        def build_updates(self, pending):
+            raise RuntimeError("表不存在")
+
+    downloads, views = counters
+    broken = BrokenCounter(Resume, "view_count")
+    downloads.increment("r1")
+    broken.increment("r2")
+    views.increment("j1")
+    db = RecordingSession()
+
+    assert await flush_counters(db) == 2
+    assert db.commits == 2 and db.rollbacks == 1
+    assert len(downloads) == 0 and len(views) == 0
+    assert broken.pending("r2") == 1
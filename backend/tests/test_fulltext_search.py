@@ -0,0 +1,73 @@
+"""
+测试职位全文搜索
+验证相关度、计数和分页在一条语句中完成，默认总数封顶，按需返回精确总数
+"""
+from collections import namedtuple
+
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.job import Job
+from app.utils.search import FULLTEXT_TOTAL_CAP, fulltext_search_jobs
+
+
+# 结果行：(职位, 匹配数)
+FakeRow = namedtuple("FakeRow", ["Job", "matched"])
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的语句，返回一页预设结果的会话（不连接数据库）"""
+
+    def __init__(self, matched: int, page_size: int):
+        super().__init__()
+        self.statements = []
+        self._rows = [FakeRow(Job(id=f"job-{n}"), matched) for n in range(min(matched, page_size))]
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return FakeResult(self._rows)
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_fulltext_search_single_statement():
+    """测试一条语句完成搜索：内层只取id和相关度，窗口函数计数，外层关联取职位行"""
+    db = RecordingSession(matched=35, page_size=20)
+
+    jobs, total, capped = await fulltext_search_jobs(db, "java", "上海", limit=20, offset=20)
+
+    assert [job.id for job in jobs][:2] == ["job-0", "job-1"]
+    assert (total, capped) == (35, False)
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    assert "(SELECT jobs.id AS id, MATCH (jobs.title, jobs.description, jobs.requirements) AGAINST ('java') AS relevance" in sql
+    assert f"LIMIT {FULLTEXT_TOTAL_CAP + 1}" in sql
+    assert "count(*) OVER () AS matched" in sql
+    assert "LIMIT 20, 20" in sql
+    assert "jobs.work_location LIKE concat('%%', '上海', '%%')" in sql
+    assert "ON page.id = jobs.id ORDER BY page.relevance DESC" in sql
+    assert "SELECT *" not in sql
+
+
+@pytest.mark.asyncio
+async def test_fulltext_search_total_capped():
+    """测试匹配数超过上限时返回封顶的总数，请求精确总数时内层不限制行数"""
+    db = RecordingSession(matched=FULLTEXT_TOTAL_CAP + 1, page_size=20)
+    _, total, capped = await fulltext_search_jobs(db, "java", limit=20)
+    assert (total, capped) == (FULLTEXT_TOTAL_CAP, True)
+
+    db = RecordingSession(matched=5000, page_size=20)
+    _, total, capped = await fulltext_search_jobs(db, "java", limit=20, exact_total=True)
+    assert (total, capped) == (5000, False)
+    assert f"LIMIT {FULLTEXT_TOTAL_CAP + 1}" not in _sql(db.statements[0])
@@ -0,0 +1,90 @@
+"""
+测试请求级身份上下文
+验证同一请求内档案只加载一次，以及权限检查复用身份缓存中的档案信息
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.models.user import User
+from app.models.profile import EnterpriseProfile
+from app.models.user_type import UserType
+from app.core.permissions import check_permission, get_user_modules, ENTERPRISE_SUB_ACCOUNT_RESTRICTIONS
+from app.services.identity_context import get_identity_context
+from app.services.enterprise_service import get_enterprise_ids_for_query
+from app.services.principal_service import UserPrincipal
+
+
+class CountingSession(AsyncSession):
+    """记录execute调用次数的会话（不连接数据库）"""
+
+    def __init__(self, results=None):
+        super().__init__()
+        self.executed = 0
+        self._results = results or []
+
+    async def execute(self, *args, **kwargs):
+        self.executed += 1
+        return self._results.pop(0)
+
+
+class FakeScalarResult:
+    def __init__(self, values):
+        self._values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._values
+
+
+def _enterprise_user(principal: UserPrincipal) -> User:
+    user = User(id="user-1", username="enterprise_user", user_type=UserType.ENTERPRISE, status="ACTIVE")
+    user.principal = principal
+    return user
+
+
+async def _attach_profile(db: AsyncSession, profile):
+    """把档案以已持久化状态放入会话标识映射（不查询数据库）"""
+    make_transient_to_detached(profile)
+    return await db.merge(profile, load=False)
+
+
+@pytest.mark.asyncio
+async def test_identity_context_is_request_scoped():
+    """测试同一会话、同一用户只创建一个上下文"""
+    user = _enterprise_user(UserPrincipal())
+    async with CountingSession() as db:
+        assert get_identity_context(db, user) is get_identity_context(db, user)
+    async with CountingSession() as other_db:
+        assert get_identity_context(other_db, user) is not get_identity_context(db, user)
+
+
+@pytest.mark.asyncio
+async def test_sub_account_checks_use_principal_without_queries():
+    """测试子账号权限检查直接使用身份缓存中的主账号状态"""
+    user = _enterprise_user(UserPrincipal(enterprise_profile_id="e-sub", is_main_account=False))
+    restricted = next(iter(ENTERPRISE_SUB_ACCOUNT_RESTRICTIONS))
+
+    async with CountingSession() as db:
+        assert await check_permission(user, restricted, db) is False
+        assert await check_permission(user, "job:read", db) is True
+        await get_user_modules(user, db)
+        assert db.executed == 0
+
+
+@pytest.mark.asyncio
+async def test_enterprise_ids_loaded_once_per_request():
+    """测试主账号的子账号ID在同一请求内只查询一次"""
+    user = _enterprise_user(UserPrincipal(enterprise_profile_id="e-main", is_main_account=True))
+
+    async with CountingSession([FakeScalarResult(["e-sub-1", "e-sub-2"])]) as db:
+        enterprise = await _attach_profile(
+            db, EnterpriseProfile(id="e-main", user_id="user-1", company_name="测试企业", is_main_account=True)
+        )
+        identity = get_identity_context(db, user)
+
+        assert await identity.get_enterprise_profile() is enterprise
+        assert await identity.get_enterprise_ids() == ["e-main", "e-sub-1", "e-sub-2"]
+        assert await get_enterprise_ids_for_query(db, enterprise) == ["e-main", "e-sub-1", "e-sub-2"]
+        assert db.executed == 1
@@ -0,0 +1,101 @@
+"""
+测试游标分页
+验证游标编解码、翻页条件和排序（不使用OFFSET），以及默认不统计总数
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.chat import Message
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_paginate
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的SQL并返回预设结果的会话（不连接数据库）"""
+
+    def __init__(self, results):
+        super().__init__()
+        self.statements = []
+        self._results = results
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement.compile(
+            dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}
+        )))
+        return self._results.pop(0)
+
+
+class FakeScalarResult:
+    def __init__(self, values):
+        self._values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._values
+
+    def scalar(self):
+        return self._values[0]
+
+
+def _messages(count, start=datetime(2026, 1, 1, 12, 0, 0)):
+    """按时间倒序生成消息"""
+    return [
+        Message(id=f"msg-{i:03d}", session_id="s-1", created_at=start - timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+
+def test_cursor_round_trip():
+    """测试游标编解码，无效游标报错"""
+    created_at = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    assert decode_cursor(encode_cursor(created_at, "msg-1")) == (created_at, "msg-1")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_before_cursor_uses_keyset_without_count():
+    """测试向前翻页使用键集条件且不执行COUNT"""
+    rows = _messages(4)
+    db = RecordingSession([FakeScalarResult(rows)])
+    cursor = encode_cursor(datetime(2026, 1, 1, 13, 0, 0), "msg-x")
+
+    page = await keyset_paginate(db, select(Message).where(Message.session_id == "s-1"), Message, 3, before=cursor)
+
+    assert len(db.statements) == 1
+    sql = db.statements[0]
+    assert "OFFSET" not in sql
+    assert "messages.created_at < '2026-01-01 13:00:00'" in sql
+    assert "ORDER BY messages.created_at DESC, messages.id DESC" in sql
+    assert "LIMIT 4" in sql
+    assert page["items"] == rows[:3]
+    assert page["has_more"] is True
+    assert page["total"] is None
+    assert decode_cursor(page["next_cursor"]) == (rows[2].created_at, rows[2].id)
+    assert decode_cursor(page["prev_cursor"]) == (rows[0].created_at, rows[0].id)
+
+
+@pytest.mark.asyncio
+async def test_after_cursor_returns_newest_first():
+    """测试拉取新消息时按时间正序查询、倒序返回，并可选统计总数"""
+    rows = _messages(2)
+    db = RecordingSession([FakeScalarResult([7]), FakeScalarResult(list(reversed(rows)))])
+    cursor = encode_cursor(datetime(2026, 1, 1, 11, 0, 0), "msg-x")
+
+    page = await keyset_paginate(
+        db, select(Message).where(Message.session_id == "s-1"), Message, 3,
+        after=cursor, include_total=True
+    )
+
+    assert "count(*)" in db.statements[0]
+    assert "ORDER BY messages.created_at ASC, messages.id ASC" in db.statements[1]
+    assert page["total"] == 7
+    assert page["items"] == rows
+    assert page["has_more"] is False
+    assert page["next_cursor"] is not None
+
+    with pytest.raises(ValueError):
+        await keyset_paginate(db, select(Message), Message, 3, before=cursor, after=cursor)
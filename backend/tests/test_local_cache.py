@@ -0,0 +1,190 @@
+"""
+测试进程内一级缓存
+验证LRU淘汰、TTL过期、旧值返回和Redis不可用时的降级
+"""
+import asyncio
+import pytest
+from app.core import cache
+from app.core.cache import (
+    LocalCache, get_local_ttl, get_or_load_snapshot, get_or_set_cache, set_cache, get_cache, delete_cache
+)
+
+
+def test_local_cache_lru_eviction_by_entries():
+    """测试超过条目数限制时淘汰最久未使用的条目"""
+    local = LocalCache(max_entries=2, max_bytes=1024 * 1024)
+    local.set("a", "1", ttl=60)
+    local.set("b", "2", ttl=60)
+    
+    # 访问a，使b成为最久未使用
+    assert local.get("a")[0] == "1"
+    local.set("c", "3", ttl=60)
+    
+    assert local.get("b")[0] is None
+    assert local.get("a")[0] == "1"
+    assert local.get("c")[0] == "3"
+
+
+def test_local_cache_eviction_by_bytes():
+    """测试超过字节数限制时淘汰条目"""
+    value = "x" * 1000
+    local = LocalCache(max_entries=100, max_bytes=2500)
+    local.set("a", value, ttl=60)
+    local.set("b", value, ttl=60)
+    local.set("c", value, ttl=60)
+    
+    assert local.get("a")[0] is None
+    assert local.stats()["bytes"] <= 2500
+    
+    # 单个超过容量的值不缓存
+    local.set("huge", "x" * 5000, ttl=60)
+    assert local.get("huge")[0] is None
+
+
+def test_local_cache_stale_window(monkeypatch):
+    """测试过期后stale窗口内可读取旧值"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    
+    local = LocalCache(max_entries=10, max_bytes=1024 * 1024)
+    local.set("k", "v", ttl=10, stale_ttl=5)
+    
+    now[0] += 12
+    assert local.get("k") == (None, False)
+    assert local.get("k", allow_stale=True) == ("v", True)
+    
+    now[0] += 5
+    assert local.get("k", allow_stale=True) == (None, False)
+    assert local.stats()["entries"] == 0
+
+
+def test_local_cache_tag_invalidation():
+    """测试按标签失效一级缓存"""
+    local = LocalCache(max_entries=10, max_bytes=1024 * 1024)
+    local.set("a", "1", ttl=60)
+    local.set("b", "2", ttl=60)
+    local.tag("a", ["t"])
+    
+    local.invalidate_tag("t")
+    assert local.get("a")[0] is None
+    assert local.get("b")[0] == "2"
+
+
+def test_local_cache_tags_pruned_with_entries():
+    """测试条目被淘汰或删除后从标签中移除，未保存的键不登记标签"""
+    local = LocalCache(max_entries=1, max_bytes=1024 * 1024)
+    local.set("a", "1", ttl=60)
+    local.tag("a", ["t1", "t2"])
+    local.set("b", "2", ttl=60)  # 淘汰a
+    assert local._tags == {} and local._key_tags == {}
+
+    local.tag("b", ["t1"])
+    local.delete("b")
+    assert local._tags == {} and local._key_tags == {}
+
+    local.tag("missing", ["t1"])
+    assert local._tags == {} and local._key_tags == {}
+
+
+def test_local_ttl_by_namespace():
+    """测试按命名空间前缀确定一级缓存TTL"""
+    assert get_local_ttl("jobs:list:abc", 300) == cache.LOCAL_CACHE_NAMESPACE_TTLS["jobs:list:"]
+    assert get_local_ttl("jobs:list:abc", 5) == 5
+    assert get_local_ttl("sms_code:13800000000", 300) == 0
+    assert get_local_ttl("auth:principal:student1", 120) == 0
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    """模拟Redis不可用"""
+    async def no_redis():
+        return None
+    monkeypatch.setattr(cache, "get_redis", no_redis)
+    cache.local_cache.clear()
+    yield
+    cache.local_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_cache_degrades_to_local_when_redis_down(redis_down):
+    """测试Redis不可用时缓存仍然生效"""
+    await set_cache("test_local_degrade", {"a": 1}, expire=60)
+    assert await get_cache("test_local_degrade") == {"a": 1}
+    
+    await delete_cache("test_local_degrade")
+    assert await get_cache("test_local_degrade") is None
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_cache_serves_stale_while_refreshing(redis_down, monkeypatch):
+    """测试返回旧值并在后台刷新"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        return len(calls)
+    
+    assert await get_or_set_cache("test_swr", loader, expire=10, stale_ttl=60) == 1
+    assert await get_or_set_cache("test_swr", loader, expire=10, stale_ttl=60) == 1
+    assert len(calls) == 1
+    
+    # 过期后先返回旧值，后台刷新
+    now[0] += 11
+    assert await get_or_set_cache("test_swr", loader, expire=10, stale_ttl=60) == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert len(calls) == 2
+    assert await get_or_set_cache("test_swr", loader, expire=10, stale_ttl=60) == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_single_flight(redis_down):
+    """测试并发未命中只调用一次loader"""
+    calls = []
+    release = asyncio.Event()
+    
+    async def loader():
+        calls.append(1)
+        await release.wait()
+        return {"total": len(calls)}
+    
+    requests = [asyncio.create_task(get_or_load_snapshot("statistics:test_flight", loader, ttl=60)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*requests)
+    
+    assert len(calls) == 1
+    assert all(value == {"total": 1} for value, _ in results)
+    assert results[0][1]["ttl_seconds"] == 60
+
+
+@pytest.mark.asyncio
+async def test_snapshot_refresh_ahead_and_ttl(redis_down, monkeypatch):
+    """测试过期前返回当前快照并后台刷新，超过ttl后不再返回旧快照"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        return len(calls)
+    
+    assert (await get_or_load_snapshot("statistics:test_ahead", loader, ttl=60, refresh_ahead=15))[0] == 1
+    
+    # 进入提前刷新窗口：返回当前快照并报告年龄，后台刷新
+    now[0] += 50
+    value, freshness = await get_or_load_snapshot("statistics:test_ahead", loader, ttl=60, refresh_ahead=15)
+    assert value == 1
+    assert freshness["age_seconds"] == 50
+    assert freshness["refreshing"] is True
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    value, freshness = await get_or_load_snapshot("statistics:test_ahead", loader, ttl=60, refresh_ahead=15)
+    assert (value, freshness["age_seconds"], freshness["refreshing"]) == (2, 0, False)
+    
+    # 没有访问直到超过ttl：等待重新加载，不返回旧快照
+    now[0] += 61
+    value, freshness = await get_or_load_snapshot("statistics:test_ahead", loader, ttl=60, refresh_ahead=15)
+    assert (value, freshness["age_seconds"]) == (3, 0)
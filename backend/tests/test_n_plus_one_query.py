@@ -6,7 +6,7 @@ import pytest
 import asyncio
 from sqlalchemy import select, event
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
+from app.core.database import get_db, engine
 from app.models.chat import ChatSession
 from app.models.user import User
 from app.models.school import School
@@ -18,7 +18,7 @@ logger = get_logger(__name__)
 query_count = 0
 
 
-@event.listens_for(AsyncSession, "before_cursor_execute")
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
 def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     """监听SQL执行，统计查询次数"""
     global query_count
@@ -103,6 +103,31 @@ async def test_query_optimization_comparison():
         pytest.skip("无法进行对比测试（可能没有数据）")
 
 
+@pytest.mark.asyncio
+async def test_jobs_list_enterprise_batch_loading():
+    """测试职位列表的企业信息批量加载：一页职位只产生一次企业查询"""
+    from app.api.v1.jobs import _build_job_responses
+    from app.models.job import Job
+    
+    global query_count
+    
+    async for db in get_db():
+        result = await db.execute(
+            select(Job).where(Job.status == "PUBLISHED").limit(100)
+        )
+        jobs = result.scalars().all()
+        if not jobs:
+            pytest.skip("没有已发布的职位数据")
+        
+        query_count = 0
+        job_responses = await _build_job_responses(db, jobs)
+        
+        logger.info(f"职位列表企业信息查询次数: {query_count}（职位数: {len(jobs)}）")
+        assert len(job_responses) == len(jobs)
+        assert query_count == 1, "企业信息应通过一次IN查询批量加载"
+        break
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,76 @@
+"""
+测试已认证用户身份缓存
+验证缓存数据还原、缓存命中不查询数据库以及失效
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.models.user_type import UserType
+from app.services import principal_service
+from app.services.principal_service import (
+    UserPrincipal, get_user_by_subject, invalidate_user_principal, PRINCIPAL_CACHE_PREFIX
+)
+
+
+CACHED_USER = {
+    "id": "u-1",
+    "username": "cached_user",
+    "phone": "13800000000",
+    "email": None,
+    "user_type": "ENTERPRISE",
+    "status": "ACTIVE",
+    "created_at": "2024-01-01T00:00:00",
+    "updated_at": None,
+    "principal": UserPrincipal(enterprise_profile_id="e-1", is_main_account=True).to_dict(),
+}
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    """模拟Redis不可用，只使用进程内缓存"""
+    async def no_redis():
+        return None
+    monkeypatch.setattr(cache, "get_redis", no_redis)
+    cache.local_cache.clear()
+    yield
+    cache.local_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_cached_user_restored_without_query(redis_down, monkeypatch):
+    """测试缓存命中时直接还原用户，不查询数据库"""
+    async def fail_query(db, subject):
+        raise AssertionError("缓存命中时不应查询数据库")
+    monkeypatch.setattr(principal_service, "_query_user", fail_query)
+
+    await cache.set_cache(f"{PRINCIPAL_CACHE_PREFIX}cached_user", CACHED_USER, expire=60)
+
+    async with AsyncSession() as db:
+        user = await get_user_by_subject(db, "cached_user")
+
+        assert user.id == "u-1"
+        assert user.user_type == UserType.ENTERPRISE
+        assert user.created_at.year == 2024
+        assert user.principal.enterprise_profile_id == "e-1"
+        assert user.principal.is_main_account is True
+        # 以已持久化状态关联到会话，修改可写回数据库
+        assert user in db
+        assert user not in db.new
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_principal(redis_down, monkeypatch):
+    """测试失效后重新查询数据库"""
+    queried = []
+
+    async def fake_query(db, subject):
+        queried.append(subject)
+        return None
+    monkeypatch.setattr(principal_service, "_query_user", fake_query)
+
+    await cache.set_cache(f"{PRINCIPAL_CACHE_PREFIX}cached_user", CACHED_USER, expire=60)
+    await invalidate_user_principal("cached_user")
+
+    async with AsyncSession() as db:
+        assert await get_user_by_subject(db, "cached_user") is None
+    assert queried == ["cached_user"]
@@ -4,9 +4,13 @@
 """
 import pytest
 import asyncio
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core import middleware
 from app.core.cache import init_redis_pool
+from app.core.middleware import RateLimitMiddleware, RateLimitRule, MemoryTokenBuckets
+from app.core.security import create_access_token
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -53,6 +57,91 @@ def test_rate_limit_root_endpoint_excluded():
         assert response.status_code == 200, "根端点不应被限流"
 
 
+def _build_limited_client(monkeypatch, requests_per_minute=3, rules=None):
+    """构建使用内存限流（模拟Redis不可用）的测试客户端"""
+    async def no_redis():
+        return None
+    monkeypatch.setattr(middleware, "get_redis", no_redis)
+    
+    test_app = FastAPI()
+    test_app.add_middleware(
+        RateLimitMiddleware,
+        requests_per_minute=requests_per_minute,
+        rules=rules or [RateLimitRule("auth", ("/api/v1/auth",), 1)]
+    )
+    
+    @test_app.get("/api/v1/jobs")
+    async def jobs():
+        return {"ok": True}
+    
+    @test_app.post("/api/v1/auth/login")
+    async def login():
+        return {"ok": True}
+    
+    return TestClient(test_app)
+
+
+def test_rate_limit_memory_fallback_returns_429(monkeypatch):
+    """测试Redis不可用时内存限流生效，超限返回429和Retry-After"""
+    test_client = _build_limited_client(monkeypatch)
+    
+    statuses = [test_client.get("/api/v1/jobs").status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    
+    response = test_client.get("/api/v1/jobs")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["error_code"] == 4290
+
+
+def test_rate_limit_route_groups_have_separate_quotas(monkeypatch):
+    """测试不同路由组使用各自的配额"""
+    test_client = _build_limited_client(monkeypatch)
+    
+    assert test_client.post("/api/v1/auth/login").status_code == 200
+    assert test_client.post("/api/v1/auth/login").status_code == 429
+    # auth组耗尽不影响默认组
+    assert test_client.get("/api/v1/jobs").status_code == 200
+
+
+def test_rate_limit_keyed_by_authenticated_user(monkeypatch):
+    """测试已登录用户按用户ID限流，不与同IP的其他用户共享配额"""
+    test_client = _build_limited_client(monkeypatch, requests_per_minute=1)
+    token_a = create_access_token({"sub": "user_a", "user_id": "a"})
+    token_b = create_access_token({"sub": "user_b", "user_id": "b"})
+    
+    assert test_client.get("/api/v1/jobs", headers={"Authorization": f"Bearer {token_a}"}).status_code == 200
+    assert test_client.get("/api/v1/jobs", headers={"Authorization": f"Bearer {token_a}"}).status_code == 429
+    assert test_client.get("/api/v1/jobs", headers={"Authorization": f"Bearer {token_b}"}).status_code == 200
+    assert test_client.get("/api/v1/jobs").status_code == 200
+
+
+def test_memory_token_buckets_are_bounded():
+    """测试内存令牌桶数量有上限，淘汰最久未访问的键"""
+    buckets = MemoryTokenBuckets(max_keys=100)
+    rule = RateLimitRule("default", (), 60)
+    for i in range(1000):
+        buckets.acquire(f"ip:{i}", rule)
+    assert len(buckets) == 100
+
+
+def test_memory_token_bucket_refills(monkeypatch):
+    """测试令牌按速率补充"""
+    now = [1000.0]
+    monkeypatch.setattr(middleware.time, "monotonic", lambda: now[0])
+    buckets = MemoryTokenBuckets()
+    rule = RateLimitRule("default", (), 60)  # 每秒补充1个令牌
+    
+    for _ in range(60):
+        assert buckets.acquire("k", rule)[0]
+    allowed, retry_after = buckets.acquire("k", rule)
+    assert not allowed
+    assert retry_after == 1
+    
+    now[0] += 1
+    assert buckets.acquire("k", rule)[0]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,83 @@
+"""
+测试消息已读状态服务
+验证批量标记已读只执行一条带高水位的UPDATE，以及未读计数的数据库降级统计
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.models.chat import Message
+from app.services.read_state_service import (
+    UNREAD_CHAT, UNREAD_SYSTEM, get_unread_counts, mark_messages_read
+)
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的SQL并返回预设结果的会话（不连接数据库）"""
+
+    def __init__(self, results):
+        super().__init__()
+        self.statements = []
+        self.commits = 0
+        self._results = results
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement.compile(
+            dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}
+        )))
+        return self._results.pop(0)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeResult:
+    def __init__(self, rows=None, rowcount=0):
+        self._rows = rows or []
+        self.rowcount = rowcount
+
+    def all(self):
+        return self._rows
+
+
+@pytest.fixture(autouse=True)
+def redis_down(monkeypatch):
+    async def no_redis():
+        return None
+    monkeypatch.setattr(cache, "get_redis", no_redis)
+
+
+@pytest.mark.asyncio
+async def test_mark_read_single_update_with_high_water():
+    """测试按高水位用一条UPDATE标记会话消息已读"""
+    db = RecordingSession([FakeResult(rowcount=5)])
+
+    updated = await mark_messages_read(
+        db, "user-1", UNREAD_CHAT, Message.session_id == "s-1",
+        high_water=(datetime(2026, 1, 1, 12, 0, 0), "msg-9")
+    )
+
+    assert updated == 5
+    assert db.commits == 1
+    assert len(db.statements) == 1
+    sql = db.statements[0]
+    assert sql.startswith("UPDATE messages SET is_read=true")
+    assert "messages.receiver_id = 'user-1'" in sql
+    assert "messages.is_read = false" in sql
+    assert "messages.message_type != 'SYSTEM'" in sql
+    assert "messages.session_id = 's-1'" in sql
+    assert "messages.created_at < '2026-01-01 12:00:00'" in sql
+    assert "messages.id <= 'msg-9'" in sql
+
+
+@pytest.mark.asyncio
+async def test_unread_counts_fall_back_to_single_query():
+    """测试Redis不可用时一次分组查询统计各分类未读数"""
+    db = RecordingSession([FakeResult(rows=[(UNREAD_SYSTEM, 3)])])
+
+    counts = await get_unread_counts(db, "user-1")
+
+    assert counts == {UNREAD_SYSTEM: 3, UNREAD_CHAT: 0}
+    assert len(db.statements) == 1
+    assert "GROUP BY" in db.statements[0]
@@ -4,7 +4,12 @@
 """
 import pytest
 import asyncio
-from app.core.cache import init_redis_pool, get_redis, close_redis, set_cache, get_cache, delete_cache
+from app.core.cache import (
+    init_redis_pool, get_redis, close_redis, set_cache, get_cache, delete_cache,
+    tag_cache_key, invalidate_cache_tags, record_cache_access, get_cache_stats,
+    RedisHealth
+)
+from app.core import cache
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -73,6 +78,125 @@ async def test_redis_cache_operations():
     logger.info("Redis缓存操作测试通过")
 
 
+@pytest.mark.asyncio
+async def test_cache_tag_invalidation():
+    """测试按标签失效缓存"""
+    init_redis_pool()
+    redis = await get_redis()
+    if not redis:
+        pytest.skip("Redis不可用，跳过测试")
+    
+    await set_cache("test_tagged_a", "a", expire=60)
+    await set_cache("test_tagged_b", "b", expire=60)
+    await tag_cache_key("test_tagged_a", ["test_tag_1"], expire=60)
+    await tag_cache_key("test_tagged_b", ["test_tag_2"], expire=60)
+    
+    await invalidate_cache_tags("test_tag_1")
+    
+    assert await get_cache("test_tagged_a") is None
+    assert await get_cache("test_tagged_b") == "b"
+    
+    await invalidate_cache_tags("test_tag_2")
+    assert await get_cache("test_tagged_b") is None
+
+
+def test_cache_stats():
+    """测试缓存命中统计"""
+    record_cache_access("test:stats", True)
+    record_cache_access("test:stats", True)
+    record_cache_access("test:stats", False)
+    
+    stats = get_cache_stats()["test:stats"]
+    assert stats["hits"] >= 2
+    assert stats["misses"] >= 1
+    assert 0 < stats["hit_rate"] < 1
+
+
+def test_redis_health_circuit_breaker(monkeypatch):
+    """测试Redis熔断器：连续失败后熔断，按指数退避探测，成功后恢复"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    health = RedisHealth(failure_threshold=2, base_backoff=1, max_backoff=4)
+    
+    # 启动时立即探测
+    assert health.should_probe()
+    health.record_success()
+    assert health.state == RedisHealth.CLOSED
+    
+    # 连续失败达到阈值后熔断
+    health.record_failure()
+    assert health.state == RedisHealth.CLOSED
+    health.record_failure()
+    assert health.state == RedisHealth.OPEN
+    assert not health.should_probe()
+    
+    # 探测失败，退避时间翻倍
+    now[0] += 1
+    assert health.should_probe()
+    assert health.state == RedisHealth.HALF_OPEN
+    assert not health.should_probe()
+    health.record_failure()
+    assert health.state == RedisHealth.OPEN
+    now[0] += 1
+    assert not health.should_probe()
+    now[0] += 1
+    assert health.should_probe()
+    
+    # 探测成功后恢复
+    health.record_success()
+    assert health.state == RedisHealth.CLOSED
+    
+    stats = health.stats()
+    assert stats["state"] == RedisHealth.CLOSED
+    assert stats["state_seconds"][RedisHealth.OPEN] == 3
+    assert set(stats["state_seconds"]) == {"closed", "open", "half_open"}
+
+
+@pytest.mark.asyncio
+async def test_get_redis_does_not_ping_when_healthy(monkeypatch):
+    """测试Redis健康时获取客户端不再逐次ping"""
+    pings = []
+    
+    class FakeRedis:
+        async def ping(self):
+            pings.append(1)
+            return True
+    
+    monkeypatch.setattr(cache, "redis_pool", object())
+    monkeypatch.setattr(cache, "redis_client", FakeRedis())
+    monkeypatch.setattr(cache, "redis_health", RedisHealth(3, 1, 60))
+    
+    for _ in range(10):
+        assert await get_redis() is cache.redis_client
+    assert len(pings) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_reopens_breaker(monkeypatch):
+    """测试探测被取消时熔断器回到open，到达探测时间后可以再次探测"""
+    started = asyncio.Event()
+    
+    class HangingRedis:
+        async def ping(self):
+            started.set()
+            await asyncio.sleep(3600)
+    
+    health = RedisHealth(3, 1, 60)
+    monkeypatch.setattr(cache, "redis_pool", object())
+    monkeypatch.setattr(cache, "redis_client", HangingRedis())
+    monkeypatch.setattr(cache, "redis_health", health)
+    
+    request = asyncio.create_task(get_redis())
+    await started.wait()
+    request.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await request
+    
+    assert health.state == RedisHealth.OPEN
+    health.next_probe_at = 0
+    assert health.should_probe() is True
+
+
 @pytest.mark.asyncio
 async def test_redis_pool_close():
     """测试连接池关闭"""
@@ -0,0 +1,113 @@
+"""
+测试统计查询服务
+验证每个统计面板只执行一次查询，并使用条件聚合和UNION去重；按学生范围统计不使用IN列表
+"""
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.statistics_service import (
+    build_student_activity_rows, count_active_students, get_enterprise_dashboard_counts, get_platform_counts,
+    get_student_dashboard_counts
+)
+
+
+class FakeMappingResult:
+    def __init__(self, row):
+        self._row = row
+
+    def scalar(self):
+        return next(iter(self._row.values()))
+
+    def mappings(self):
+        return self
+
+    def one(self):
+        return self._row
+
+
+class RecordingSession(AsyncSession):
+    """记录执行的语句并返回预设结果的会话（不连接数据库）"""
+
+    def __init__(self, row):
+        super().__init__()
+        self.statements = []
+        self._row = row
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return FakeMappingResult(self._row)
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_student_dashboard_single_query():
+    """测试学生统计一次查询完成，申请按用户ID统计，SUM结果转换为int"""
+    db = RecordingSession({"total_applications": 3, "accepted_applications": Decimal("1"), "total_todos": None})
+
+    counts = await get_student_dashboard_counts(db, "user-1", "student-1")
+
+    assert counts == {"total_applications": 3, "accepted_applications": 1, "total_todos": 0}
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    assert "job_applications.student_id = 'user-1'" in sql
+    assert "interviews.student_id = 'student-1'" in sql
+    assert "CASE WHEN (job_applications.status = 'ACCEPTED') THEN 1 ELSE 0 END" in sql
+    assert "CASE WHEN (offers.status = 'ACCEPTED') THEN 1 ELSE 0 END" in sql
+
+
+@pytest.mark.asyncio
+async def test_enterprise_dashboard_single_query():
+    """测试企业统计一次查询完成，触达人才数由各来源UNION去重后计数"""
+    db = RecordingSession({"total_jobs": 2})
+
+    await get_enterprise_dashboard_counts(db, "user-1", "enterprise-1")
+
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    assert sql.count(" UNION SELECT ") == 5
+    assert "UNION ALL" not in sql
+    assert "CASE WHEN (jobs.status = 'PUBLISHED') THEN 1 ELSE 0 END" in sql
+    assert "job_applications.job_id IN" not in sql
+
+
+@pytest.mark.asyncio
+async def test_platform_counts_single_query():
+    """测试平台概览六项计数一次查询完成"""
+    db = RecordingSession({"total_users": 1})
+
+    await get_platform_counts(db)
+
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    for table in ("users", "student_profiles", "jobs", "job_applications", "job_fairs", "info_sessions"):
+        assert f"FROM {table}" in sql
+
+
+@pytest.mark.asyncio
+async def test_active_students_semi_join():
+    """测试活跃学生数用EXISTS半连接一次查询完成，不取回学生ID"""
+    db = RecordingSession({"count": 7})
+
+    assert await count_active_students(db, department_id="department-1") == 7
+
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    assert "student_profiles.department_id = 'department-1'" in sql
+    assert "EXISTS (SELECT * \nFROM resumes \nWHERE resumes.student_id = student_profiles.id)" in sql
+    assert "job_applications.student_id = student_profiles.user_id" in sql
+    assert " IN " not in sql
+
+
+def test_student_activity_rows_correlated_counts():
+    """测试导出查询按学生范围过滤，简历数和申请数为关联子查询"""
+    sql = _sql(build_student_activity_rows(school_id="school-1"))
+
+    assert "WHERE student_profiles.school_id = 'school-1' ORDER BY student_profiles.id" in sql
+    assert "WHERE resumes.student_id = student_profiles.id) AS resume_count" in sql
+    assert "WHERE job_applications.student_id = student_profiles.user_id) AS application_count" in sql
+    assert " IN " not in sql
@@ -0,0 +1,210 @@
+"""
+测试统计汇总
+验证明细行变化转换为汇总增量、批量写入语句、重算语句和汇总读取条件
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.activity import JobFair
+from app.models.job import JobApplication, Resume
+from app.services import counter_service, rollup_service
+from app.services.rollup_service import (
+    ROLLUP_SPECS, ROLLUP_SPECS_BY_MODEL, RollupCounter, build_reconcile_statements, build_rollup_query
+)
+
+TODAY = datetime.now().date()
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+    def scalar(self):
+        return self._rows[0][0]
+
+
+class FakeSession:
+    """提供flush事件需要的会话属性（不连接数据库）"""
+
+    def __init__(self, new=(), dirty=(), deleted=(), students=()):
+        self.new, self.dirty, self.deleted = list(new), list(dirty), list(deleted)
+        self.info = {}
+        self.statements = []
+        self._students = list(students)
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self._students)
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    monkeypatch.setattr(counter_service, "_counters", [])
+    counter = RollupCounter()
+    monkeypatch.setattr(rollup_service, "rollup_counter", counter)
+    rollup_service.register_rollup_events()
+    return counter
+
+
+def test_flush_deltas_applied_after_commit(counter):
+    """测试新增行按学生档案归入学校和院系，提交后才进入写入缓冲区，回滚时丢弃"""
+    session = FakeSession(
+        new=[Resume(id="r1", student_id="s1"), JobApplication(id="a1", student_id="u1")],
+        students=[("s1", "u1", "school-1", "dept-1")],
+    )
+    rollup_service._collect_rollup_deltas(session, None)
+    assert len(session.statements) == 1
+    assert len(counter) == 0
+
+    rollup_service._apply_rollup_deltas(session)
+    assert counter.pending(("resumes", TODAY, "school-1", "dept-1", "", "")) == 1
+    assert counter.pending(("applications", TODAY, "school-1", "dept-1", "", "")) == 1
+
+    session = FakeSession(new=[Resume(id="r2", student_id="s1")], students=[("s1", "u1", "school-1", "dept-1")])
+    rollup_service._collect_rollup_deltas(session, None)
+    rollup_service._discard_rollup_deltas(session)
+    rollup_service._apply_rollup_deltas(session)
+    assert counter.pending(("resumes", TODAY, "school-1", "dept-1", "", "")) == 1
+
+
+def test_dimension_change_moves_count(counter):
+    """测试状态变化时计数从旧桶移到新桶，删除按旧值减少"""
+    job_fair = JobFair(id="f1")
+    for name, value in (("start_time", datetime(2026, 11, 1, 9)), ("school_id", "school-1"), ("status", "DRAFT")):
+        set_committed_value(job_fair, name, value)
+    job_fair.status = "PUBLISHED"
+
+    session = FakeSession(dirty=[job_fair])
+    rollup_service._collect_rollup_deltas(session, None)
+    rollup_service._apply_rollup_deltas(session)
+    assert counter.pending(("job_fairs", date(2026, 11, 1), "school-1", "", "", "DRAFT")) == -1
+    assert counter.pending(("job_fairs", date(2026, 11, 1), "school-1", "", "", "PUBLISHED")) == 1
+    assert session.statements == []
+
+    session = FakeSession(deleted=[job_fair])
+    rollup_service._collect_rollup_deltas(session, None)
+    rollup_service._apply_rollup_deltas(session)
+    assert counter.pending(("job_fairs", date(2026, 11, 1), "school-1", "", "", "DRAFT")) == -2
+
+
+def test_build_updates_upserts(counter):
+    """测试汇总增量用一条多行 INSERT ... ON DUPLICATE KEY UPDATE 写入"""
+    statements = counter.build_updates({
+        ("users", date(2026, 1, 1), "", "", "", ""): 2,
+        ("students", date(2026, 1, 1), "school-1", "dept-1", "", ""): 1,
+    })
+    assert len(statements) == 1
+    sql = _sql(statements[0])
+    assert sql.startswith("INSERT INTO statistics_rollups")
+    assert "ON DUPLICATE KEY UPDATE count = (statistics_rollups.count + VALUES(count))" in sql
+
+
+def test_reconcile_statements():
+    """测试重算语句只替换日期范围内的汇总行，并通过学生档案取学校和院系"""
+    cleanup, rebuild = build_reconcile_statements(
+        ROLLUP_SPECS_BY_MODEL[JobApplication], date(2026, 1, 1), date(2026, 1, 8)
+    )
+    cleanup_sql = _sql(cleanup)
+    assert cleanup_sql.startswith("DELETE FROM statistics_rollups")
+    assert "statistics_rollups.bucket_date >= '2026-01-01'" in cleanup_sql
+    assert "statistics_rollups.bucket_date < '2026-01-08'" in cleanup_sql
+
+    rebuild_sql = _sql(rebuild)
+    assert rebuild_sql.startswith("INSERT INTO statistics_rollups")
+    assert "LEFT OUTER JOIN student_profiles ON student_profiles.user_id = job_applications.student_id" in rebuild_sql
+    assert "GROUP BY date(job_applications.created_at)" in rebuild_sql
+
+
+def test_rollup_query_filters():
+    """测试汇总读取：None不过滤，日期范围包含结束日期"""
+    sql = _sql(build_rollup_query(
+        ["job_fairs"], ["status"], start_date=date(2026, 1, 1), end_date=date(2026, 1, 31),
+        school_id="school-1", status=None
+    ))
+    assert "statistics_rollups.school_id = 'school-1'" in sql
+    assert "statistics_rollups.status =" not in sql
+    assert "statistics_rollups.bucket_date <= '2026-01-31'" in sql
+    assert "GROUP BY statistics_rollups.metric, statistics_rollups.status" in sql
+
+
+async def test_full_rebuild_due_without_redis(monkeypatch):
+    """测试Redis不可用时按本进程记录：间隔内只全部重算一次，间隔为0时不全部重算"""
+    from app.core import cache
+
+    async def no_redis():
+        return None
+
+    monkeypatch.setattr(cache, "get_redis", no_redis)
+    monkeypatch.setattr(rollup_service, "_last_full_rebuild", None)
+    monkeypatch.setattr(rollup_service.settings, "STATISTICS_ROLLUP_FULL_REBUILD_INTERVAL", 86400)
+    assert await rollup_service._full_rebuild_due() is True
+    assert await rollup_service._full_rebuild_due() is False
+
+    monkeypatch.setattr(rollup_service, "_last_full_rebuild", None)
+    monkeypatch.setattr(rollup_service.settings, "STATISTICS_ROLLUP_FULL_REBUILD_INTERVAL", 0)
+    assert await rollup_service._full_rebuild_due() is False
+
+
+class ReconcileSession:
+    """记录重算执行的语句：数据库时间固定，职位在最近几秒内有新增的日期为 recent_date"""
+
+    def __init__(self, counter, now, recent_date):
+        self.counter = counter
+        self.now = now
+        self.recent_date = recent_date
+        self.statements = []
+        self.pending_at_cleanup = None
+
+    async def execute(self, statement):
+        sql = _sql(statement)
+        self.statements.append(sql)
+        if sql.startswith("DELETE") and self.pending_at_cleanup is None:
+            self.pending_at_cleanup = len(self.counter)
+        if sql == "SELECT now() AS now_1":
+            return FakeResult([(self.now,)])
+        if sql.startswith("SELECT DISTINCT date(jobs.created_at)"):
+            return FakeResult([(self.recent_date,)])
+        return FakeResult([])
+
+    async def commit(self):
+        pass
+
+
+async def test_reconcile_flushes_pending_and_skips_unsettled_dates(counter):
+    """测试重算前先写入缓冲区中的增量，且不重算最近有明细行变化的日期、不统计之后创建的行"""
+    now = datetime(2026, 11, 2, 10, 0, 0)
+    counter.increment(("jobs", date(2026, 11, 2), "", "", "e1", ""), 1)
+    session = ReconcileSession(counter, now, date(2026, 11, 2))
+
+    await rollup_service.reconcile_rollups(session, None)
+    assert session.statements[0].startswith("INSERT INTO statistics_rollups")
+    assert "ON DUPLICATE KEY UPDATE" in session.statements[0]
+    assert session.pending_at_cleanup == 0
+
+    job_statements = [sql for sql in session.statements if "'jobs'" in sql or "FROM jobs" in sql]
+    cleanup, rebuild = job_statements[-2:]
+    assert "statistics_rollups.bucket_date NOT IN ('2026-11-02')" in cleanup
+    assert "date(jobs.created_at) NOT IN ('2026-11-02')" in rebuild
+    assert "jobs.created_at < '2026-11-02 09:59:45'" in rebuild
+    assert len([sql for sql in session.statements if sql.startswith("DELETE")]) == len(ROLLUP_SPECS)
+
+
+async def test_reconcile_skipped_when_flush_fails(counter, monkeypatch):
+    """测试缓冲区中的增量写入失败时不重算（否则写入重试时会重复计数）"""
+    async def failing_flush(db):
+        return 0
+
+    monkeypatch.setattr(rollup_service, "flush_counters", failing_flush)
+    counter.increment(("jobs", date(2026, 11, 2), "", "", "e1", ""), 1)
+    session = ReconcileSession(counter, datetime(2026, 11, 2, 10), date(2026, 11, 2))
+    await rollup_service.reconcile_rollups(session, None)
+    assert session.statements == []
@@ -0,0 +1,120 @@
+"""
+测试JWT令牌缓存和吊销名单
+验证已验证令牌缓存、过期失效、布隆过滤器和吊销
+"""
+import asyncio
+import time
+import pytest
+from datetime import timedelta
+from app.core import cache, security, token_cache
+from app.core.security import create_access_token, verify_token, revoke_token
+from app.core.token_cache import (
+    BloomFilter, TokenDenylist, VerifiedTokenCache, token_digest,
+    verified_token_cache, token_denylist
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_token_state():
+    verified_token_cache.clear()
+    token_denylist.replace({})
+    yield
+    verified_token_cache.clear()
+    token_denylist.replace({})
+
+
+def test_verify_token_decodes_once(monkeypatch):
+    """测试同一令牌只验签一次"""
+    token = create_access_token({"sub": "cached_user", "user_id": "u-1"})
+    calls = []
+    original_decode = security._decode_token
+
+    def counting_decode(value):
+        calls.append(value)
+        return original_decode(value)
+    monkeypatch.setattr(security, "_decode_token", counting_decode)
+
+    assert verify_token(token)["sub"] == "cached_user"
+    payload = verify_token(token)
+    assert payload["user_id"] == "u-1"
+    assert len(calls) == 1
+
+    # 修改返回值不影响缓存
+    payload["sub"] = "changed"
+    assert verify_token(token)["sub"] == "cached_user"
+
+
+def test_verified_token_cache_expires_with_token():
+    """测试缓存条目在令牌过期时失效，且按容量淘汰"""
+    local = VerifiedTokenCache(max_entries=2)
+    local.set(b"expired", {"exp": time.time() - 1})
+    assert local.get(b"expired") is None
+
+    local.set(b"a", {"exp": time.time() + 60})
+    local.set(b"b", {"exp": time.time() + 60})
+    local.set(b"c", {"exp": time.time() + 60})
+    assert local.get(b"a") is None
+    assert local.get(b"c") is not None
+
+    # 没有exp的令牌不缓存
+    local.set(b"no_exp", {"sub": "x"})
+    assert local.get(b"no_exp") is None
+
+
+def test_bloom_filter_and_denylist():
+    """测试布隆过滤器无漏判，吊销名单精确判断并清理过期记录"""
+    bloom = BloomFilter(1024)
+    digests = [token_digest(f"token-{i}") for i in range(50)]
+    for digest in digests:
+        bloom.add(digest)
+    assert all(bloom.might_contain(digest) for digest in digests)
+
+    denylist = TokenDenylist(1024)
+    now = time.time()
+    denylist.add(digests[0], now + 60)
+    denylist.add(digests[1], now - 1)
+    assert denylist.contains(digests[0])
+    assert not denylist.contains(digests[2])
+
+    denylist.prune(now)
+    assert len(denylist) == 1
+    assert not denylist.contains(digests[1])
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_rejected(monkeypatch):
+    """测试吊销后令牌立即失效（Redis不可用时仍在本进程生效）"""
+    async def no_redis():
+        return None
+    monkeypatch.setattr(cache, "get_redis", no_redis)
+
+    token = create_access_token({"sub": "cached_user"}, expires_delta=timedelta(minutes=5))
+    assert verify_token(token) is not None
+
+    assert await revoke_token(token) is True
+    assert verify_token(token) is None
+    assert await revoke_token("invalid-token") is False
+
+
+@pytest.mark.asyncio
+async def test_denylist_sync_loop_survives_errors(monkeypatch):
+    """测试同步出错（如名单成员格式错误）时后台任务继续运行"""
+    calls = []
+
+    async def flaky_sync():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("non-hexadecimal number found in fromhex() arg")
+
+    monkeypatch.setattr(token_cache, "sync_token_denylist", flaky_sync)
+    monkeypatch.setattr(token_cache.settings, "TOKEN_DENYLIST_SYNC_INTERVAL", 0.01)
+    task = asyncio.create_task(token_cache._denylist_sync_loop())
+    try:
+        for _ in range(100):
+            if len(calls) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        assert len(calls) >= 2
+        assert not task.done()
+    finally:
+        task.cancel()
@@ -0,0 +1,131 @@
+"""
+测试流式上传
+验证按块写入本地存储、文件头校验、超过大小限制时中止并清理，以及并发批量上传
+"""
+import io
+import pytest
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, UploadFile
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+from app.api.v1 import upload
+from app.api.v1.upload import (
+    UploadRejected, stream_upload, upload_files_concurrently, ALLOWED_DOCUMENT_TYPES, ALLOWED_IMAGE_TYPES
+)
+from app.core.config import settings
+from app.core.storage import LocalStorage, UploadStaticFiles
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def _upload_file(content: bytes, content_type: str, size=None, filename="photo.png") -> UploadFile:
+    return UploadFile(
+        io.BytesIO(content), size=size, filename=filename,
+        headers=Headers({"content-type": content_type})
+    )
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    local = LocalStorage(str(tmp_path), "/uploads")
+    monkeypatch.setattr(upload, "get_storage", lambda: local)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 16)
+    return local
+
+
+def _stored_files(storage):
+    return [path for path in storage.root.rglob("*") if path.is_file()]
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_writes_chunks(storage):
+    """测试分块写入本地存储，结果与原文件一致"""
+    content = PNG_HEADER + bytes(range(256)) * 4
+
+    result = await stream_upload(_upload_file(content, "image/png"), "avatar", ALLOWED_IMAGE_TYPES)
+
+    assert result["file_size"] == len(content)
+    assert result["url"] == f"/uploads/{result['file_path']}"
+    assert (storage.root / result["file_path"]).read_bytes() == content
+    assert await storage.delete_file(result["url"])
+    assert not _stored_files(storage)
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_rejects_mismatched_signature(storage):
+    """测试文件内容与声明类型不符时拒绝"""
+    with pytest.raises(UploadRejected):
+        await stream_upload(_upload_file(b"%PDF-1.7 not an image", "image/png"), "avatar", ALLOWED_IMAGE_TYPES)
+    assert not _stored_files(storage)
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_aborts_when_too_large(storage):
+    """测试未声明大小的文件在读取中超过限制时中止，并清理已写入的临时文件"""
+    content = PNG_HEADER + b"x" * 200
+    with pytest.raises(UploadRejected):
+        await stream_upload(_upload_file(content, "image/png"), "avatar", ALLOWED_IMAGE_TYPES, max_size=100)
+    assert not _stored_files(storage)
+
+    # 声明了大小的文件在读取前拒绝
+    with pytest.raises(UploadRejected):
+        await stream_upload(_upload_file(content, "image/png", size=len(content)), "avatar", ALLOWED_IMAGE_TYPES, max_size=100)
+
+
+@pytest.mark.asyncio
+async def test_batch_upload_reports_each_file(storage):
+    """测试并发批量上传逐个报告结果，成功的文件按请求顺序返回"""
+    files = [
+        _upload_file(PNG_HEADER + b"first", "image/png"),
+        _upload_file(b"not an image", "image/png"),
+        _upload_file(PNG_HEADER + b"third", "image/png"),
+    ]
+
+    result = await upload_files_concurrently(files, "avatar", ALLOWED_IMAGE_TYPES, concurrency=2)
+
+    assert result["total"] == 2
+    assert [item["file_size"] for item in result["files"]] == [len(PNG_HEADER) + 5] * 2
+    assert [item["index"] for item in result["failed"]] == [1]
+    assert result["rolled_back"] is False
+    assert len(_stored_files(storage)) == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_upload_all_or_nothing(storage):
+    """测试全部成功模式下有文件失败时删除已上传的文件"""
+    files = [
+        _upload_file(PNG_HEADER + b"first", "image/png"),
+        _upload_file(b"not an image", "image/png"),
+    ]
+
+    result = await upload_files_concurrently(files, "avatar", ALLOWED_IMAGE_TYPES, concurrency=2, all_or_nothing=True)
+
+    assert result["files"] == []
+    assert result["rolled_back"] is True
+    assert len(result["failed"]) == 1
+    assert not _stored_files(storage)
+
+
+@pytest.mark.asyncio
+async def test_stored_extension_follows_content_type(storage):
+    """测试存储文件的扩展名由校验过的类型决定，不使用客户端文件名的扩展名"""
+    result = await stream_upload(
+        _upload_file(b"<script>alert(1)</script>", "text/plain", filename="x.html"), "resume", ALLOWED_DOCUMENT_TYPES
+    )
+    assert result["file_path"].endswith(".txt")
+    assert result["file_name"] == "x.html"
+
+
+def test_upload_static_files_headers(tmp_path):
+    """测试本地上传文件禁止内容嗅探，图片以外的文件作为附件下载"""
+    (tmp_path / "a.png").write_bytes(PNG_HEADER)
+    (tmp_path / "b.txt").write_text("hello")
+    client = TestClient(Starlette(routes=[Mount("/uploads", UploadStaticFiles(directory=str(tmp_path)))]))
+
+    image = client.get("/uploads/a.png")
+    assert image.headers["x-content-type-options"] == "nosniff"
+    assert "content-disposition" not in image.headers
+
+    text = client.get("/uploads/b.txt")
+    assert text.headers["x-content-type-options"] == "nosniff"
+    assert text.headers["content-disposition"] == "attachment"
@@ -0,0 +1,60 @@
+"""
+测试文件URL签名服务
+验证对象键归一化、签名缓存提前过期，以及批量签名去重
+"""
+import time
+import pytest
+from app.core import url_signer as url_signer_module
+from app.core.config import settings
+from app.core.url_signer import UrlSigner, normalize_object_key
+
+
+def test_normalize_object_key():
+    """测试从各种格式的URL中提取对象键"""
+    bucket = settings.OSS_BUCKET_NAME
+    assert normalize_object_key("resume/2025/12/11/a.pdf") == "resume/2025/12/11/a.pdf"
+    assert normalize_object_key(
+        f"https://{bucket}.oss-cn-hangzhou.aliyuncs.com/resume/2025/12/11/a.pdf"
+    ) == "resume/2025/12/11/a.pdf"
+    # 带bucket前缀、签名参数且被重复编码
+    assert normalize_object_key(
+        f"https://oss-cn-hangzhou.aliyuncs.com/{bucket}/resume/%25E7%25AE%2580%25E5%258E%2586.pdf"
+        "?OSSAccessKeyId=x&Signature=y"
+    ) == "resume/简历.pdf"
+    assert normalize_object_key("") is None
+    assert normalize_object_key("a.pdf?x=1") is None
+
+
+@pytest.fixture
+def counting_signer(monkeypatch):
+    signer = UrlSigner(max_entries=10, refresh_margin=60)
+    calls = []
+
+    def fake_sign(file_path, expires):
+        calls.append(file_path)
+        return f"signed:{file_path}:{len(calls)}"
+    monkeypatch.setattr(signer, "_sign_uncached", fake_sign)
+    return signer, calls
+
+
+def test_sign_cached_until_refresh_margin(counting_signer, monkeypatch):
+    """测试同一文件在过期前只签名一次，进入提前失效窗口后重新签名"""
+    signer, calls = counting_signer
+    now = time.time()
+    monkeypatch.setattr(url_signer_module.time, "time", lambda: now)
+    first = signer.sign("logo/a.png", expires=3600)
+    assert signer.sign("logo/a.png", expires=3600) == first
+    assert len(calls) == 1
+
+    monkeypatch.setattr(url_signer_module.time, "time", lambda: now + 3600 - 59)
+    assert signer.sign("logo/a.png", expires=3600) != first
+    assert len(calls) == 2
+
+
+def test_sign_many_deduplicates(counting_signer):
+    """测试批量签名跳过空值，重复的文件只签名一次"""
+    signer, calls = counting_signer
+    result = signer.sign_many(["a.pdf", None, "b.pdf", "a.pdf", ""])
+    assert set(result) == {"a.pdf", "b.pdf"}
+    assert sorted(calls) == ["a.pdf", "b.pdf"]
+    assert signer.sign(None) is None
@@ -36,9 +36,11 @@ export interface ChatSession {
 
 export interface MessageListResponse {
   items: Message[]
-  total: number
-  page: number
+  total?: number | null
   page_size: number
+  has_more: boolean
+  next_cursor?: string | null
+  prev_cursor?: string | null
 }
 
 export interface ChatSessionListResponse {
@@ -80,8 +82,10 @@ export const createOrGetChatSession = async (receiverId?: string, studentId?: st
 export const getSessionMessages = async (
   sessionId: string,
   params?: {
-    page?: number
+    before?: string
+    after?: string
     page_size?: number
+    include_total?: boolean
   }
 ): Promise<MessageListResponse> => {
   return request.get(`/chat/sessions/${sessionId}/messages`, { params })
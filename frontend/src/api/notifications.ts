@@ -7,9 +7,11 @@ import request from './request'
  * 获取系统消息列表
  */
 export function getNotifications(params?: {
-  page?: number
+  before?: string
+  after?: string
   page_size?: number
   is_read?: boolean
+  include_total?: boolean
 }) {
   return request.get('/api/v1/notifications', { params })
 }
@@ -21,6 +23,13 @@ export function markAsRead(messageId: string) {
   return request.post(`/api/v1/notifications/${messageId}/read`)
 }
 
+/**
+ * 标记所有消息为已读（upTo为列表返回的prev_cursor，只标记已加载到的位置之前的消息）
+ */
+export function markAllAsRead(upTo?: string) {
+  return request.post('/api/v1/notifications/read-all', null, { params: { up_to: upTo } })
+}
+
 /**
  * 获取未读消息数量
  */
@@ -67,3 +67,31 @@ export const createSystemMessage = async (data: {
     }
   })
 }
+
+export interface BroadcastJob {
+  id: string
+  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED'
+  total: number | null
+  processed: number
+  error: string | null
+  created_at: string
+  finished_at: string | null
+}
+
+// 群发系统消息（仅管理员，后台执行，返回任务）
+export const broadcastSystemMessage = async (data: {
+  content: string
+  title?: string
+  user_types?: string[]
+  school_id?: string
+  department_id?: string
+  class_id?: string
+  user_ids?: string[]
+}): Promise<BroadcastJob> => {
+  return request.post('/system-messages/broadcast', data)
+}
+
+// 查询群发任务进度（仅管理员）
+export const getBroadcastProgress = async (jobId: string): Promise<BroadcastJob> => {
+  return request.get(`/system-messages/broadcast/${jobId}`)
+}